@@ -0,0 +1,128 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.cache import CacheBackend
+from app.db.batching import BULK_CHUNK_SIZE
+from app.db.database import DB
+from app.metrics import call_db_method
+from app.models.Task import Task, TaskPriority, TaskStatus
+from app.schemas.task import TaskCreate, TaskUpdate
+
+
+class AsyncDB:
+    """
+    Async counterpart of DB backed by an AsyncSession (sqlite+aiosqlite).
+
+    Each method runs the matching DB method through AsyncSession.run_sync,
+    so the query logic lives in one place while all I/O goes through the
+    async driver and never blocks the event loop.
+    """
+
+    def __init__(self, session: AsyncSession, cache: Optional[CacheBackend] = None):
+        """Instatiate with an async session and optional get_task cache"""
+        self.__session = session
+        self.__cache = cache
+
+    async def _run(self, method: str, *args, **kwargs) -> Any:
+        """Run DB.<method> on the sync view of the async session"""
+        return await self.__session.run_sync(
+            lambda session: call_db_method(DB(session, self.__cache), method, *args, **kwargs)
+        )
+
+    async def create_task(self, task_data: TaskCreate) -> Task:
+        return await self._run("create_task", task_data)
+
+    async def bulk_create_tasks(self, tasks: List[TaskCreate],
+                                chunk_size: int = BULK_CHUNK_SIZE) -> List[int]:
+        return await self._run("bulk_create_tasks", tasks, chunk_size)
+
+    async def get_tasks_pagination_and_filter(self, skip: int = 0, limit: int = 10,
+                                              priority: Optional[TaskPriority] = None,
+                                              status: Optional[TaskStatus] = None,
+                                              as_rows: bool = False,
+                                              fields: Optional[Sequence[str]] = None) -> List[Task]:
+        return await self._run("get_tasks_pagination_and_filter", skip, limit, priority, status, as_rows, fields)
+
+    async def get_tasks_page(self, skip: int = 0, limit: int = 10,
+                             priority: Optional[TaskPriority] = None,
+                             status: Optional[TaskStatus] = None,
+                             as_rows: bool = False,
+                             fields: Optional[Sequence[str]] = None,
+                             count: Optional[str] = None) -> Tuple[List[Task], bool, Optional[int]]:
+        return await self._run("get_tasks_page", skip, limit, priority, status, as_rows, fields, count)
+
+    async def count_tasks(self, priority: Optional[TaskPriority] = None,
+                          status: Optional[TaskStatus] = None, count: str = "exact") -> int:
+        return await self._run("count_tasks", priority, status, count)
+
+    async def get_tasks_keyset(self, cursor: str = "", limit: int = 10,
+                               priority: Optional[TaskPriority] = None,
+                               status: Optional[TaskStatus] = None,
+                               order_by: str = "id", as_rows: bool = False,
+                               fields: Optional[Sequence[str]] = None) -> Tuple[List[Task], Optional[str]]:
+        return await self._run("get_tasks_keyset", cursor, limit, priority, status, order_by, as_rows, fields)
+
+    async def get_task(self, task_id: int) -> Optional[Task]:
+        return await self._run("get_task", task_id)
+
+    async def get_task_version(self, task_id: int) -> Optional[Tuple[int, datetime]]:
+        return await self._run("get_task_version", task_id)
+
+    async def update_task(self, task_id: int, updates: TaskUpdate) -> Optional[Task]:
+        return await self._run("update_task", task_id, updates)
+
+    async def delete_task(self, task_id: int) -> bool:
+        return await self._run("delete_task", task_id)
+
+    async def sort_tasks(self, field: str, limit: Optional[int] = None, as_rows: bool = False,
+                         fields: Optional[Sequence[str]] = None) -> List[Task]:
+        return await self._run("sort_tasks", field, limit, as_rows, fields)
+
+    async def sort_tasks_keyset(self, field: str, cursor: str = "", limit: int = 100,
+                                as_rows: bool = False,
+                                fields: Optional[Sequence[str]] = None) -> Tuple[List[Task], Optional[str]]:
+        return await self._run("sort_tasks_keyset", field, cursor, limit, as_rows, fields)
+
+    async def stream_sorted_tasks(self, field: str, chunk_size: int = 500,
+                                  fields: Optional[Sequence[str]] = None) -> AsyncIterator[List[dict]]:
+        """
+        Validate the sort field, then return an async iterator over chunks of
+        row dicts streamed from the database chunk_size rows at a time.
+        """
+        return self._aiter_partitions(DB.sorted_rows_statement(field, chunk_size, fields))
+
+    async def _aiter_partitions(self, statement) -> AsyncIterator[List[dict]]:
+        result = await self.__session.stream(statement)
+        try:
+            async for partition in result.partitions():
+                yield [dict(row._mapping) for row in partition]
+        finally:
+            await result.close()
+            # A streamed body outlives the request's session dependency;
+            # release the connection it reopened once the stream is done
+            await self.__session.close()
+
+    async def search_tasks(self, text: str, skip: int = 0, limit: int = 10,
+                           as_rows: bool = False,
+                           fields: Optional[Sequence[str]] = None) -> List[Task]:
+        return await self._run("search_tasks", text, skip, limit, as_rows, fields)
+
+    async def search_tasks_page(self, text: str, skip: int = 0, limit: int = 10,
+                                as_rows: bool = False,
+                                fields: Optional[Sequence[str]] = None,
+                                count: Optional[str] = None) -> Tuple[List[Task], bool, Optional[int]]:
+        return await self._run("search_tasks_page", text, skip, limit, as_rows, fields, count)
+
+    async def count_search(self, text: str, count: str = "exact") -> int:
+        return await self._run("count_search", text, count)
+
+    async def get_task_stats(self, now: Optional[datetime] = None) -> dict:
+        return await self._run("get_task_stats", now)
+
+    async def bulk_update_tasks(self, task_updates: List[dict], chunk_size: int = BULK_CHUNK_SIZE,
+                                atomic: bool = True) -> int:
+        return await self._run("bulk_update_tasks", task_updates, chunk_size, atomic)
+
+    async def bulk_delete_tasks(self, task_ids: List[int], chunk_size: int = BULK_CHUNK_SIZE,
+                                atomic: bool = True) -> int:
+        return await self._run("bulk_delete_tasks", task_ids, chunk_size, atomic)
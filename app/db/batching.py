@@ -0,0 +1,45 @@
+import os
+import sqlite3
+from typing import Iterator, List, Sequence, TypeVar
+from sqlalchemy.engine import Connection
+
+T = TypeVar("T")
+
+# Rows per statement / transaction for the bulk write methods of DB
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+
+# Bound-parameter limits of backends that cannot report their own
+PARAMETER_LIMITS = {
+    "postgresql": 65535,
+}
+DEFAULT_PARAMETER_LIMIT = 999
+
+
+def bound_parameter_limit(connection: Connection) -> int:
+    '''
+    Return: the most bound parameters one statement may carry on connection
+    '''
+    if connection.dialect.name == "sqlite":
+        driver_connection = connection.connection.driver_connection
+        getlimit = getattr(driver_connection, "getlimit", None)
+        if getlimit is not None:
+            return getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+        # aiosqlite does not expose getlimit; use the compiled-in default
+        return 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+    return PARAMETER_LIMITS.get(connection.dialect.name, DEFAULT_PARAMETER_LIMIT)
+
+
+def rows_per_statement(chunk_size: int, params_per_row: int, limit: int) -> int:
+    '''
+    Return: chunk_size capped so that a statement binding params_per_row
+    parameters per row stays within limit
+    '''
+    return max(1, min(chunk_size, limit // max(1, params_per_row)))
+
+
+def chunked(items: Sequence[T], size: int) -> Iterator[List[T]]:
+    '''
+    Yield consecutive slices of items holding at most size elements
+    '''
+    for start in range(0, len(items), size):
+        yield list(items[start:start + size])
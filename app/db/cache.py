@@ -0,0 +1,320 @@
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class CacheBackend(ABC):
+    """
+    Interface of the task cache used by DB.get_task.
+
+    Keys are task IDs and values are plain dicts (Task.model_dump()), so a
+    backend never holds ORM instances and can serialize values freely.
+
+    A read-through miss fills the cache with begin_fill before reading the
+    row and fill after: a write that commits and invalidates the key in
+    between must win, or the row read before it would stay cached for the
+    whole TTL. fill therefore skips keys invalidated since begin_fill.
+    """
+
+    @abstractmethod
+    def get(self, key: int) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def set(self, key: int, value: dict) -> None:
+        ...
+
+    @abstractmethod
+    def begin_fill(self, key: int) -> Any:
+        '''
+        Return: a token for fill, taken before the value is read
+        '''
+
+    @abstractmethod
+    def fill(self, key: int, value: dict, token: Any) -> None:
+        '''
+        Store value unless key was invalidated after begin_fill returned token
+        '''
+
+    @abstractmethod
+    def delete_many(self, keys: Iterable[int]) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+
+class LRUCache(CacheBackend):
+    """In-process LRU cache with a per-entry TTL, safe across threads."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        # Bumped by every invalidation. _invalidated maps the last maxsize
+        # invalidated keys to the generation that invalidated them; tokens
+        # older than _floor may have lost theirs and never fill.
+        self._generation = 0
+        self._invalidated: "OrderedDict[int, int]" = OrderedDict()
+        self._floor = 0
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._evictions = self._expirations = self._invalidations = 0
+
+    def get(self, key: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: int, value: dict) -> None:
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key: int, value: dict) -> None:
+        # called with _lock held
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def begin_fill(self, key: int) -> int:
+        with self._lock:
+            return self._generation
+
+    def fill(self, key: int, value: dict, token: int) -> None:
+        with self._lock:
+            if token >= self._floor and self._invalidated.get(key, 0) <= token:
+                self._store(key, value)
+
+    def delete_many(self, keys: Iterable[int]) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self._invalidations += 1
+                self._invalidated[key] = self._generation
+                self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self.maxsize:
+                _, generation = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, generation)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._invalidated.clear()
+            self._floor = self._generation
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "backend": "lru",
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
+
+
+class ReadOnlyCache(CacheBackend):
+    """
+    View of another backend that serves hits but ignores set(). Used by
+    replica reads: a lagging replica could otherwise refill an entry that
+    a write on the primary just invalidated with the old row.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    def get(self, key: int) -> Optional[dict]:
+        return self.backend.get(key)
+
+    def set(self, key: int, value: dict) -> None:
+        pass
+
+    def begin_fill(self, key: int) -> None:
+        return None
+
+    def fill(self, key: int, value: dict, token: Any) -> None:
+        pass
+
+    def delete_many(self, keys: Iterable[int]) -> None:
+        self.backend.delete_many(keys)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.backend.stats()
+
+
+class KeyValueStoreCache(CacheBackend):
+    """
+    Cache on an external key-value store speaking the redis-py client API
+    (get, set with ex=, incr, delete, transaction), e.g. redis.Redis or a
+    local stand-in. Values are stored as JSON under "<prefix><task_id>".
+
+    Invalidation bumps a generation counter in the store and leaves a
+    tombstone holding it for ttl seconds. fill stores into an empty key or
+    over a tombstone no newer than its token, checking and writing under
+    WATCH/MULTI, so a read that began before an invalidation cannot refill
+    the key.
+    """
+
+    def __init__(self, client, ttl: float = 30.0, prefix: str = "task:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._invalidations = 0
+
+    def _key(self, key: int) -> str:
+        return f"{self.prefix}{key}"
+
+    @property
+    def _generation_key(self) -> str:
+        return f"{self.prefix}generation"
+
+    def get(self, key: int) -> Optional[dict]:
+        raw = _text(self.client.get(self._key(key)))
+        with self._lock:
+            if raw is None or raw.startswith(TOMBSTONE):
+                self._misses += 1
+                return None
+            self._hits += 1
+        return json.loads(raw)
+
+    def set(self, key: int, value: dict) -> None:
+        raw = json.dumps(value, default=_json_default)
+        self.client.set(self._key(key), raw, ex=max(1, int(self.ttl)))
+
+    def begin_fill(self, key: int) -> int:
+        return int(_text(self.client.get(self._generation_key)) or 0)
+
+    def fill(self, key: int, value: dict, token: int) -> None:
+        name = self._key(key)
+        raw = json.dumps(value, default=_json_default)
+
+        def replace(pipe):
+            current = _text(pipe.get(name))
+            if current is None or (
+                current.startswith(TOMBSTONE) and int(current[len(TOMBSTONE):]) <= token
+            ):
+                pipe.multi()
+                pipe.set(name, raw, ex=max(1, int(self.ttl)))
+
+        # the key is watched: an invalidation between the GET and the SET
+        # aborts the transaction, and the retry sees its newer tombstone
+        self.client.transaction(replace, name)
+
+    def delete_many(self, keys: Iterable[int]) -> None:
+        names = [self._key(key) for key in keys]
+        if not names:
+            return
+        generation = self.client.incr(self._generation_key)
+        deleted = self.client.delete(*names)
+        for name in names:
+            self.client.set(name, f"{TOMBSTONE}{generation}", ex=max(1, int(self.ttl)))
+        with self._lock:
+            self._invalidations += deleted or 0
+
+    def clear(self) -> None:
+        # the generation stays: it must keep growing for fills in flight
+        for name in self.client.scan_iter(f"{self.prefix}*"):
+            if _text(name) != self._generation_key:
+                self.client.delete(name)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "backend": "kv",
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                # expiry and eviction are handled by the store itself
+                "evictions": None,
+                "invalidations": self._invalidations,
+            }
+
+
+# Prefix of the tombstones KeyValueStoreCache.delete_many stores; never JSON
+TOMBSTONE = "invalidated:"
+
+
+def _text(raw) -> Optional[str]:
+    # redis-py returns bytes unless the client decodes responses
+    return raw.decode() if isinstance(raw, bytes) else raw
+
+
+# stats() fields that add up across worker processes
+_SUMMED_STATS = ("size", "hits", "misses", "evictions", "expirations", "invalidations")
+
+
+def combine_stats(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    '''
+    Return: the stats() of one cache per worker process added up, with the
+    settings of the first and the number of workers
+    '''
+    combined = dict(stats[0])
+    for field in _SUMMED_STATS:
+        if combined.get(field) is not None:
+            combined[field] = sum(worker[field] for worker in stats)
+    lookups = combined["hits"] + combined["misses"]
+    combined["hit_ratio"] = combined["hits"] / lookups if lookups else 0.0
+    combined["workers"] = len(stats)
+    return combined
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def cache_from_env() -> Optional[CacheBackend]:
+    '''
+    Build the process-wide task cache from the environment:
+    TASK_CACHE ("lru" by default, "none" to disable), TASK_CACHE_SIZE and
+    TASK_CACHE_TTL (seconds).
+    '''
+    backend = os.getenv("TASK_CACHE", "lru").lower()
+    if backend == "none":
+        return None
+    if backend != "lru":
+        raise ValueError(f"Unknown TASK_CACHE '{backend}'. Valid values are: lru, none")
+    return LRUCache(
+        maxsize=int(os.getenv("TASK_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("TASK_CACHE_TTL", "30")),
+    )
+
+
+task_cache: Optional[CacheBackend] = cache_from_env()
@@ -0,0 +1,519 @@
+"""
+Task change log behind GET /tasks/changes.
+
+task_change holds one row per write to task: a sequence number, the task
+id, the operation (create, update, delete) and when it happened. Triggers
+on task append it in the same transaction as the write. Every write path
+is covered, including the DB methods, group commit, bulk statements and
+COPY, so a committed change is always in the log and a rolled back one
+never is. Sequence numbers only grow, and they commit in order: a reader
+can never skip a seq that commits later. On SQLite one writer at a time
+gives that for free. On PostgreSQL, concurrent writers take seqs in one
+order and may commit in another, so the triggers there append to
+task_change_pending instead, without a seq. publish_changes moves the
+committed pending entries into task_change and numbers them then. The
+change feed's poller publishes before every read. Publishers take turns
+on a transaction advisory lock; writers to task never take it.
+
+Clients read the changes after the last seq they have seen. They get the
+latest entry per task with the task's current row, so create and update
+are both upserts.
+
+Two kinds of cleanup keep the log small:
+
+  compaction - entries superseded by a later entry for the same task are
+               removed; readers lose nothing, since they only see the
+               latest entry per task
+  retention  - entries older than CHANGES_RETENTION_SECONDS are removed,
+               and a 'truncate' marker records the highest removed seq.
+               A client asking for changes since an older seq gets 410 and
+               has to reload GET /tasks/.
+
+Both run at server start (python -m app.server), every
+CHANGES_COMPACT_SECONDS while subscribers are waiting, and on demand:
+
+    python -m app.db.changes compact
+
+ChangeFeed fans the log out to waiting subscribers. One poller thread per
+process reads new entries into a buffer of the latest CHANGES_BUFFER_SIZE
+entries. It runs every CHANGES_POLL_SECONDS, and right away after a write
+in the process. Subscribers are served from that buffer, so N subscribers
+waiting on the same changes cost one query, not N. Server-sent event
+streams close after CHANGES_STREAM_SECONDS (EventSource reconnects with
+Last-Event-ID) and send a comment every CHANGES_KEEPALIVE_SECONDS while
+idle.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, List, Optional, Set, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, event, func, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session
+
+from app.models.Task import Task
+
+logger = logging.getLogger("app.db.changes")
+
+CHANGES_TABLE = "task_change"
+PENDING_TABLE = "task_change_pending"
+CHANGES_RETENTION_SECONDS = float(os.getenv("CHANGES_RETENTION_SECONDS", str(7 * 24 * 3600)))
+CHANGES_COMPACT_SECONDS = float(os.getenv("CHANGES_COMPACT_SECONDS", "3600"))
+CHANGES_POLL_SECONDS = float(os.getenv("CHANGES_POLL_SECONDS", "0.5"))
+CHANGES_BUFFER_SIZE = int(os.getenv("CHANGES_BUFFER_SIZE", "10000"))
+CHANGES_STREAM_SECONDS = float(os.getenv("CHANGES_STREAM_SECONDS", "300"))
+CHANGES_KEEPALIVE_SECONDS = float(os.getenv("CHANGES_KEEPALIVE_SECONDS", "15"))
+
+TRUNCATE = "truncate"
+
+# Not part of SQLModel.metadata: created with its triggers, not by create_all
+change_table = Table(
+    CHANGES_TABLE, MetaData(),
+    Column("seq", Integer, primary_key=True),
+    Column("task_id", Integer, nullable=False),
+    Column("op", String, nullable=False),
+    Column("changed_at", DateTime, nullable=False),
+)
+
+CREATE_CHANGES_STATEMENTS = {
+    "sqlite": [
+        # AUTOINCREMENT: seqs are never reused, even after the newest rows go
+        f"""CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )""",
+        f"CREATE INDEX IF NOT EXISTS ix_task_change_task_id_seq ON {CHANGES_TABLE} (task_id, seq)",
+        f"""CREATE TRIGGER IF NOT EXISTS task_change_ai AFTER INSERT ON task BEGIN
+            INSERT INTO {CHANGES_TABLE}(task_id, op) VALUES (new.id, 'create');
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS task_change_au AFTER UPDATE ON task BEGIN
+            INSERT INTO {CHANGES_TABLE}(task_id, op) VALUES (new.id, 'update');
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS task_change_ad AFTER DELETE ON task BEGIN
+            INSERT INTO {CHANGES_TABLE}(task_id, op) VALUES (old.id, 'delete');
+        END""",
+    ],
+    "postgresql": [
+        f"""CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+            seq BIGSERIAL PRIMARY KEY,
+            task_id INTEGER NOT NULL,
+            op VARCHAR(8) NOT NULL,
+            changed_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+        )""",
+        f"CREATE INDEX IF NOT EXISTS ix_task_change_task_id_seq ON {CHANGES_TABLE} (task_id, seq)",
+        # entries wait here, in write order, until publish_changes numbers them
+        f"""CREATE TABLE IF NOT EXISTS {PENDING_TABLE} (
+            id BIGSERIAL PRIMARY KEY,
+            task_id INTEGER NOT NULL,
+            op VARCHAR(8) NOT NULL,
+            changed_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+        )""",
+        f"""CREATE OR REPLACE FUNCTION task_change_log() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO {PENDING_TABLE}(task_id, op) VALUES (OLD.id, 'delete');
+            ELSE
+                INSERT INTO {PENDING_TABLE}(task_id, op)
+                VALUES (NEW.id, CASE TG_OP WHEN 'INSERT' THEN 'create' ELSE 'update' END);
+            END IF;
+            RETURN NULL;
+        END
+        $$""",
+        "DROP TRIGGER IF EXISTS task_change_log ON task",
+        "CREATE TRIGGER task_change_log AFTER INSERT OR UPDATE OR DELETE ON task "
+        "FOR EACH ROW EXECUTE FUNCTION task_change_log()",
+    ],
+}
+
+DROP_CHANGES_STATEMENTS = {
+    "sqlite": [
+        "DROP TRIGGER IF EXISTS task_change_ad",
+        "DROP TRIGGER IF EXISTS task_change_au",
+        "DROP TRIGGER IF EXISTS task_change_ai",
+        f"DROP TABLE IF EXISTS {CHANGES_TABLE}",
+    ],
+    "postgresql": [
+        "DROP TRIGGER IF EXISTS task_change_log ON task",
+        "DROP FUNCTION IF EXISTS task_change_log()",
+        f"DROP TABLE IF EXISTS {PENDING_TABLE}",
+        f"DROP TABLE IF EXISTS {CHANGES_TABLE}",
+    ],
+}
+
+# PostgreSQL: move the pending entries visible (committed) now into the
+# log; seqs are drawn in write order
+PUBLISH_STATEMENT = f"""
+    WITH published AS (
+        DELETE FROM {PENDING_TABLE} RETURNING id, task_id, op, changed_at
+    )
+    INSERT INTO {CHANGES_TABLE}(task_id, op, changed_at)
+    SELECT task_id, op, changed_at FROM published ORDER BY id
+"""
+
+
+class ChangesGone(Exception):
+    """The changes after a seq were removed by retention"""
+
+    def __init__(self, since: int, horizon: int):
+        super().__init__(f"Changes up to seq {horizon} were removed; reload the tasks "
+                         f"and resume from the next seq returned by /tasks/changes")
+        self.since = since
+        self.horizon = horizon
+
+
+def create_changes(connection: Connection) -> bool:
+    '''
+    Create the task_change table and its triggers. Returns False (and does
+    nothing) on other databases.
+    '''
+    statements = CREATE_CHANGES_STATEMENTS.get(connection.dialect.name)
+    if statements is None:
+        return False
+    for statement in statements:
+        connection.execute(text(statement))
+    return True
+
+
+def drop_changes(connection: Connection) -> None:
+    '''
+    Drop the task_change table and its triggers if they exist.
+    '''
+    for statement in DROP_CHANGES_STATEMENTS.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+
+
+def publish_changes(connection: Connection) -> int:
+    '''
+    Number the committed task_change_pending entries and move them into
+    task_change, in the caller's transaction. Returns how many moved;
+    always 0 on SQLite, where the triggers write task_change directly.
+    '''
+    if connection.dialect.name != "postgresql":
+        return 0
+    # Taken in its own statement: the move then reads a snapshot taken
+    # after the previous publisher committed, and draws seqs after its
+    # seqs. The lock is held until the caller commits.
+    connection.execute(text(f"SELECT pg_advisory_xact_lock(hashtext('{CHANGES_TABLE}'))"))
+    return connection.execute(text(PUBLISH_STATEMENT)).rowcount
+
+
+def compact_changes(connection: Connection, retention_seconds: float = CHANGES_RETENTION_SECONDS,
+                    now: Optional[datetime] = None) -> Tuple[int, int]:
+    '''
+    Publish pending entries, remove superseded entries, then entries older
+    than retention_seconds (UTC now by default), leaving a truncate marker
+    at the highest removed seq.
+
+    Return: (superseded entries removed, expired entries removed)
+    '''
+    publish_changes(connection)
+    compacted = connection.execute(text(f"""
+        DELETE FROM {CHANGES_TABLE}
+        WHERE op != '{TRUNCATE}' AND EXISTS (
+            SELECT 1 FROM {CHANGES_TABLE} later
+            WHERE later.task_id = {CHANGES_TABLE}.task_id AND later.seq > {CHANGES_TABLE}.seq
+        )
+    """)).rowcount
+
+    now = now or datetime.utcnow()
+    columns = change_table.c
+    horizon = connection.execute(
+        select(func.max(columns.seq)).where(columns.changed_at < now - timedelta(seconds=retention_seconds))
+    ).scalar()
+    expired = 0
+    if horizon is not None:
+        expired = connection.execute(
+            change_table.delete().where(columns.seq <= horizon, columns.op != TRUNCATE)
+        ).rowcount
+        # earlier markers go too; only the newest horizon matters
+        connection.execute(change_table.delete().where(columns.op == TRUNCATE))
+        connection.execute(change_table.insert().values(seq=horizon, task_id=0, op=TRUNCATE, changed_at=now))
+    return compacted, expired
+
+
+def collapse(changes: List[dict]) -> List[dict]:
+    '''
+    Return: the latest of changes (in seq order) for each task, in seq
+    order
+    '''
+    latest = {change["task_id"]: change for change in changes}
+    return sorted(latest.values(), key=lambda change: change["seq"])
+
+
+# Live feeds, poked after writes in this process
+_feeds: "weakref.WeakSet[ChangeFeed]" = weakref.WeakSet()
+
+
+def notify_change() -> None:
+    '''
+    Wake the feeds' pollers after a committed write, so waiting subscribers
+    get it without waiting for the next poll
+    '''
+    for feed in list(_feeds):
+        feed.poke()
+
+
+class ChangeFeed:
+    """
+    Per-process fan-out of the change log: one poller thread reads new
+    entries into a buffer, and subscribers wait on the buffer instead of
+    querying the database.
+    """
+
+    def __init__(self, engine: Engine, poll_interval: float = CHANGES_POLL_SECONDS,
+                 buffer_size: int = CHANGES_BUFFER_SIZE,
+                 compact_interval: float = CHANGES_COMPACT_SECONDS):
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.compact_interval = compact_interval
+        self.head: Optional[int] = None
+        self._buffer: Deque[dict] = deque(maxlen=buffer_size)
+        # the buffer holds every entry after this seq
+        self._complete_after: Optional[int] = None
+        self._refresh_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._compacted_at = time.monotonic()
+        self._refreshed_at = 0.0
+        # a write in this process since the last refresh
+        self._stale = False
+        self.refreshes = 0
+        self.db_reads = 0
+        _feeds.add(self)
+
+    def _db(self, method: str, *args):
+        from app.db.database import DB
+        from app.metrics import call_db_method
+
+        with Session(self.engine) as session:
+            return call_db_method(DB(session), method, *args)
+
+    def refresh(self) -> None:
+        '''
+        Read the entries after head into the buffer and wake the
+        subscribers if there were any. Callers arriving during a refresh
+        wait for it instead of running another.
+        '''
+        if not self._refresh_lock.acquire(blocking=False):
+            with self._refresh_lock:
+                return
+        try:
+            self.refreshes += 1
+            self._stale = False
+            self._refreshed_at = time.monotonic()
+            if self.engine.dialect.name == "postgresql":
+                with self.engine.begin() as connection:
+                    publish_changes(connection)
+            if self.head is None:
+                head = self._db("change_head")
+                with self._lock:
+                    self.head = self._complete_after = head
+                return
+            head, new = self.head, []
+            while True:
+                batch = self._db("get_changes", head, self._buffer.maxlen)
+                new.extend(batch)
+                if len(batch) < self._buffer.maxlen:
+                    break
+                head = batch[-1]["seq"]
+            with self._lock:
+                for change in new:
+                    if len(self._buffer) == self._buffer.maxlen:
+                        self._complete_after = self._buffer[0]["seq"]
+                    self._buffer.append(change)
+                if new:
+                    self.head = new[-1]["seq"]
+        finally:
+            self._refresh_lock.release()
+        if new:
+            self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        with self._lock:
+            waiters, self._waiters = self._waiters, set()
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def poke(self) -> None:
+        self._stale = True
+        self._wake.set()
+
+    def _needs_refresh(self, since: Optional[int]) -> bool:
+        '''
+        Return: whether a request for the changes after since has to read
+        the log first: the buffer is empty, or since is at its head and a
+        write in this process (or poll_interval) passed since the last read
+        '''
+        if self.head is None:
+            return True
+        if since is not None and since < self.head:
+            return False
+        return self._stale or time.monotonic() - self._refreshed_at >= self.poll_interval
+
+    def _buffered(self, since: int, limit: int) -> Optional[List[dict]]:
+        '''
+        Return: up to limit buffered entries after since, or None when the
+        buffer does not reach back that far
+        '''
+        with self._lock:
+            if self._complete_after is None or since < self._complete_after:
+                return None
+            if since >= self.head:
+                return []
+            changes = []
+            for change in reversed(self._buffer):
+                if change["seq"] <= since:
+                    break
+                changes.append(change)
+        return changes[::-1][:limit]
+
+    def read(self, since: int, limit: int) -> List[dict]:
+        '''
+        Return: up to limit entries after since, from the buffer when it
+        reaches back far enough, else from the database. Raises ChangesGone
+        when retention removed entries after since.
+        '''
+        changes = self._buffered(since, limit)
+        if changes is None:
+            self.db_reads += 1
+            horizon = self._db("change_horizon")
+            if since < horizon:
+                raise ChangesGone(since, horizon)
+            changes = self._db("get_changes", since, limit)
+        return changes
+
+    async def changes(self, since: Optional[int], limit: int = 100, wait: float = 0.0) -> Tuple[List[dict], int]:
+        '''
+        Return: (changes after since, collapsed to the latest per task; the
+        seq to resume from). Waits up to wait seconds for the first change.
+        since=None returns no changes and the current head.
+        '''
+        from starlette.concurrency import run_in_threadpool
+
+        # a refresh already running wakes the waiters itself
+        if self.head is None or (self._needs_refresh(since) and not self._refresh_lock.locked()):
+            await run_in_threadpool(self.refresh)
+        if since is None:
+            return [], self.head
+
+        deadline = time.monotonic() + wait
+        while True:
+            # buffer hits are served on the event loop
+            changes = self._buffered(since, limit)
+            if changes is None:
+                changes = await run_in_threadpool(self.read, since, limit)
+            remaining = deadline - time.monotonic()
+            if changes or remaining <= 0:
+                return collapse(changes), changes[-1]["seq"] if changes else since
+            await self._wait(since, remaining)
+
+    async def _wait(self, since: int, timeout: float) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._waiters.add((loop, future))
+        self._ensure_polling()
+        try:
+            # a refresh between the caller's read and the registration
+            if self.head > since:
+                return
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard((loop, future))
+
+    def reset_after_fork(self) -> None:
+        # a lock held by a parent thread stays held in the child
+        self._refresh_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._waiters = set()
+        self._thread = None
+
+    def _ensure_polling(self) -> None:
+        # A forked worker inherits the feed but not its thread
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._poll, name="change-feed", daemon=True)
+            self._thread.start()
+
+    def _poll(self) -> None:
+        '''
+        Refresh while anyone is waiting, then stop until the next
+        subscriber arrives
+        '''
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self._lock:
+                if not self._waiters:
+                    self._thread = None
+                    return
+            try:
+                self.refresh()
+                if time.monotonic() - self._compacted_at >= self.compact_interval:
+                    self._compacted_at = time.monotonic()
+                    with self.engine.begin() as connection:
+                        compact_changes(connection)
+            except Exception:
+                # e.g. a locked database; the next poll retries
+                logger.exception("Reading the task change log failed")
+                time.sleep(self.poll_interval)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def changes_enabled(connection: Connection) -> bool:
+    '''
+    Return: True if the database behind connection has the task_change table
+    '''
+    return connection.dialect.has_table(connection, CHANGES_TABLE)
+
+
+def _after_create(target, connection, **kw):
+    create_changes(connection)
+
+
+def _before_drop(target, connection, **kw):
+    drop_changes(connection)
+
+
+event.listen(Task.__table__, "after_create", _after_create)
+event.listen(Task.__table__, "before_drop", _before_drop)
+
+
+def main() -> None:
+    from app.db.session import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--retention-seconds", type=float, default=CHANGES_RETENTION_SECONDS)
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        if not changes_enabled(connection):
+            raise SystemExit(f"No {CHANGES_TABLE} table; run the migrations first (alembic upgrade head)")
+        compacted, expired = compact_changes(connection, args.retention_seconds)
+    print(f"Removed {compacted} superseded and {expired} expired change(s) from {CHANGES_TABLE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Totals for the paginated list envelopes (?count=exact|estimated).
+
+A COUNT(*) next to every list query would double its cost, so totals come
+from the cheapest source that is good enough for the requested mode:
+
+  exact     - the task_stats counters when the filter maps to one of them
+              (no filter, status only, priority only), otherwise COUNT(*)
+              over the same filter or search match
+  estimated - the counters for those filters; for status and priority
+              together, total * P(status) * P(priority) from the counters;
+              for searches, a COUNT(*) cached per engine and text for
+              COUNT_CACHE_TTL seconds
+
+A page that is not followed by another one already tells the exact total,
+so no count runs for it in either mode (see page_total).
+"""
+import os
+import weakref
+from typing import Callable
+
+from sqlalchemy.engine import Engine
+
+from app.db.cache import LRUCache
+
+COUNT_MODES = ("exact", "estimated")
+
+COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "1024"))
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+
+# engine -> search text -> {"total": matches}; expiry only, writes do not
+# invalidate, which is what makes the search estimate cheap
+_search_counts: "weakref.WeakKeyDictionary[Engine, LRUCache]" = weakref.WeakKeyDictionary()
+
+
+def validate_count_mode(count: str) -> None:
+    if count not in COUNT_MODES:
+        raise ValueError(f"Invalid count '{count}'. Valid values are: {', '.join(COUNT_MODES)}")
+
+
+def search_count_cache(engine: Engine) -> LRUCache:
+    '''
+    Return: the cache of search match counts for engine
+    '''
+    if engine not in _search_counts:
+        _search_counts[engine] = LRUCache(maxsize=COUNT_CACHE_SIZE, ttl=COUNT_CACHE_TTL)
+    return _search_counts[engine]
+
+
+def independent_estimate(total: int, status_count: int, priority_count: int) -> int:
+    '''
+    Return: the expected number of tasks with both a status and a priority,
+    treating the two as independent
+    '''
+    if not total:
+        return 0
+    return round(status_count * priority_count / total)
+
+
+def page_total(skip: int, returned: int, has_more: bool, count: Callable[[], int]) -> int:
+    '''
+    Return: the total to report for a page of returned items at offset skip.
+    A last page that is not empty (or starts at 0) ends at the total, so
+    count() only runs when the page cannot tell; its result is then kept
+    consistent with the page, so an estimate never contradicts has_more.
+    '''
+    if not has_more and (returned or not skip):
+        return skip + returned
+    if not has_more:
+        return min(count(), skip)
+    return max(count(), skip + returned + 1)
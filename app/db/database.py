@@ -1,79 +1,325 @@
 from fastapi import HTTPException
-from sqlmodel import Session, select, update, delete, case, func, or_
+from sqlmodel import Session, select, insert, update, delete, func, or_
+from sqlalchemy import tuple_, literal_column, and_, table, column, bindparam, text, cast, Integer
 from app.models.Task import Task, TaskPriority, TaskStatus
+from app.models.Task import PRIORITY_RANK, STATUS_RANK, PRIORITY_RANK_SQL, STATUS_RANK_SQL, OPEN_STATUSES
 from app.schemas import task
-from typing import Optional, List
-from app.schemas.task import TaskCreate, TaskUpdate
+from app.db.pagination import encode_cursor, decode_cursor
+from app.db.fts import FTS_TABLE, build_match_query, fts_enabled
+from app.db.stats import COUNT_STATEMENT, STATS_TABLE, stats_enabled
+from app.db.changes import TRUNCATE, change_table, changes_enabled, notify_change
+from app.db.counting import independent_estimate, page_total, search_count_cache, validate_count_mode
+from app.db.cache import CacheBackend
+from app.db.batching import BULK_CHUNK_SIZE, bound_parameter_limit, chunked, rows_per_statement
+from app.db import postgres
+from itertools import groupby
+from typing import Any, Iterable, Iterator, Optional, List, Sequence, Tuple
+from app.schemas.task import TaskCreate, TaskUpdate, TaskResponse
 from datetime import datetime, timezone
 
+fts_table = table(FTS_TABLE, column("rowid"))
+stats_table = table(STATS_TABLE, column("dimension"), column("value"), column("count"))
+# A counter may be spread over several rows (PostgreSQL delta rows); SUM
+# returns NUMERIC there, hence the cast
+stats_count = cast(func.sum(stats_table.c.count), Integer)
+# Sort fields that can be NULL; they sort NULLs first on every backend
+NULLABLE_SORT_FIELDS = {"due_date"}
+
 
 class DB:
-    def __init__(self, session: Session):
-        """Instatiate the engine """
+    def __init__(self, session: Session, cache: Optional[CacheBackend] = None):
+        """Instatiate the engine, optionally with a read-through cache for get_task"""
         self.__session = session
+        self.__cache = cache
     
-    def create_task(self, task_data: TaskCreate) -> Task:
-        """Add task object to current database session"""
-        db_task = Task(**task_data.model_dump())
-        self.__session.add(db_task)
+    def _invalidate(self, task_ids: Iterable[int]) -> None:
+        """Drop cached copies of tasks after a committed write and wake the change feeds"""
+        if self.__cache is not None:
+            self.__cache.delete_many(task_ids)
+        notify_change()
+
+    def _write_one(self, statement) -> Optional[Task]:
+        """
+        Run a single-row INSERT/UPDATE ... RETURNING task and commit.
+        The returned task is detached before the commit, so it keeps the
+        RETURNING values instead of being expired and reloaded.
+        """
+        db_task = self.__session.exec(statement).scalar_one_or_none()
+        if db_task is not None:
+            self.__session.expunge(db_task)
         self.__session.commit()
-        self.__session.refresh(db_task)
         return db_task
 
+    @staticmethod
+    def create_statement(task_data: TaskCreate):
+        """The INSERT ... RETURNING statement of create_task"""
+        return insert(Task).values(**task_data.model_dump()).returning(Task)
+
+    def create_task(self, task_data: TaskCreate) -> Task:
+        """Insert a task with one INSERT ... RETURNING statement"""
+        db_task = self._write_one(self.create_statement(task_data))
+        self._invalidate([db_task.id])
+        return db_task
+
+    def bulk_create_tasks(self, tasks: List[TaskCreate],
+                          chunk_size: int = BULK_CHUNK_SIZE) -> List[int]:
+        """
+        Insert many tasks in one transaction, up to chunk_size rows per
+        multi-row INSERT ... RETURNING id statement (fewer if the backend's
+        bound-parameter limit requires it). On PostgreSQL all rows are
+        streamed with one COPY instead, and chunk_size is not used.
+        Returns the new task IDs in the order the tasks were given.
+        """
+        if not tasks:
+            raise HTTPException(status_code=400, detail="No tasks provided for bulk create.")
+        if chunk_size < 1:
+            raise HTTPException(status_code=400, detail="chunk_size must be at least 1.")
+
+        created_at = datetime.utcnow()
+        rows = [{**task_data.model_dump(), "created_at": created_at} for task_data in tasks]
+        statement = insert(Task).returning(Task.id)
+        connection = self.__session.connection()
+        limit = bound_parameter_limit(connection)
+
+        ids = []
+        try:
+            if connection.dialect.name == "postgresql":
+                ids = postgres.copy_tasks(connection, rows)
+            else:
+                for chunk in chunked(rows, rows_per_statement(chunk_size, len(rows[0]), limit)):
+                    result = self.__session.exec(statement, params=chunk)
+                    # SQLite hands out rowids in VALUES order within a statement,
+                    # but does not promise RETURNING comes back in that order
+                    ids.extend(sorted(result.scalars().all()))
+            self.__session.commit()
+        except Exception:
+            self.__session.rollback()
+            raise
+        self._invalidate(ids)
+        return ids
+
+    @staticmethod
+    def _response_columns(fields: Optional[Sequence[str]] = None) -> list:
+        """Task columns backing TaskResponse in its field order, or just fields"""
+        return [getattr(Task, name) for name in (fields or TaskResponse.model_fields)]
+
+    @staticmethod
+    def _with_fields(fields: Optional[Sequence[str]], *required: str) -> Optional[Tuple[str, ...]]:
+        """fields plus the required columns it lacks; None (all columns) stays None"""
+        if fields is None:
+            return None
+        return tuple(fields) + tuple(name for name in required if name not in fields)
+
+    def _fetch(self, statement, as_rows: bool = False, fields: Optional[Sequence[str]] = None) -> list:
+        """
+        Run a select(Task) query. With as_rows only the TaskResponse columns
+        are selected and returned as row tuples, without building ORM objects.
+        fields (TaskResponse field names) narrows the selection further and
+        implies as_rows.
+        """
+        if as_rows or fields:
+            columns = self._response_columns(fields)
+            # execute, not exec: exec would reduce rows of a select(Task) to scalars
+            return self.__session.execute(statement.with_only_columns(*columns)).all()
+        return self.__session.exec(statement).all()
+
     def get_tasks_pagination_and_filter(self, skip: int = 0, limit: int = 10,
                   priority: Optional[TaskPriority] = None,
-                  status: Optional[TaskStatus] = None) -> List[Task]:
+                  status: Optional[TaskStatus] = None, as_rows: bool = False,
+                  fields: Optional[Sequence[str]] = None) -> List[Task]:
+        """
+        OFFSET pagination, optionally filtered by priority and/or status.
         """
+        statement = select(Task).where(*self._task_filters(priority, status)).offset(skip).limit(limit)
+        return self._fetch(statement, as_rows, fields)
 
+    @staticmethod
+    def _task_filters(priority: Optional[TaskPriority] = None,
+                      status: Optional[TaskStatus] = None) -> list:
+        """WHERE clauses of the priority / status list filters"""
+        filters = []
+        if priority:
+            filters.append(Task.priority == priority)
+        if status:
+            filters.append(Task.status == status)
+        return filters
+
+    def get_tasks_page(self, skip: int = 0, limit: int = 10,
+                       priority: Optional[TaskPriority] = None,
+                       status: Optional[TaskStatus] = None, as_rows: bool = False,
+                       fields: Optional[Sequence[str]] = None,
+                       count: Optional[str] = None) -> Tuple[List[Task], bool, Optional[int]]:
         """
-        statement = select(Task).offset(skip).limit(limit)
-        if not priority and not status:
-            return self.__session.exec(statement).all()
-        
-        if priority and not status:
-            statement = statement.where(Task.priority == priority)
-            
-        if status and not priority:
-            statement = statement.where(Task.status == status)
+        OFFSET page for the list envelope: fetches limit + 1 rows to tell
+        whether another page exists, and with count ("exact" or "estimated")
+        the total number of matching tasks.
+        Returns the page, has_more and the total (None without count).
+        """
+        if count is not None:
+            validate_count_mode(count)
+        tasks = self.get_tasks_pagination_and_filter(skip, limit + 1, priority, status, as_rows, fields)
+        has_more = len(tasks) > limit
+        tasks = tasks[:limit]
+        if count is None:
+            return tasks, has_more, None
+        return tasks, has_more, page_total(skip, len(tasks), has_more,
+                                           lambda: self.count_tasks(priority, status, count))
 
-        statement = statement.where(Task.priority == priority, Task.status == status)
-        return self.__session.exec(statement).all()
+    def count_tasks(self, priority: Optional[TaskPriority] = None,
+                    status: Optional[TaskStatus] = None, count: str = "exact") -> int:
+        """
+        Number of tasks matching the list filters. Reads the task_stats
+        counters where one covers the filter; with both filters an
+        "estimated" count combines the counters, an "exact" one counts the
+        (status, priority, id) index.
+        """
+        validate_count_mode(count)
+        if stats_enabled(self.__session.connection()):
+            if not (priority and status):
+                if status:
+                    key = ("status", TaskStatus(status).value)
+                elif priority:
+                    key = ("priority", TaskPriority(priority).value)
+                else:
+                    key = ("total", "")
+                return self._counters(key).get(key, 0)
+            if count == "estimated":
+                keys = [("total", ""), ("status", TaskStatus(status).value),
+                        ("priority", TaskPriority(priority).value)]
+                counters = self._counters(*keys)
+                return independent_estimate(*(counters.get(key, 0) for key in keys))
+
+        return self.__session.exec(
+            select(func.count()).select_from(Task).where(*self._task_filters(priority, status))
+        ).one()
+
+    def _counters(self, *keys: Tuple[str, str]) -> dict:
+        """task_stats counts of the given (dimension, value) keys"""
+        rows = self.__session.execute(
+            select(stats_table.c.dimension, stats_table.c.value, stats_count)
+            .where(tuple_(stats_table.c.dimension, stats_table.c.value).in_(keys))
+            .group_by(stats_table.c.dimension, stats_table.c.value)
+        )
+        return {(dimension, value): count for dimension, value, count in rows}
+
+    def get_tasks_keyset(self, cursor: str = "", limit: int = 10,
+                         priority: Optional[TaskPriority] = None,
+                         status: Optional[TaskStatus] = None,
+                         order_by: str = "id", as_rows: bool = False,
+                         fields: Optional[Sequence[str]] = None) -> Tuple[List[Task], Optional[str]]:
+        """
+        Cursor (keyset) pagination: seek past the (sort key, id) of the
+        previous page instead of scanning and discarding OFFSET rows.
+        Returns the page and the cursor for the next one (None on the last page).
+        """
+        keyset_fields = {
+            "id": Task.id,
+            "created_at": Task.created_at,
+        }
+        if order_by not in keyset_fields:
+            raise ValueError(
+                f"Invalid order_by '{order_by}'. Valid fields are: {', '.join(keyset_fields.keys())}"
+            )
+        sort_column = keyset_fields[order_by]
+
+        statement = select(Task).where(*self._task_filters(priority, status))
+
+        position = decode_cursor(cursor, order_by)
+        if position:
+            value, last_id = position
+            if order_by == "id":
+                statement = statement.where(Task.id > last_id)
+            else:
+                statement = statement.where(tuple_(sort_column, Task.id) > tuple_(value, last_id))
+
+        if order_by == "id":
+            statement = statement.order_by(Task.id)
+        else:
+            statement = statement.order_by(sort_column, Task.id)
+
+        # Fetch one extra row to know whether another page exists
+        # the next cursor is built from the last row's sort key and id
+        fields = self._with_fields(fields, order_by, "id")
+        tasks = self._fetch(statement.limit(limit + 1), as_rows, fields)
+        if len(tasks) <= limit:
+            return tasks, None
+
+        tasks = tasks[:limit]
+        last = tasks[-1]
+        return tasks, encode_cursor(order_by, getattr(last, order_by), last.id)
 
     def get_task(self, task_id: int) -> Optional[Task]:
-        """Query task object in tasks based on task_id"""
-        return self.__session.get(Task, task_id)
+        """
+        Query task object in tasks based on task_id, through the cache when
+        one is configured. Cache hits return a detached copy of the task.
+        """
+        if self.__cache is None:
+            return self.__session.get(Task, task_id)
 
-    def update_task(self, task_id: int, updates: TaskUpdate) -> Optional[Task]:
-        """Query and update task object based on task_id"""
-        db_task = self.get_task(task_id)
-        if not db_task:
-            return None
-        
+        cached = self.__cache.get(task_id)
+        if cached is not None:
+            return Task.model_validate(cached)
+
+        # taken before the read: a write invalidating the task meanwhile
+        # keeps this (possibly older) row out of the cache
+        token = self.__cache.begin_fill(task_id)
+        db_task = self.__session.get(Task, task_id)
+        if db_task is not None:
+            self.__cache.fill(task_id, db_task.model_dump(), token)
+        return db_task
+
+    def get_task_version(self, task_id: int) -> Optional[Tuple[int, datetime]]:
+        """
+        Return (id, updated_at or created_at) of a task without loading the
+        full row, or None if it does not exist. Used for ETag checks.
+        """
+        if self.__cache is not None:
+            cached = self.__cache.get(task_id)
+            if cached is not None:
+                version = Task.model_validate(cached)
+                return version.id, version.updated_at or version.created_at
+
+        statement = select(Task.id, func.coalesce(Task.updated_at, Task.created_at)).where(Task.id == task_id)
+        row = self.__session.exec(statement).first()
+        return tuple(row) if row is not None else None
+
+    @staticmethod
+    def update_statement(task_id: int, updates: TaskUpdate):
+        """The UPDATE ... RETURNING statement of update_task"""
         update_data = updates.model_dump(exclude_unset=True)
         update_data["updated_at"] = datetime.now(timezone.utc)
 
-        for key, val in update_data.items():
-            setattr(db_task, key, val)
-        
-        self.__session.add(db_task)
-        self.__session.commit()
-        self.__session.refresh(db_task)
+        return (
+            update(Task)
+            .where(Task.id == task_id)
+            .values(**update_data)
+            .returning(Task)
+            # load the stored row over any copy already in the session
+            .execution_options(populate_existing=True)
+        )
+
+    def update_task(self, task_id: int, updates: TaskUpdate) -> Optional[Task]:
+        """Update task based on task_id with one UPDATE ... RETURNING statement"""
+        db_task = self._write_one(self.update_statement(task_id, updates))
+        if db_task is None:
+            return None
+        self._invalidate([task_id])
 
         return db_task
 
     def delete_task(self, task_id: int) -> bool:
-        """Delete object from the current database session"""
-        db_task = self.get_task(task_id)
-        if not db_task:
-            return False
-        
-        self.__session.delete(db_task)
+        """Delete task based on task_id with one DELETE statement"""
+        result = self.__session.exec(delete(Task).where(Task.id == task_id))
         self.__session.commit()
+        if result.rowcount == 0:
+            return False
+        self._invalidate([task_id])
 
         return True
     
-    def sort_tasks(self, field: str) -> List[Task]:
-        """Sort tasks based on a given field"""
+    @staticmethod
+    def _sort_expression(field: str) -> Tuple[str, Any]:
+        """Validate a sort field and return it with its ORDER BY expression"""
         field = field.lower()
         valid_fields = {
             "title": Task.title,
@@ -89,134 +335,405 @@ class DB:
                 detail=f"Invalid field '{field}' for sorting. Valid fields are: {', '.join(valid_fields.keys())}"
             )
         
-        order_expr = valid_fields[field]
-
+        # Rank expressions match the expression indexes on Task, so the
+        # ordering is served by an index walk instead of a temp B-tree sort
         if field == "priority":
-            order_expr = case(
-                (Task.priority == TaskPriority.urgent, 1),
-                (Task.priority == TaskPriority.high, 2),
-                (Task.priority == TaskPriority.medium, 3),
-                (Task.priority == TaskPriority.low, 4),
-                else_=5
-            )
+            return field, literal_column(PRIORITY_RANK_SQL)
         
         elif field == "status":
-            order_expr = case(
-                (Task.status == TaskStatus.pending, 1),
-                (Task.status == TaskStatus.in_progress, 2),
-                (Task.status == TaskStatus.completed, 3),
-                (Task.status == TaskStatus.cancelled, 4),
-                else_=5
-            )
+            return field, literal_column(STATUS_RANK_SQL)
         
-        statement = select(Task).order_by(order_expr)
-        sorted_tasks = self.__session.exec(statement).all()
+        return field, valid_fields[field]
+
+    @staticmethod
+    def _sort_order(field: str, order_expr: Any) -> Tuple[Any, Any]:
+        """ORDER BY clauses of a sort: the sort expression, then id"""
+        # SQLite puts NULLs first in ascending order and PostgreSQL last;
+        # sorts and keyset cursors assume first on both
+        if field in NULLABLE_SORT_FIELDS:
+            order_expr = order_expr.nulls_first()
+        return order_expr, Task.id
+
+    @staticmethod
+    def _sort_value(task: Task, field: str) -> Any:
+        """Value of the ORDER BY expression for a task, as stored in a cursor"""
+        if field == "priority":
+            return PRIORITY_RANK[task.priority]
+        if field == "status":
+            return STATUS_RANK[task.status]
+        return getattr(task, field)
+
+    def sort_tasks(self, field: str, limit: Optional[int] = None, as_rows: bool = False,
+                   fields: Optional[Sequence[str]] = None) -> List[Task]:
+        """Sort tasks based on a given field, returning at most limit tasks"""
+        field, order_expr = self._sort_expression(field)
+        
+        statement = select(Task).order_by(*self._sort_order(field, order_expr))
+        if limit is not None:
+            statement = statement.limit(limit)
+        sorted_tasks = self._fetch(statement, as_rows, fields)
 
         if not sorted_tasks:
             raise HTTPException(status_code=404, detail="No tasks found to sort.")
         
         return sorted_tasks
+
+    def sort_tasks_keyset(self, field: str, cursor: str = "", limit: int = 100, as_rows: bool = False,
+                          fields: Optional[Sequence[str]] = None) -> Tuple[List[Task], Optional[str]]:
+        """
+        Sorted tasks with cursor (keyset) pagination on (sort expression, id).
+        Returns the page and the cursor for the next one (None on the last page).
+        """
+        field, order_expr = self._sort_expression(field)
+        statement = select(Task)
+
+        position = decode_cursor(cursor, field)
+        if position:
+            value, last_id = position
+            if value is None:
+                # NULL due dates sort first; continue within them, then the rest
+                statement = statement.where(or_(
+                    and_(order_expr.is_(None), Task.id > last_id),
+                    order_expr.is_not(None)
+                ))
+            else:
+                statement = statement.where(tuple_(order_expr, Task.id) > tuple_(value, last_id))
+
+        statement = statement.order_by(*self._sort_order(field, order_expr)).limit(limit + 1)
+        tasks = self._fetch(statement, as_rows, self._with_fields(fields, field, "id"))
+        if len(tasks) <= limit:
+            return tasks, None
+
+        tasks = tasks[:limit]
+        last = tasks[-1]
+        return tasks, encode_cursor(field, self._sort_value(last, field), last.id)
+
+    def stream_sorted_tasks(self, field: str, chunk_size: int = 500,
+                            fields: Optional[Sequence[str]] = None) -> Iterator[List[dict]]:
+        """
+        Iterate over every task in sort order as chunks of plain dicts, fetched
+        with yield_per so only one chunk of rows is held in memory at a time.
+        Only the TaskResponse columns (or just fields) are selected; no ORM
+        objects are built.
+        """
+        return self._iter_partitions(self.sorted_rows_statement(field, chunk_size, fields))
+
+    @classmethod
+    def sorted_rows_statement(cls, field: str, chunk_size: int = 500,
+                              fields: Optional[Sequence[str]] = None):
+        """Column query behind stream_sorted_tasks, fetched chunk_size rows at a time"""
+        field, order_expr = cls._sort_expression(field)
+        return (
+            select(*cls._response_columns(fields))
+            .order_by(*cls._sort_order(field, order_expr))
+            .execution_options(yield_per=chunk_size)
+        )
+
+    def _iter_partitions(self, statement) -> Iterator[List[dict]]:
+        """Yield each yield_per partition of a column query as a list of dicts"""
+        # execute, not exec: exec would reduce a single-column select to scalars
+        result = self.__session.execute(statement)
+        try:
+            for partition in result.partitions():
+                yield [dict(row._mapping) for row in partition]
+        finally:
+            result.close()
+            # A streamed body outlives the request's session dependency;
+            # release the connection it reopened once the stream is done
+            self.__session.close()
     
-    def search_tasks(self, text: str, skip: int = 0, limit: int = 10) -> List[Task]:
+    def search_tasks(self, text: str, skip: int = 0, limit: int = 10, as_rows: bool = False,
+                     fields: Optional[Sequence[str]] = None) -> List[Task]:
+        """
+        Search tasks by text in title or description with pagination.
+        Uses the ranked FTS5 index when the database has one, otherwise
+        falls back to a case-insensitive LIKE scan.
+        """
+        statement = self._search_statement(text)
+        tasks = self._fetch(statement.offset(skip).limit(limit), as_rows, fields)
+
+        if not tasks:
+            raise HTTPException(status_code=404, detail="No Task Found")
+        
+        return tasks
+
+    def search_tasks_page(self, text: str, skip: int = 0, limit: int = 10, as_rows: bool = False,
+                          fields: Optional[Sequence[str]] = None,
+                          count: Optional[str] = None) -> Tuple[List[Task], bool, Optional[int]]:
         """
-        Search tasks by text in title or description with pagination
+        search_tasks for the list envelope; see get_tasks_page.
+        """
+        if count is not None:
+            validate_count_mode(count)
+        tasks = self.search_tasks(text, skip, limit + 1, as_rows, fields)
+        has_more = len(tasks) > limit
+        tasks = tasks[:limit]
+        if count is None:
+            return tasks, has_more, None
+        return tasks, has_more, page_total(skip, len(tasks), has_more,
+                                           lambda: self.count_search(text, count))
+
+    def count_search(self, text: str, count: str = "exact") -> int:
+        """
+        Number of tasks matching a search. An "estimated" count may come
+        from the per-engine cache of recent counts (COUNT_CACHE_TTL).
+        """
+        validate_count_mode(count)
+        statement = select(func.count()).select_from(
+            self._search_statement(text).order_by(None).subquery()
+        )
+        if count == "exact":
+            return self.__session.exec(statement).one()
+
+        cache = search_count_cache(self.__session.connection().engine)
+        cached = cache.get(text)
+        if cached is not None:
+            return cached["total"]
+        total = self.__session.exec(statement).one()
+        cache.set(text, {"total": total})
+        return total
+
+    def _search_statement(self, text: str):
+        """
+        Ranked FTS5 match (SQLite) or tsvector match (PostgreSQL) when the
+        database has the index, otherwise a case-insensitive LIKE scan
         """
         if not text:
             raise HTTPException(status_code=400, detail="Search text cannot be empty.")
-        
-        from sqlalchemy import func as sa_func
+        connection = self.__session.connection()
+        if fts_enabled(connection):
+            return self._fts_search_statement(text)
+        if postgres.search_enabled(connection):
+            return self._tsvector_search_statement(text)
+        return self._like_search_statement(text)
+
+    @staticmethod
+    def _fts_search_statement(text: str):
+        """Ranked FTS5 match: terms, `prefix*` and `"phrases"`, best bm25 first"""
+        try:
+            match_query = build_match_query(text)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
+        fts = literal_column(FTS_TABLE)
+        # bm25 is lower for better matches; title hits weigh twice description hits
+        rank = func.bm25(fts, 2.0, 1.0)
+        return (
+            select(Task)
+            .join(fts_table, fts_table.c.rowid == Task.id)
+            .where(fts.op("MATCH")(match_query))
+            .order_by(rank, Task.id)
+        )
+
+    @staticmethod
+    def _tsvector_search_statement(text: str):
+        """Ranked tsvector match with the same syntax, best ts_rank_cd first"""
+        try:
+            query = postgres.build_tsquery(text)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        vector = postgres.search_vector()
+        # title lexemes carry weight A, description lexemes B
+        return (
+            select(Task)
+            .where(vector.op("@@")(query))
+            .order_by(func.ts_rank_cd(vector, query).desc(), Task.id)
+        )
+
+    @staticmethod
+    def _like_search_statement(text: str):
+        """Substring match for databases without the FTS5 index"""
         # Escape LIKE wildcards for literal search
         escaped_text = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
 
-        statement = (
+        return (
             select(Task)
             .where(
                 or_(
                     func.lower(Task.title).like(f"%{escaped_text.lower()}%", escape='\\'),
-                    func.lower(sa_func.coalesce(Task.description, '')).like(f"%{escaped_text.lower()}%", escape='\\')
+                    func.lower(func.coalesce(Task.description, '')).like(f"%{escaped_text.lower()}%", escape='\\')
                 )
             )
-            .offset(skip)
-            .limit(limit)
         )
-
-        tasks = self.__session.exec(statement).all()
-
-        if not tasks:
-            raise HTTPException(status_code=404, detail="No Task Found")
-        
-        return tasks
     
-    def bulk_update_tasks(self, task_updates: List[dict]) -> int:
+    def get_task_stats(self, now: Optional[datetime] = None) -> dict:
         """
-        Bulk update multiple tasks based on provided task IDs and update data.
-        Each dict in tasks should have 'task_id' and fields to update.
+        Task counts by status, priority and assignee, read from the task_stats
+        counters (GROUP BY over task when the table is missing), plus the
+        number of open tasks due before now (UTC, default the current time).
         """
-        if not task_updates:
-            raise HTTPException(status_code=400, detail="No tasks provided for bulk update.")
-        
-        ids = []
-        fields_to_update = set()
-
-        for task_data in task_updates:
-            task_id = task_data.get("id")
-            if not task_id:
-                continue
-
-            ids.append(task_data.get("id"))
+        if stats_enabled(self.__session.connection()):
+            statement = (
+                select(stats_table.c.dimension, stats_table.c.value, stats_count)
+                .group_by(stats_table.c.dimension, stats_table.c.value)
+                .having(stats_count != 0)
+            )
+        else:
+            statement = text(COUNT_STATEMENT)
 
-        for task_data in task_updates:
-            for key in task_data.keys():
-                if key != "id":
-                    fields_to_update.add(key)
+        stats = {
+            "total": 0,
+            "by_status": {member: 0 for member in TaskStatus},
+            "by_priority": {member: 0 for member in TaskPriority},
+            "by_assignee": {},
+            "unassigned": 0,
+        }
+        for dimension, value, count in self.__session.execute(statement):
+            if dimension == "total":
+                stats["total"] = count
+            elif dimension == "assignee":
+                if value:
+                    stats["by_assignee"][value] = count
+                else:
+                    stats["unassigned"] = count
+            else:
+                stats[f"by_{dimension}"][value] = count
 
-        # Build a CASE expression for each field
-        cases = {}
+        # A range seek per open status on ix_task_status_due_date: only the
+        # overdue entries are visited
+        now = now or datetime.utcnow()
+        stats["overdue"] = self.__session.exec(
+            select(func.count())
+            .select_from(Task)
+            .where(Task.status.in_(OPEN_STATUSES), Task.due_date < now)
+        ).one()
+        return stats
 
-        for field in fields_to_update:
-            # For this field, create a mapping: task_id -> new_value
-            id_value_pairs = [ 
-                (task_data["id"], task_data[field])
-                for task_data in task_updates
-                if field in task_data
-            ]
+    def change_head(self) -> int:
+        """
+        The highest seq in the task_change log, 0 when it is empty. Raises
+        503 when the database has no log (migrations not applied).
+        """
+        if not changes_enabled(self.__session.connection()):
+            raise HTTPException(status_code=503, detail="No task change log; run alembic upgrade head")
+        return self.__session.execute(select(func.coalesce(func.max(change_table.c.seq), 0))).scalar_one()
 
-            cases[field] = case(*id_value_pairs, else_=getattr(Task, field))
+    def change_horizon(self) -> int:
+        """The highest seq removed by retention, 0 when none was"""
+        # The truncate marker has task_id 0, a seek on (task_id, seq)
+        return self.__session.execute(
+            select(func.coalesce(func.max(change_table.c.seq), 0))
+            .where(change_table.c.task_id == 0, change_table.c.op == TRUNCATE)
+        ).scalar_one()
 
-        # Apply CASE WHEN logic for each field
+    def get_changes(self, since: int, limit: int = 100) -> List[dict]:
+        """
+        Up to limit task_change entries after seq since, in seq order, as
+        dicts of seq, op, task_id, changed_at and task: the task's current
+        TaskResponse columns, or None once it is deleted.
+        """
+        columns = self._response_columns()
         statement = (
-            update(Task)
-            .where(Task.id.in_(ids))
-            .values(
-                **cases,
-                updated_at=datetime.now(timezone.utc)
-            )
+            select(change_table, *columns)
+            .select_from(change_table.outerjoin(Task, Task.id == change_table.c.task_id))
+            .where(change_table.c.seq > since, change_table.c.op != TRUNCATE)
+            .order_by(change_table.c.seq)
+            .limit(limit)
         )
+        changes = []
+        for row in self.__session.execute(statement):
+            seq, task_id, op, changed_at, *values = row
+            task_values = dict(zip(TaskResponse.model_fields, values))
+            exists = op != "delete" and task_values["id"] is not None
+            changes.append({"seq": seq, "op": op, "task_id": task_id, "changed_at": changed_at,
+                            "task": task_values if exists else None})
+        return changes
 
-        result = self.__session.exec(statement)
-        self.__session.commit()
+    def bulk_update_tasks(self, task_updates: List[dict], chunk_size: int = BULK_CHUNK_SIZE,
+                          atomic: bool = True) -> int:
+        """
+        Bulk update multiple tasks based on provided task IDs and update data.
+        Each dict in task_updates should have 'id' and the fields to update.
+
+        Updates run as executemany UPDATE ... WHERE id = ?, one statement per
+        run of items updating the same fields, chunk_size items at a time.
+        On PostgreSQL each run is a single UPDATE ... FROM (VALUES ...)
+        instead.
+        atomic=True commits once at the end; atomic=False commits after every
+        chunk, so a long batch never holds the write lock for its whole run
+        and a failure keeps the chunks committed before it.
+        Returns the number of tasks updated.
+        """
+        if not task_updates:
+            raise HTTPException(status_code=400, detail="No tasks provided for bulk update.")
+        if chunk_size < 1:
+            raise HTTPException(status_code=400, detail="chunk_size must be at least 1.")
 
-        return result.rowcount
+        task_updates = [task_data for task_data in task_updates if task_data.get("id")]
+        updated_at = datetime.now(timezone.utc)
+        table = Task.__table__
+        connection = self.__session.connection()
+        postgres_rows = connection.dialect.name == "postgresql"
+        limit = bound_parameter_limit(connection)
+        updated = 0
+        try:
+            for chunk in chunked(task_updates, chunk_size):
+                # Consecutive items setting the same fields share one statement
+                for fields, items in groupby(chunk, key=lambda item: tuple(k for k in item if k != "id")):
+                    if postgres_rows:
+                        # params: id and fields per VALUES row, plus updated_at
+                        items = list(items)
+                        for part in chunked(items, rows_per_statement(len(items), len(fields) + 1, limit - 1)):
+                            statement = postgres.update_from_values(table, fields, part, updated_at)
+                            updated += self.__session.exec(statement).rowcount
+                        continue
+                    statement = (
+                        update(table)
+                        .where(table.c.id == bindparam("_id"))
+                        .values(**{field: bindparam(field) for field in fields}, updated_at=updated_at)
+                    )
+                    params = [{**{field: item[field] for field in fields}, "_id": item["id"]}
+                              for item in items]
+                    updated += self.__session.exec(statement, params=params).rowcount
+                if not atomic:
+                    self.__session.commit()
+                    self._invalidate(item["id"] for item in chunk)
+            self.__session.commit()
+        except Exception:
+            self.__session.rollback()
+            raise
+        if atomic:
+            # non-atomic runs invalidated each chunk after its commit
+            self._invalidate(item["id"] for item in task_updates)
 
+        return updated
 
-    def bulk_delete_tasks(self, task_ids: List[int]) -> int:
+
+    def bulk_delete_tasks(self, task_ids: List[int], chunk_size: int = BULK_CHUNK_SIZE,
+                          atomic: bool = True) -> int:
         """
-        Bulk delete multiple tasks based on provided task IDs.
+        Bulk delete multiple tasks based on provided task IDs, with one
+        DELETE ... WHERE id IN (...) per chunk of at most chunk_size IDs
+        (fewer if the backend's bound-parameter limit requires it).
+        atomic works as in bulk_update_tasks.
         Returns the number of tasks deleted.
         """
         if not task_ids:
             raise HTTPException(status_code=400, detail="No task IDs provided for bulk delete.")
-        
-        statement = (
-            delete(Task)
-            .where(Task.id.in_(task_ids))
-        )
-        
-        result = self.__session.exec(statement)
-        self.__session.commit()
+        if chunk_size < 1:
+            raise HTTPException(status_code=400, detail="chunk_size must be at least 1.")
 
-        if result.rowcount == 0:
+        limit = bound_parameter_limit(self.__session.connection())
+        deleted = 0
+        try:
+            for chunk in chunked(task_ids, rows_per_statement(chunk_size, 1, limit)):
+                statement = (
+                    delete(Task)
+                    .where(Task.id.in_(chunk))
+                )
+                deleted += self.__session.exec(statement).rowcount
+                if not atomic:
+                    self.__session.commit()
+                    self._invalidate(chunk)
+            self.__session.commit()
+        except Exception:
+            self.__session.rollback()
+            raise
+        if atomic:
+            self._invalidate(task_ids)
+
+        if deleted == 0:
             raise HTTPException(status_code=404, detail="No matching tasks found.")
 
-        return result.rowcount
\ No newline at end of file
+        return deleted
@@ -1,9 +1,124 @@
-from fastapi import Depends
+import os
+import time
+from fastapi import Depends, Request
 from sqlmodel import Session
-from .session import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from .session import engine, get_session, get_async_session
 from .database import DB
+from .async_database import AsyncDB
+from .cache import ReadOnlyCache, task_cache
+from .changes import ChangeFeed
+from .group_commit import GROUP_COMMIT, GroupCommitDB, GroupCommitWriter
+from .replicas import ReplicaRoutedDB, ReplicaSet, last_write, mark_write, replicas_from_env
+from app.metrics import THREADPOOL_WAIT, call_db_method
+from app.profiling import profile_in_thread
+
+
+# One change feed per process, on the primary so it never lags the writes
+# it announces (app.db.changes)
+change_feed = ChangeFeed(engine)
+os.register_at_fork(after_in_child=change_feed.reset_after_fork)
+
+
+def get_change_feed() -> ChangeFeed:
+    """Dependency that returns the process's change feed"""
+    return change_feed
 
 
 def get_db(session: Session = Depends(get_session)) -> DB:
     """Dependency that returns DB instance"""
-    return DB(session)
\ No newline at end of file
+    return DB(session, task_cache)
+
+
+async def get_async_db(session: AsyncSession = Depends(get_async_session)) -> AsyncDB:
+    """Dependency that returns AsyncDB instance"""
+    return AsyncDB(session, task_cache)
+
+
+class ThreadpoolDB:
+    """
+    Awaitable view of the sync DB for the async routes: every method call
+    runs on Starlette's threadpool, as the sync route handlers used to.
+    """
+
+    def __init__(self, db: DB):
+        self.__db = db
+
+    def __getattr__(self, name: str):
+        getattr(self.__db, name)  # AttributeError here, not on the threadpool
+
+        def run(queued_at: float, *args, **kwargs):
+            THREADPOOL_WAIT.observe(time.perf_counter() - queued_at)
+            return profile_in_thread(call_db_method, self.__db, name, *args, **kwargs)
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(run, time.perf_counter(), *args, **kwargs)
+
+        return call
+
+
+async def get_threadpool_db(db: DB = Depends(get_db)) -> ThreadpoolDB:
+    """Dependency that returns the sync DB behind an awaitable interface"""
+    return ThreadpoolDB(db)
+
+
+# DB_MODE selects the database path used by the task routes:
+#   async - AsyncDB on sqlite+aiosqlite (default)
+#   sync  - the blocking DB, each call on the threadpool
+DB_MODES = {
+    "async": get_async_db,
+    "sync": get_threadpool_db,
+}
+DB_MODE = os.getenv("DB_MODE", "async").lower()
+if DB_MODE not in DB_MODES:
+    raise ValueError(f"Invalid DB_MODE '{DB_MODE}'. Valid modes are: {', '.join(DB_MODES.keys())}")
+
+get_task_db = DB_MODES[DB_MODE]
+
+# GROUP_COMMIT=1 sends single-task creates and updates of either mode
+# through one writer thread committing them in batches (app.db.group_commit)
+group_writer = GroupCommitWriter(engine, task_cache) if GROUP_COMMIT else None
+
+if group_writer is not None:
+    _get_mode_db = get_task_db
+
+    async def get_task_db(db=Depends(_get_mode_db)) -> GroupCommitDB:
+        """Dependency that returns the DB_MODE DB with group-committed writes"""
+        return GroupCommitDB(db, group_writer)
+
+
+def replica_routed(get_primary_db, replica_set: ReplicaSet, mode: str = DB_MODE):
+    '''
+    Return: a dependency wrapping get_primary_db in a ReplicaRoutedDB whose
+    reads run on a replica of replica_set, with a session of the given
+    DB_MODE opened for the request
+    '''
+    cache = ReadOnlyCache(task_cache) if task_cache is not None else None
+
+    async def get_replica_routed_db(request: Request, db=Depends(get_primary_db)):
+        """Dependency that returns the primary DB with reads routed to a replica"""
+        on_write = lambda: mark_write(request)
+        replica = replica_set.choose(last_write(request))
+        if replica is None:
+            yield ReplicaRoutedDB(db, None, on_write)
+        elif mode == "async":
+            async with AsyncSession(replica.async_engine(), expire_on_commit=False) as session:
+                yield ReplicaRoutedDB(db, AsyncDB(session, cache), on_write)
+        else:
+            session = Session(replica.engine)
+            try:
+                yield ReplicaRoutedDB(db, ThreadpoolDB(DB(session, cache)), on_write)
+            finally:
+                await run_in_threadpool(session.close)
+
+    return get_replica_routed_db
+
+
+# DATABASE_REPLICA_URLS sends the read-only DB methods of either mode to
+# replicas (app.db.replicas)
+replica_set = replicas_from_env(engine)
+
+if replica_set is not None:
+    get_task_db = replica_routed(get_task_db, replica_set)
+    os.register_at_fork(after_in_child=replica_set.reset_after_fork)
@@ -0,0 +1,144 @@
+import re
+import weakref
+from typing import List
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+from app.models.Task import Task
+
+FTS_TABLE = "task_fts"
+
+# External-content FTS5 index over task.title/description, kept in sync by
+# triggers so the DB write paths do not have to know about it.
+CREATE_FTS_STATEMENTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description,
+        content='task', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, description ON task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+DROP_FTS_STATEMENTS = [
+    "DROP TRIGGER IF EXISTS task_fts_au",
+    "DROP TRIGGER IF EXISTS task_fts_ad",
+    "DROP TRIGGER IF EXISTS task_fts_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+_QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+# engine -> whether the task_fts index exists; checked once per engine
+_fts_enabled: "weakref.WeakKeyDictionary[Engine, bool]" = weakref.WeakKeyDictionary()
+
+
+def fts5_available(connection: Connection) -> bool:
+    '''
+    Return: True if the SQLite library behind connection was built with FTS5.
+    '''
+    if connection.dialect.name != "sqlite":
+        return False
+    try:
+        connection.execute(text("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)"))
+        connection.execute(text("DROP TABLE temp.fts5_probe"))
+    except OperationalError:
+        return False
+    return True
+
+
+def create_fts(connection: Connection) -> bool:
+    '''
+    Create the task_fts index and its sync triggers, then (re)build it from
+    existing rows. Does nothing and returns False when FTS5 is unavailable.
+    '''
+    if not fts5_available(connection):
+        return False
+    for statement in CREATE_FTS_STATEMENTS:
+        connection.execute(text(statement))
+    connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    return True
+
+
+def drop_fts(connection: Connection) -> None:
+    '''
+    Drop the task_fts index and its triggers if they exist.
+    '''
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in DROP_FTS_STATEMENTS:
+        connection.execute(text(statement))
+
+
+def fts_enabled(connection: Connection) -> bool:
+    '''
+    Return: True if the database behind connection has the task_fts index.
+    The answer is cached per engine; databases that were never migrated, or
+    whose SQLite lacks FTS5, fall back to LIKE search.
+    '''
+    engine = connection.engine
+    if engine not in _fts_enabled:
+        enabled = connection.dialect.name == "sqlite" and connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE},
+        ).first() is not None
+        _fts_enabled[engine] = enabled
+    return _fts_enabled[engine]
+
+
+def build_match_query(search_text: str) -> str:
+    '''
+    Translate user search text into an FTS5 MATCH expression.
+
+    - bare words must all match (implicit AND)
+    - a trailing * makes a word a prefix query: `pars*`
+    - double quotes make a phrase query: `"release notes"`
+
+    Every term is quoted, so FTS5 operators and punctuation in the input are
+    treated as plain text. Raises ValueError if no searchable terms remain.
+    '''
+    terms: List[str] = []
+    for phrase, word in _QUERY_TOKEN.findall(search_text):
+        if phrase:
+            terms.append(_quote(phrase))
+        elif word:
+            prefix = word.endswith("*")
+            word = word.rstrip("*")
+            if word:
+                terms.append(_quote(word) + ("*" if prefix else ""))
+
+    if not terms:
+        raise ValueError("Search text has no searchable terms.")
+    return " ".join(terms)
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _after_create(target, connection, **kw):
+    if create_fts(connection):
+        _fts_enabled.pop(connection.engine, None)
+
+
+def _before_drop(target, connection, **kw):
+    drop_fts(connection)
+    _fts_enabled.pop(connection.engine, None)
+
+
+event.listen(Task.__table__, "after_create", _after_create)
+event.listen(Task.__table__, "before_drop", _before_drop)
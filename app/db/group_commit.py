@@ -0,0 +1,202 @@
+"""
+Group commit for single-task creates and updates (GROUP_COMMIT=1).
+
+By default every POST /tasks/ and PUT /tasks/{task_id} commits its own
+transaction, so concurrent writers queue on SQLite's write lock and pay
+one commit (an fsync with synchronous=FULL) each. In group commit mode
+the routes hand their INSERT/UPDATE ... RETURNING statement to a single
+writer thread instead. The writer takes every statement waiting in its
+queue, waits up to GROUP_COMMIT_WINDOW_MS for more, and stops at
+GROUP_COMMIT_MAX_BATCH statements. It runs them in one transaction and
+commits once. Each request is answered with its own row only after that
+commit, so a response still means the write is durable.
+
+A statement that fails rolls back its batch. The batch is then replayed
+one statement per transaction, so only the failing request sees the
+error.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app.db.cache import CacheBackend
+from app.db.changes import notify_change
+from app.db.database import DB
+from app.metrics import GROUP_COMMIT_BATCH, call_db_method
+from app.models.Task import Task
+from app.schemas.task import TaskCreate, TaskUpdate
+
+logger = logging.getLogger("app.db.group_commit")
+
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "").strip().lower() in ("1", "true", "yes", "on")
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "0"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))
+
+Write = Tuple[object, Future]
+
+
+class GroupCommitWriter:
+    """A writer thread committing queued single-row statements in batches"""
+
+    def __init__(self, engine: Engine, cache: Optional[CacheBackend] = None,
+                 window_ms: float = GROUP_COMMIT_WINDOW_MS,
+                 max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.engine = engine
+        self.cache = cache
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._queue: "queue.SimpleQueue[Optional[Write]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self.batches = 0
+        self.writes = 0
+
+    def _running(self) -> bool:
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def _ensure_started(self) -> None:
+        # A forked worker inherits the writer but not its thread, so each
+        # process starts its own on first use; a thread that died is
+        # replaced and picks up the writes queued for it
+        if self._running():
+            return
+        with self._lock:
+            if not self._running():
+                if self._pid != os.getpid():
+                    self._queue = queue.SimpleQueue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+
+    def submit(self, statement) -> Future:
+        '''
+        Queue an INSERT/UPDATE ... RETURNING Task statement.
+
+        Return: a future resolved with the returned task (None when no row
+        matched) once the batch holding the statement is committed
+        '''
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((statement, future))
+        return future
+
+    async def write(self, statement) -> Optional[Task]:
+        return await asyncio.wrap_future(self.submit(statement))
+
+    def close(self) -> None:
+        '''
+        Commit what is queued, then stop the writer thread
+        '''
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            thread.join()
+
+    def _collect(self, first: Write) -> Tuple[List[Write], bool]:
+        '''
+        Return: (batch starting with first, whether close() was requested)
+        '''
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, closing = self._collect(first)
+            try:
+                call_db_method(self, "commit_batch", batch)
+            except Exception:
+                logger.exception("Group commit of %d write(s) failed", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("group commit failed"))
+            if closing:
+                return
+
+    def _execute(self, session: Session, statement) -> Optional[Task]:
+        db_task = session.exec(statement).scalar_one_or_none()
+        if db_task is not None:
+            session.expunge(db_task)
+        return db_task
+
+    def _resolve(self, batch: List[Write], results: List[Optional[Task]]) -> None:
+        if self.cache is not None:
+            self.cache.delete_many([task.id for task in results if task is not None])
+        notify_change()
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def commit_batch(self, batch: List[Write]) -> None:
+        '''
+        Run a batch of statements in one transaction and resolve their
+        futures; after a failure, replay them one transaction each.
+        Writes whose caller gave up (a cancelled future) are dropped.
+        '''
+        batch = [write for write in batch if write[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        GROUP_COMMIT_BATCH.observe(len(batch))
+        self.batches += 1
+        self.writes += len(batch)
+        try:
+            with Session(self.engine) as session:
+                results = [self._execute(session, statement) for statement, _ in batch]
+                session.commit()
+        except Exception:
+            for write in batch:
+                self._commit_one(write)
+            return
+        self._resolve(batch, results)
+
+    def _commit_one(self, write: Write) -> None:
+        statement, future = write
+        try:
+            with Session(self.engine) as session:
+                result = self._execute(session, statement)
+                session.commit()
+        except Exception as exc:
+            future.set_exception(exc)
+            return
+        self._resolve([write], [result])
+
+
+class GroupCommitDB:
+    """
+    The task DB of DB_MODE, with create_task and update_task sent through
+    a GroupCommitWriter; every other method is the wrapped DB's.
+    """
+
+    def __init__(self, db, writer: GroupCommitWriter):
+        self.__db = db
+        self.__writer = writer
+
+    def __getattr__(self, name: str):
+        return getattr(self.__db, name)
+
+    async def create_task(self, task_data: TaskCreate) -> Task:
+        return await self.__writer.write(DB.create_statement(task_data))
+
+    async def update_task(self, task_id: int, updates: TaskUpdate) -> Optional[Task]:
+        return await self.__writer.write(DB.update_statement(task_id, updates))
@@ -0,0 +1,225 @@
+"""
+Readiness checks behind GET /health/ready.
+
+The database probe is the only check that touches the database. It runs at most
+once per HEALTH_PROBE_INTERVAL seconds however often the endpoint is
+polled, on its own thread so a saturated request threadpool cannot delay
+it. It is abandoned after HEALTH_PROBE_TIMEOUT seconds. Pool occupancy and
+WAL size are read on every call because they cost no I/O beyond a stat().
+
+An instance is degraded, and answers 503, when any of these holds:
+
+  database   - the probe failed, timed out or took longer than
+               HEALTH_DB_LATENCY_MS
+  pool       - checked out connections reached HEALTH_POOL_SATURATION of
+               pool_size + max_overflow, so new requests queue for one
+  wal        - the -wal file grew past HEALTH_WAL_MAX_MB, meaning
+               checkpoints are not keeping up and reads slow down
+               (SQLite only)
+  migrations - the database records an alembic revision other than the
+               head of migrations/ (an unmigrated or rolled back file);
+               databases created without alembic record none and pass
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple
+
+from sqlalchemy.engine import Engine
+
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "5"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "1"))
+HEALTH_DB_LATENCY_MS = float(os.getenv("HEALTH_DB_LATENCY_MS", "250"))
+HEALTH_POOL_SATURATION = float(os.getenv("HEALTH_POOL_SATURATION", "1.0"))
+HEALTH_WAL_MAX_MB = float(os.getenv("HEALTH_WAL_MAX_MB", "512"))
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+@lru_cache(maxsize=None)
+def migration_head() -> Optional[str]:
+    '''
+    Return: the head revision of the migration scripts, or None when they
+    are not shipped with the application
+    '''
+    if not ALEMBIC_INI.exists():
+        return None
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+    return ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_current_head()
+
+
+def database_path(engine: Engine) -> Optional[str]:
+    '''
+    Return: the file behind an SQLite engine, None for in-memory databases
+    and other backends
+    '''
+    if engine.dialect.name != "sqlite":
+        return None
+    database = engine.url.database
+    if not database or database == ":memory:" or database.startswith("file::memory:"):
+        return None
+    return database
+
+
+def pool_status(pool) -> dict:
+    '''
+    Return: occupancy of a connection pool; pools without a size limit
+    (StaticPool, NullPool) report no saturation and are always ok
+    '''
+    if not hasattr(pool, "checkedout"):
+        return {"ok": True, "saturation": None}
+    checked_out, size = pool.checkedout(), pool.size()
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    status = {
+        "checked_out": checked_out,
+        "size": size,
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": max_overflow,
+        "saturation": None,
+        "ok": True,
+    }
+    # max_overflow < 0 means the pool opens connections without limit
+    if max_overflow >= 0 and size + max_overflow > 0:
+        status["saturation"] = round(checked_out / (size + max_overflow), 3)
+        status["ok"] = status["saturation"] < HEALTH_POOL_SATURATION
+    return status
+
+
+def wal_status(path: Optional[str]) -> dict:
+    '''
+    Return: the size of the write-ahead log next to the database file
+    '''
+    wal_bytes = 0
+    if path is not None:
+        try:
+            wal_bytes = os.path.getsize(f"{path}-wal")
+        except OSError:
+            # no WAL file: rollback journal mode, or fully checkpointed
+            pass
+    return {"bytes": wal_bytes, "ok": wal_bytes <= HEALTH_WAL_MAX_MB * 1024 * 1024}
+
+
+class DatabaseProbe:
+    '''
+    A cached, single-flight database probe. Concurrent and repeated
+    readiness checks within interval seconds share one result.
+    '''
+
+    def __init__(
+        self,
+        engine: Engine,
+        pool=None,
+        interval: float = HEALTH_PROBE_INTERVAL,
+        timeout: float = HEALTH_PROBE_TIMEOUT,
+    ):
+        self.engine = engine
+        # the pool whose occupancy is reported; the async engine's pool
+        # cannot be probed from a plain thread, so it may differ from
+        # engine's
+        self.pool = pool if pool is not None else engine.pool
+        self.interval = interval
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="health-probe")
+        self._pending: Optional[Future] = None
+        self._result: Optional[dict] = None
+        self._checked_at = 0.0
+        self.probes = 0
+
+    def _probe(self) -> dict:
+        '''
+        Return: the probe result. SELECT 1 alone never reads an SQLite
+        file, so the probe reads the schema (sqlite_master, or the catalog
+        on PostgreSQL) instead; that takes the same shared lock as any
+        query and fails the same way when the file is locked or gone.
+        '''
+        self.probes += 1
+        started = time.perf_counter()
+        try:
+            with self.engine.connect() as conn:
+                revision = None
+                if conn.dialect.has_table(conn, "alembic_version"):
+                    revision = conn.exec_driver_sql("SELECT version_num FROM alembic_version").scalar()
+        except Exception as exc:
+            return {"ok": False, "latency_ms": None, "error": f"{type(exc).__name__}: {exc}", "revision": None}
+        latency_ms = round((time.perf_counter() - started) * 1000, 3)
+        return {
+            "ok": latency_ms <= HEALTH_DB_LATENCY_MS,
+            "latency_ms": latency_ms,
+            "error": None,
+            "revision": revision,
+        }
+
+    async def result(self) -> dict:
+        '''
+        Return: the latest probe result, probing again only when it is
+        older than interval seconds
+        '''
+        if self._result is not None and time.monotonic() - self._checked_at < self.interval:
+            return self._result
+        # a probe still running after an earlier timeout is joined, not
+        # duplicated, so a stuck database holds at most one thread
+        if self._pending is None or self._pending.done():
+            self._pending = self._executor.submit(self._probe)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(self._pending)), self.timeout)
+        except asyncio.TimeoutError:
+            result = {
+                "ok": False,
+                "latency_ms": None,
+                "error": f"probe timed out after {self.timeout}s",
+                "revision": None,
+            }
+        self._result, self._checked_at = result, time.monotonic()
+        return result
+
+
+async def readiness(probe: DatabaseProbe) -> Tuple[bool, dict]:
+    '''
+    Return: (ready, report) for the readiness endpoint
+    '''
+    database = dict(await probe.result())
+    database["age_s"] = round(time.monotonic() - probe._checked_at, 3)
+    revision = database.pop("revision")
+    head = migration_head()
+    checks = {
+        "database": database,
+        "pool": pool_status(probe.pool),
+        "wal": wal_status(database_path(probe.engine)),
+        "migrations": {
+            "current": revision,
+            "head": head,
+            "ok": revision is None or head is None or revision == head,
+        },
+    }
+    ready = all(check["ok"] for check in checks.values())
+    return ready, {"status": "ready" if ready else "degraded", "checks": checks}
+
+
+_probe: Optional[DatabaseProbe] = None
+
+
+def get_database_probe() -> DatabaseProbe:
+    '''
+    Dependency for the readiness endpoint: a probe of the application
+    database reporting the pool of the engine DB_MODE routes use
+    '''
+    global _probe
+    if _probe is None:
+        from app.db.dependancies import DB_MODE
+        from app.db.session import engine, get_async_engine
+        pool = get_async_engine().sync_engine.pool if DB_MODE == "async" else engine.pool
+        _probe = DatabaseProbe(engine, pool)
+    return _probe
+
+
+def _forget_probe() -> None:
+    # the probe's executor thread does not survive a fork
+    global _probe
+    _probe = None
+
+
+os.register_at_fork(after_in_child=_forget_probe)
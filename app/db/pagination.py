@@ -0,0 +1,41 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+
+def encode_cursor(sort_key: str, value: Any, task_id: int) -> str:
+    '''
+    Encode the (sort key, id) position of the last row of a page into an
+    opaque, url-safe cursor string.
+    '''
+    payload = {"k": sort_key, "v": value, "id": task_id}
+    if isinstance(value, datetime):
+        payload.update(v=value.isoformat(), t="dt")
+    payload = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key: str) -> Optional[Tuple[Any, int]]:
+    '''
+    Decode a cursor produced by encode_cursor.
+
+    Return: None for an empty cursor (first page), otherwise the
+    (value, id) pair to seek past. Raises ValueError when the cursor is
+    malformed or was issued for a different sort key.
+    '''
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key, value, task_id = payload["k"], payload["v"], int(payload["id"])
+        if payload.get("t") == "dt":
+            value = datetime.fromisoformat(value)
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if key != sort_key:
+        raise ValueError(f"Cursor was issued for sort key '{key}', not '{sort_key}'")
+    return value, task_id
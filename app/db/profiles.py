@@ -0,0 +1,106 @@
+import os
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# PRAGMAs applied to every new SQLite connection, per profile.
+#   default     - SQLite library defaults (rollback journal, no busy timeout)
+#   production  - WAL so readers do not block behind writers, NORMAL sync
+#                 (durable across app crashes, fsync only at checkpoints),
+#                 a busy timeout instead of immediate "database is locked",
+#                 and larger page cache / mmap window.
+SQLITE_PROFILES: Dict[str, Dict[str, object]] = {
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "mmap_size": 268435456,
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+    },
+}
+
+# Connection pool settings for file databases, per profile. The default
+# profile keeps SQLAlchemy's QueuePool defaults.
+POOL_PROFILES: Dict[str, Dict[str, int]] = {
+    "default": {},
+    "production": {
+        "pool_size": 20,
+        "max_overflow": 20,
+        "pool_timeout": 30,
+    },
+}
+
+# Environment variables that override individual profile settings
+PRAGMA_ENV_OVERRIDES = {
+    "journal_mode": "SQLITE_JOURNAL_MODE",
+    "synchronous": "SQLITE_SYNCHRONOUS",
+    "busy_timeout": "SQLITE_BUSY_TIMEOUT_MS",
+    "mmap_size": "SQLITE_MMAP_SIZE",
+    "cache_size": "SQLITE_CACHE_SIZE",
+    "temp_store": "SQLITE_TEMP_STORE",
+}
+POOL_ENV_OVERRIDES = {
+    "pool_size": "DB_POOL_SIZE",
+    "max_overflow": "DB_MAX_OVERFLOW",
+    "pool_timeout": "DB_POOL_TIMEOUT",
+}
+
+DEFAULT_PROFILE = "production"
+
+
+def profile_name(profile: Optional[str] = None) -> str:
+    '''
+    Return: the profile to use, from the argument or the SQLITE_PROFILE
+    environment variable. Raises ValueError for an unknown profile.
+    '''
+    name = (profile or os.getenv("SQLITE_PROFILE", DEFAULT_PROFILE)).lower()
+    if name not in SQLITE_PROFILES:
+        raise ValueError(
+            f"Unknown SQLite profile '{name}'. Valid profiles are: {', '.join(SQLITE_PROFILES.keys())}"
+        )
+    return name
+
+
+def sqlite_pragmas(profile: Optional[str] = None) -> Dict[str, object]:
+    '''
+    Return: the PRAGMAs for a profile with environment overrides applied.
+    '''
+    pragmas = dict(SQLITE_PROFILES[profile_name(profile)])
+    for pragma, env_var in PRAGMA_ENV_OVERRIDES.items():
+        value = os.getenv(env_var)
+        if value:
+            pragmas[pragma] = value
+    return pragmas
+
+
+def pool_options(profile: Optional[str] = None) -> Dict[str, int]:
+    '''
+    Return: create_engine pool keyword arguments for a profile with
+    environment overrides applied.
+    '''
+    options = dict(POOL_PROFILES[profile_name(profile)])
+    for option, env_var in POOL_ENV_OVERRIDES.items():
+        value = os.getenv(env_var)
+        if value:
+            options[option] = int(value)
+    return options
+
+
+def apply_sqlite_pragmas(engine: Engine, pragmas: Dict[str, object]) -> None:
+    '''
+    Run the given PRAGMAs on every new DBAPI connection of engine.
+    '''
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma, value in pragmas.items():
+                cursor.execute(f"PRAGMA {pragma}={value}")
+        finally:
+            cursor.close()
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("app.db.queries")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    '''
+    Normalize a SQL statement so that executions differing only in literal
+    values or IN-list length share one fingerprint.
+    '''
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _PARAM_LIST.sub("(...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def sql_echo_enabled() -> bool:
+    '''
+    Return: whether SQLAlchemy's echo should be on (SQL_ECHO, off by default)
+    '''
+    return _env_flag("SQL_ECHO")
+
+
+def install_query_logging(engine: Engine, sample_rate: Optional[float] = None,
+                          slow_query_ms: Optional[float] = None) -> bool:
+    '''
+    Attach structured query logging to engine.
+
+    Every statement is timed; a record is emitted on the "app.db.queries"
+    logger at WARNING when it takes at least slow_query_ms, otherwise at
+    INFO for a random sample_rate fraction of statements. Records carry the
+    statement fingerprint, its hash, duration and row count. Settings
+    default to SQL_LOG_SAMPLE_RATE (0.01) and SQL_SLOW_QUERY_MS (100).
+
+    Return: False without installing anything when SQL_LOG is not enabled
+    and no explicit settings were passed.
+    '''
+    if sample_rate is None and slow_query_ms is None and not _env_flag("SQL_LOG"):
+        return False
+    if sample_rate is None:
+        sample_rate = float(os.getenv("SQL_LOG_SAMPLE_RATE", "0.01"))
+    if slow_query_ms is None:
+        slow_query_ms = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+
+    if not logger.handlers:
+        # One JSON record per line on stderr unless the app configured logging
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _log_query(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        slow = duration_ms >= slow_query_ms
+        if not slow and random.random() >= sample_rate:
+            return
+
+        query = fingerprint(statement)
+        record = {
+            "fingerprint": query,
+            "fingerprint_id": hashlib.sha1(query.encode()).hexdigest()[:12],
+            "duration_ms": round(duration_ms, 3),
+            # sqlite3 reports -1 for SELECTs; only DML row counts are known
+            "rows": cursor.rowcount if cursor.rowcount >= 0 else None,
+            "executemany": executemany,
+            "slow": slow,
+        }
+        logger.log(logging.WARNING if slow else logging.INFO,
+                   json.dumps(record), extra={"query": record})
+
+    @event.listens_for(engine, "handle_error")
+    def _discard_timer(exception_context):
+        # Failed statements never reach after_cursor_execute
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+    return True
@@ -0,0 +1,302 @@
+"""
+Primary/replica routing for reads (DATABASE_REPLICA_URLS).
+
+With one or more comma-separated replica URLs configured, the read-only DB
+methods in READ_METHODS run on a replica; every other method, including
+all writes, runs on the primary engine of app.db.session. Replicas are
+picked round robin. Each has its own connection pool and is opened
+read-only (SQLite mode=ro, PostgreSQL default_transaction_read_only), so a
+write that reaches one fails instead of diverging from the primary.
+
+Read-your-writes: the response to a request that wrote sets a last_write
+cookie holding the time of the write. That client's reads then go to the
+primary until a replica has caught up with that time, or the cookie
+expires after READ_YOUR_WRITES_SECONDS. A replica counts as caught up:
+
+  same SQLite file as the primary - always; it is a read-only pool over
+                                    the same WAL
+  SQLite snapshot                 - up to when its last copy started
+  anything else                   - up to REPLICA_LAG_SECONDS ago, the
+                                    replication lag it is assumed to stay
+                                    within
+
+A SQLite replica URL naming another file is a snapshot when
+REPLICA_SNAPSHOT_SECONDS > 0: a copy of the primary taken with SQLite's
+online backup API, refreshed in the background when a request finds it
+older than that. Snapshots stand in for a streaming replica on a single
+machine, lag included, so routing can be tried locally. A snapshot is not
+used before its first copy completes.
+
+READ_YOUR_WRITES=0 drops the cookie; every read may then go to a replica,
+including one that has not yet seen the client's own writes.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from itertools import count
+from typing import Callable, List, Optional
+
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+
+from app.db.health import database_path
+from app.db.postgres import is_postgres_url
+from app.db.query_log import install_query_logging, sql_echo_enabled
+from app.db.session import async_database_url, create_app_engine, create_async_app_engine
+from app.metrics import DB_READ_ROUTES, install_engine_metrics
+from app.profiling import install_sql_capture
+
+logger = logging.getLogger("app.db.replicas")
+
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_LAG_SECONDS = float(os.getenv("REPLICA_LAG_SECONDS", "1"))
+REPLICA_SNAPSHOT_SECONDS = float(os.getenv("REPLICA_SNAPSHOT_SECONDS", "0"))
+READ_YOUR_WRITES = os.getenv("READ_YOUR_WRITES", "1").strip().lower() in ("1", "true", "yes", "on")
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "60"))
+LAST_WRITE_COOKIE = "last_write"
+
+# DB methods that never write; the routes' GET endpoints use only these
+READ_METHODS = frozenset({
+    "get_task",
+    "get_task_version",
+    "get_tasks_pagination_and_filter",
+    "get_tasks_page",
+    "get_tasks_keyset",
+    "count_tasks",
+    "sort_tasks",
+    "sort_tasks_keyset",
+    "stream_sorted_tasks",
+    "search_tasks",
+    "search_tasks_page",
+    "count_search",
+    "get_task_stats",
+})
+
+
+def _instrument(engine: Engine, name: str) -> None:
+    install_query_logging(engine)
+    install_engine_metrics(engine, name)
+    install_sql_capture(engine)
+
+
+class Replica:
+    """A read-only replica engine; the async engine is created on first use"""
+
+    def __init__(self, url: str, name: str, lag: float = REPLICA_LAG_SECONDS):
+        self.url = url
+        self.name = name
+        self.lag = lag
+        self.engine = create_app_engine(url, read_only=True, echo=sql_echo_enabled())
+        _instrument(self.engine, name)
+        self._async_engine: Optional[AsyncEngine] = None
+
+    def async_engine(self) -> AsyncEngine:
+        if self._async_engine is None:
+            self._async_engine = create_async_app_engine(
+                async_database_url(self.url), read_only=True, echo=sql_echo_enabled()
+            )
+            _instrument(self._async_engine.sync_engine, f"{self.name}_async")
+        return self._async_engine
+
+    def caught_up_to(self) -> float:
+        '''
+        Return: a wall-clock time such that every write committed on the
+        primary before it is visible on this replica
+        '''
+        return time.time() - self.lag
+
+    def reset_after_fork(self) -> None:
+        self.engine.dispose(close=False)
+        if self._async_engine is not None:
+            self._async_engine.sync_engine.dispose(close=False)
+            self._async_engine = None
+
+
+class SnapshotReplica(Replica):
+    """A SQLite copy of the primary, refreshed with the backup API"""
+
+    def __init__(self, url: str, name: str, primary: Engine, interval: float = REPLICA_SNAPSHOT_SECONDS):
+        super().__init__(url, name, lag=0.0)
+        self.primary = primary
+        self.path = make_url(url).database
+        self.interval = interval
+        self.synced_at = 0.0
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._refreshing_pid: Optional[int] = None
+
+    def refresh(self) -> None:
+        '''
+        Copy the primary into the replica file. Readers of the replica keep
+        their snapshot until the copy commits.
+        '''
+        started = time.time()
+        source = self.primary.raw_connection()
+        try:
+            target = sqlite3.connect(self.path, timeout=30)
+            try:
+                source.driver_connection.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
+        self.synced_at = started
+        self.refreshes += 1
+
+    def caught_up_to(self) -> float:
+        if time.time() - self.synced_at >= self.interval:
+            self._refresh_in_background()
+        return self.synced_at
+
+    def _refresh_in_background(self) -> None:
+        # one refresh at a time per process; a refresh in flight before a
+        # fork is not running in the child
+        with self._lock:
+            if self._refreshing_pid == os.getpid():
+                return
+            self._refreshing_pid = os.getpid()
+        threading.Thread(target=self._refresh_and_release, name="replica-snapshot", daemon=True).start()
+
+    def _refresh_and_release(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Snapshot of the primary into %s failed", self.name)
+        finally:
+            self._refreshing_pid = None
+
+
+class ReplicaSet:
+    """Round-robin choice among the replicas that have caught up"""
+
+    def __init__(self, replicas: List[Replica]):
+        self.replicas = replicas
+        self._next = count()
+
+    def choose(self, written_at: float = 0.0) -> Optional[Replica]:
+        '''
+        Return: a replica that has every write committed before written_at,
+        or None when the read has to go to the primary
+        '''
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if replica.caught_up_to() > written_at:
+                return replica
+        return None
+
+    def reset_after_fork(self) -> None:
+        for replica in self.replicas:
+            replica.reset_after_fork()
+
+
+def _same_sqlite_file(url: str, primary: Engine) -> bool:
+    path = database_path(primary)
+    database = make_url(url).database
+    return path is not None and bool(database) and os.path.realpath(database) == os.path.realpath(path)
+
+
+def replicas_from_env(primary: Engine, urls: Optional[List[str]] = None) -> Optional[ReplicaSet]:
+    '''
+    Build the replica set for a primary engine from DATABASE_REPLICA_URLS
+    (or urls); None when no replica is configured
+    '''
+    urls = REPLICA_URLS if urls is None else urls
+    if not urls:
+        return None
+    replicas: List[Replica] = []
+    for index, url in enumerate(urls):
+        name = f"replica{index}"
+        if is_postgres_url(url):
+            replicas.append(Replica(url, name))
+        elif _same_sqlite_file(url, primary):
+            replicas.append(Replica(url, name, lag=0.0))
+        elif REPLICA_SNAPSHOT_SECONDS > 0:
+            replicas.append(SnapshotReplica(url, name, primary))
+        else:
+            # kept current by something else (Litestream, LiteFS, rsync)
+            replicas.append(Replica(url, name))
+    return ReplicaSet(replicas)
+
+
+def last_write(connection: HTTPConnection) -> float:
+    '''
+    Return: the time of the client's last write from its last_write cookie,
+    0 when there is none or read-your-writes is off
+    '''
+    if not READ_YOUR_WRITES:
+        return 0.0
+    try:
+        return float(connection.cookies.get(LAST_WRITE_COOKIE, 0))
+    except ValueError:
+        return 0.0
+
+
+def mark_write(connection: HTTPConnection) -> None:
+    '''
+    Record that this request wrote; ReadYourWritesMiddleware turns it into
+    the last_write cookie
+    '''
+    connection.state.last_write = time.time()
+
+
+class ReplicaRoutedDB:
+    """
+    A DB of any DB_MODE flavor whose READ_METHODS run on replica_db when a
+    replica was chosen for the request. Every other method runs on the
+    primary and calls on_write once it has finished.
+    """
+
+    def __init__(self, primary_db, replica_db=None, on_write: Optional[Callable[[], None]] = None):
+        self.__primary = primary_db
+        self.__replica = replica_db
+        self.__on_write = on_write
+
+    def __getattr__(self, name: str):
+        if name in READ_METHODS:
+            target = "primary" if self.__replica is None else "replica"
+            DB_READ_ROUTES.inc((target,))
+            return getattr(self.__primary if self.__replica is None else self.__replica, name)
+
+        method = getattr(self.__primary, name)
+        on_write = self.__on_write
+
+        async def write(*args, **kwargs):
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                # after the commit, so a replica caught up to this time has it
+                if on_write is not None:
+                    on_write()
+
+        return write
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware setting the last_write cookie on responses to writes"""
+
+    def __init__(self, app, max_age: int = READ_YOUR_WRITES_SECONDS):
+        self.app = app
+        self.max_age = max_age
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start":
+                written_at = scope.get("state", {}).get("last_write")
+                if written_at is not None:
+                    MutableHeaders(scope=message).append(
+                        "set-cookie",
+                        f"{LAST_WRITE_COOKIE}={written_at:.6f}; Max-Age={self.max_age}; Path=/; "
+                        "HttpOnly; SameSite=Lax",
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
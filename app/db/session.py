@@ -1,8 +1,149 @@
+import os
+from typing import Optional, Tuple
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from .postgres import create_async_postgres_engine, create_postgres_engine, driver_url, is_postgres_url
+from .profiles import apply_sqlite_pragmas, pool_options, sqlite_pragmas
+from .query_log import install_query_logging, sql_echo_enabled
+from app.metrics import install_engine_metrics
+from app.profiling import install_sql_capture
 
-DATABASE_URL = "sqlite:///./db.sqlite3"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./db.sqlite3")
 
-engine = create_engine(DATABASE_URL, echo=True)
+
+def async_database_url(url: str) -> str:
+    '''
+    Return: the async driver URL for a sync database URL
+    '''
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    if is_postgres_url(url):
+        # psycopg 3 is both the sync and the async driver
+        return driver_url(url)
+    return url
+
+
+ASYNC_DATABASE_URL = async_database_url(DATABASE_URL)
+
+
+def read_only_sqlite_url(url: str) -> str:
+    '''
+    Return: a URL opening the same SQLite file read-only (URI mode=ro)
+    '''
+    parsed = make_url(url)
+    database = parsed.database or ""
+    if not database.startswith("file:"):
+        database = f"file:{database}"
+    return parsed.set(database=database, query={**parsed.query, "mode": "ro", "uri": "true"}).render_as_string(
+        hide_password=False
+    )
+
+
+def _sqlite_engine_options(url: str, profile: Optional[str], kwargs: dict,
+                           read_only: bool = False) -> Tuple[dict, dict]:
+    '''
+    Return: (PRAGMAs, create_engine keyword arguments) for a profile
+    '''
+    connect_args = {"check_same_thread": False}
+    pragmas = sqlite_pragmas(profile)
+    if read_only:
+        # the journal mode belongs to the file and only a writer may set it
+        pragmas.pop("journal_mode", None)
+    if "busy_timeout" in pragmas:
+        # pysqlite's own lock wait, kept in line with PRAGMA busy_timeout
+        connect_args["timeout"] = int(pragmas["busy_timeout"]) / 1000
+
+    # Pool sizing only applies to the default QueuePool on file databases
+    in_memory = url.split("///")[-1] in ("", ":memory:") or url.endswith("://")
+    options = {} if in_memory or "poolclass" in kwargs else pool_options(profile)
+    options.update(kwargs)
+    options["connect_args"] = {**connect_args, **options.get("connect_args", {})}
+    return pragmas, options
+
+
+def create_sqlite_engine(url: str, profile: Optional[str] = None, read_only: bool = False,
+                         **kwargs) -> Engine:
+    '''
+    Create an SQLite engine tuned by a profile from app.db.profiles
+    (SQLITE_PROFILE env var when profile is None); read_only opens the
+    file with mode=ro
+    '''
+    pragmas, options = _sqlite_engine_options(url, profile, kwargs, read_only)
+    engine = create_engine(read_only_sqlite_url(url) if read_only else url, **options)
+    apply_sqlite_pragmas(engine, pragmas)
+    return engine
+
+
+def create_async_sqlite_engine(url: str, profile: Optional[str] = None, read_only: bool = False,
+                               **kwargs) -> AsyncEngine:
+    '''
+    Create an sqlite+aiosqlite engine tuned like create_sqlite_engine
+    '''
+    pragmas, options = _sqlite_engine_options(url, profile, kwargs, read_only)
+    engine = create_async_engine(read_only_sqlite_url(url) if read_only else url, **options)
+    apply_sqlite_pragmas(engine.sync_engine, pragmas)
+    return engine
+
+
+def create_app_engine(url: str, profile: Optional[str] = None, read_only: bool = False,
+                      **kwargs) -> Engine:
+    '''
+    Create the engine for a database URL: PostgreSQL with the pool settings
+    of app.db.postgres, anything else as SQLite tuned by a profile
+    '''
+    if is_postgres_url(url):
+        return create_postgres_engine(url, read_only, **kwargs)
+    return create_sqlite_engine(url, profile, read_only, **kwargs)
+
+
+def create_async_app_engine(url: str, profile: Optional[str] = None, read_only: bool = False,
+                            **kwargs) -> AsyncEngine:
+    '''
+    Create the async engine for a database URL, like create_app_engine
+    '''
+    if is_postgres_url(url):
+        return create_async_postgres_engine(url, read_only, **kwargs)
+    return create_async_sqlite_engine(url, profile, read_only, **kwargs)
+
+
+engine = create_app_engine(DATABASE_URL, echo=sql_echo_enabled())
+install_query_logging(engine)
+install_engine_metrics(engine, "sync")
+install_sql_capture(engine)
+
+_async_engine: Optional[AsyncEngine] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    '''
+    Return the async engine, created on first use so the sync-only
+    deployment does not need aiosqlite installed
+    '''
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_app_engine(ASYNC_DATABASE_URL, echo=sql_echo_enabled())
+        install_query_logging(_async_engine.sync_engine)
+        install_engine_metrics(_async_engine.sync_engine, "async")
+        install_sql_capture(_async_engine.sync_engine)
+    return _async_engine
+
+def _reset_after_fork():
+    '''
+    A forked child (gunicorn --preload, multiprocessing) must not share the
+    parent's database connections: drop them from the pool without closing
+    them, and rebuild the async engine, whose aiosqlite threads do not
+    survive the fork
+    '''
+    global _async_engine
+    engine.dispose(close=False)
+    if _async_engine is not None:
+        _async_engine.sync_engine.dispose(close=False)
+        _async_engine = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
 
 def create_db_and_tables():
     '''
@@ -15,4 +156,12 @@ def get_session():
     Dependency for FastAPI routes
     '''
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_async_session():
+    '''
+    Async dependency for FastAPI routes. Objects stay loaded after commit
+    so responses can be serialized without lazy loads outside the session.
+    '''
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
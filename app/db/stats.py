@@ -0,0 +1,318 @@
+"""
+Precomputed task counters behind GET /tasks/stats.
+
+task_stats holds one row per (dimension, value), e.g. ('status', 'pending'),
+with the number of tasks carrying that value. Triggers on task keep it
+current for every write path (ORM, Core, bulk, COPY), so reading the stats
+costs a lookup over a handful of rows instead of GROUP BY over the task
+table.
+
+On SQLite the triggers add to the counter rows in place; there is only
+one writer at a time anyway. On PostgreSQL, updating a counter row in
+place would lock it until commit, so every concurrent create would wait
+on the 'total' row. There, a statement-level trigger appends one delta
+row per changed (dimension, value) instead, readers sum the rows of each
+counter, and task_stats_fold() sums the deltas back into one row per
+counter. The trigger runs the fold after about one statement in
+STATS_FOLD_EVERY, skipping rows another fold has locked. The server also
+folds at start.
+
+Rebuild the counters from the task table after drift (e.g. rows written
+while the triggers did not exist), only report the drift, or fold the
+PostgreSQL deltas:
+
+    python -m app.db.stats rebuild
+    python -m app.db.stats check
+    python -m app.db.stats fold
+"""
+import argparse
+import weakref
+from typing import Dict, List, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.models.Task import Task
+
+STATS_TABLE = "task_stats"
+
+# Counted dimensions and the task expression each one counts by; the
+# 'total' dimension has the single value ''. Unassigned tasks count
+# under assignee ''.
+STATS_DIMENSIONS = {
+    "status": "status",
+    "priority": "priority",
+    "assignee": "COALESCE(assigned_to, '')",
+}
+
+# PostgreSQL: the trigger folds the deltas after about 1 in this many statements
+STATS_FOLD_EVERY = 100
+
+_UNION_ALL = "\n            UNION ALL "
+
+
+def _deltas(rows: str, sign: int, total: bool) -> str:
+    '''
+    Return: a SELECT of the (dimension, value, delta) rows that the rows of
+    a transition table add to (sign 1) or remove from (sign -1) the counters
+    '''
+    selects = [f"SELECT 'total', '', {sign} FROM {rows}"] if total else []
+    selects += [
+        f"SELECT '{dimension}', CAST({expression} AS TEXT), {sign} FROM {rows}"
+        for dimension, expression in STATS_DIMENSIONS.items()
+    ]
+    return _UNION_ALL.join(selects)
+
+
+def _insert_deltas(*selects: str) -> str:
+    return f"""INSERT INTO {STATS_TABLE}(dimension, value, count)
+        SELECT dimension, value, SUM(delta) FROM (
+            {_UNION_ALL.join(selects)}
+        ) AS deltas(dimension, value, delta)
+        GROUP BY dimension, value
+        HAVING SUM(delta) != 0;"""
+
+
+SQLITE_STATS_STATEMENTS = [
+    f"""CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (dimension, value)
+    ) WITHOUT ROWID""",
+    f"""CREATE TRIGGER IF NOT EXISTS task_stats_ai AFTER INSERT ON task BEGIN
+        INSERT INTO {STATS_TABLE}(dimension, value, count) VALUES
+            ('total', '', 1),
+            ('status', new.status, 1),
+            ('priority', new.priority, 1),
+            ('assignee', COALESCE(new.assigned_to, ''), 1)
+        ON CONFLICT(dimension, value) DO UPDATE SET count = count + excluded.count;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS task_stats_ad AFTER DELETE ON task BEGIN
+        INSERT INTO {STATS_TABLE}(dimension, value, count) VALUES
+            ('total', '', -1),
+            ('status', old.status, -1),
+            ('priority', old.priority, -1),
+            ('assignee', COALESCE(old.assigned_to, ''), -1)
+        ON CONFLICT(dimension, value) DO UPDATE SET count = count + excluded.count;
+        DELETE FROM {STATS_TABLE}
+        WHERE dimension = 'assignee' AND value = COALESCE(old.assigned_to, '') AND count = 0;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS task_stats_au AFTER UPDATE OF status, priority, assigned_to ON task BEGIN
+        INSERT INTO {STATS_TABLE}(dimension, value, count) VALUES
+            ('status', old.status, -1),
+            ('status', new.status, 1),
+            ('priority', old.priority, -1),
+            ('priority', new.priority, 1),
+            ('assignee', COALESCE(old.assigned_to, ''), -1),
+            ('assignee', COALESCE(new.assigned_to, ''), 1)
+        ON CONFLICT(dimension, value) DO UPDATE SET count = count + excluded.count;
+        DELETE FROM {STATS_TABLE}
+        WHERE dimension = 'assignee' AND value = COALESCE(old.assigned_to, '') AND count = 0;
+    END""",
+]
+
+POSTGRES_STATS_STATEMENTS = [
+    f"""CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        count BIGINT NOT NULL
+    )""",
+    f"CREATE INDEX IF NOT EXISTS ix_task_stats_dimension_value ON {STATS_TABLE} (dimension, value)",
+    f"""CREATE OR REPLACE FUNCTION task_stats_fold() RETURNS void LANGUAGE sql AS $$
+        WITH folded AS (
+            DELETE FROM {STATS_TABLE}
+            WHERE ctid IN (SELECT ctid FROM {STATS_TABLE} FOR UPDATE SKIP LOCKED)
+            RETURNING dimension, value, count
+        )
+        INSERT INTO {STATS_TABLE}(dimension, value, count)
+        SELECT dimension, value, SUM(count) FROM folded
+        GROUP BY dimension, value
+        HAVING SUM(count) != 0
+    $$""",
+    # one function for the three triggers; each branch only reads the
+    # transition tables its trigger declares
+    f"""CREATE OR REPLACE FUNCTION task_stats_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+        {_insert_deltas(_deltas("new_rows", 1, True))}
+        ELSIF TG_OP = 'DELETE' THEN
+        {_insert_deltas(_deltas("old_rows", -1, True))}
+        ELSE
+        {_insert_deltas(_deltas("new_rows", 1, False), _deltas("old_rows", -1, False))}
+        END IF;
+        IF random() < {1 / STATS_FOLD_EVERY} THEN
+            PERFORM task_stats_fold();
+        END IF;
+        RETURN NULL;
+    END
+    $$""",
+    "DROP TRIGGER IF EXISTS task_stats_ai ON task",
+    "DROP TRIGGER IF EXISTS task_stats_ad ON task",
+    "DROP TRIGGER IF EXISTS task_stats_au ON task",
+    "CREATE TRIGGER task_stats_ai AFTER INSERT ON task REFERENCING NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION task_stats_apply()",
+    "CREATE TRIGGER task_stats_ad AFTER DELETE ON task REFERENCING OLD TABLE AS old_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION task_stats_apply()",
+    "CREATE TRIGGER task_stats_au AFTER UPDATE ON task REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION task_stats_apply()",
+]
+
+CREATE_STATS_STATEMENTS = {
+    "sqlite": SQLITE_STATS_STATEMENTS,
+    "postgresql": POSTGRES_STATS_STATEMENTS,
+}
+
+DROP_STATS_STATEMENTS = {
+    "sqlite": [
+        "DROP TRIGGER IF EXISTS task_stats_au",
+        "DROP TRIGGER IF EXISTS task_stats_ad",
+        "DROP TRIGGER IF EXISTS task_stats_ai",
+        f"DROP TABLE IF EXISTS {STATS_TABLE}",
+    ],
+    "postgresql": [
+        "DROP TRIGGER IF EXISTS task_stats_au ON task",
+        "DROP TRIGGER IF EXISTS task_stats_ad ON task",
+        "DROP TRIGGER IF EXISTS task_stats_ai ON task",
+        "DROP FUNCTION IF EXISTS task_stats_apply()",
+        "DROP FUNCTION IF EXISTS task_stats_fold()",
+        f"DROP TABLE IF EXISTS {STATS_TABLE}",
+    ],
+}
+
+# The counters as GROUP BY over task: the source of truth for rebuilds.
+# Values are cast to TEXT so the UNION also type-checks on PostgreSQL,
+# where status and priority are native enums.
+COUNT_STATEMENT = " UNION ALL ".join(
+    ["SELECT 'total' AS dimension, '' AS value, COUNT(*) AS count FROM task"] + [
+        f"SELECT '{dimension}', CAST({expression} AS TEXT), COUNT(*) FROM task GROUP BY {expression}"
+        for dimension, expression in STATS_DIMENSIONS.items()
+    ]
+)
+
+# engine -> whether the task_stats table exists; checked once per engine
+_stats_enabled: "weakref.WeakKeyDictionary[Engine, bool]" = weakref.WeakKeyDictionary()
+
+
+def create_stats(connection: Connection) -> bool:
+    '''
+    Create the task_stats table and its triggers, then fill it from the
+    existing rows. Returns False (and does nothing) on other databases than
+    SQLite and PostgreSQL.
+    '''
+    statements = CREATE_STATS_STATEMENTS.get(connection.dialect.name)
+    if statements is None:
+        return False
+    for statement in statements:
+        connection.execute(text(statement))
+    rebuild_stats(connection)
+    return True
+
+
+def drop_stats(connection: Connection) -> None:
+    '''
+    Drop the task_stats table and its triggers if they exist.
+    '''
+    for statement in DROP_STATS_STATEMENTS.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+
+
+def rebuild_stats(connection: Connection) -> None:
+    '''
+    Recount task_stats from the task table.
+    '''
+    connection.execute(text(f"DELETE FROM {STATS_TABLE}"))
+    connection.execute(text(f"INSERT INTO {STATS_TABLE}(dimension, value, count) {COUNT_STATEMENT}"))
+
+
+def fold_stats(connection: Connection) -> None:
+    '''
+    Sum the PostgreSQL delta rows into one row per counter. SQLite keeps
+    one row per counter already.
+    '''
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT task_stats_fold()"))
+
+
+def stats_drift(connection: Connection) -> List[Tuple[str, str, int, int]]:
+    '''
+    Return: (dimension, value, stored count, actual count) for every
+    counter in task_stats that disagrees with the task table
+    '''
+    stored = _counts(connection.execute(text(
+        f"SELECT dimension, value, SUM(count) FROM {STATS_TABLE} GROUP BY dimension, value"
+    )))
+    actual = _counts(connection.execute(text(COUNT_STATEMENT)))
+    return [
+        (dimension, value, stored.get((dimension, value), 0), actual.get((dimension, value), 0))
+        for dimension, value in sorted(stored.keys() | actual.keys())
+        if stored.get((dimension, value), 0) != actual.get((dimension, value), 0)
+    ]
+
+
+def _counts(rows) -> Dict[Tuple[str, str], int]:
+    return {(dimension, value): count for dimension, value, count in rows if count}
+
+
+def stats_enabled(connection: Connection) -> bool:
+    '''
+    Return: True if the database behind connection has the task_stats table.
+    The answer is cached per engine; databases that were never migrated
+    fall back to counting with GROUP BY.
+    '''
+    engine = connection.engine
+    if engine not in _stats_enabled:
+        if connection.dialect.name == "sqlite":
+            enabled = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": STATS_TABLE},
+            ).first() is not None
+        else:
+            enabled = (connection.dialect.name in CREATE_STATS_STATEMENTS
+                       and connection.dialect.has_table(connection, STATS_TABLE))
+        _stats_enabled[engine] = enabled
+    return _stats_enabled[engine]
+
+
+def _after_create(target, connection, **kw):
+    if create_stats(connection):
+        _stats_enabled.pop(connection.engine, None)
+
+
+def _before_drop(target, connection, **kw):
+    drop_stats(connection)
+    _stats_enabled.pop(connection.engine, None)
+
+
+event.listen(Task.__table__, "after_create", _after_create)
+event.listen(Task.__table__, "before_drop", _before_drop)
+
+
+def main() -> None:
+    from app.db.session import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild", "check", "fold"])
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        if not stats_enabled(connection):
+            raise SystemExit(f"No {STATS_TABLE} table; run the migrations first (alembic upgrade head)")
+        if args.command == "fold":
+            fold_stats(connection)
+            print(f"Folded {STATS_TABLE}")
+            return
+        drift = stats_drift(connection)
+        for dimension, value, stored, actual in drift:
+            print(f"{dimension:<10}{value!r:<24}stored {stored:>8}  actual {actual:>8}")
+        if args.command == "rebuild":
+            rebuild_stats(connection)
+            print(f"Rebuilt {STATS_TABLE}; {len(drift)} counter(s) were off")
+        elif drift:
+            raise SystemExit(1)
+        else:
+            print(f"{STATS_TABLE} is in sync")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,42 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import Depends, FastAPI, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import task_routes
+from app.routers import profile_routes, task_routes
 from app.db.session import create_db_and_tables
+from app.db.cache import combine_stats, task_cache
+from app.db.health import DatabaseProbe, get_database_probe, readiness
+from app.db.replicas import READ_YOUR_WRITES, REPLICA_URLS, ReadYourWritesMiddleware
+from app.metrics import MetricsMiddleware, registry, write_snapshots
+from app.profiling import PROFILING_TOKEN, ProfilingMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # With worker processes sharing MULTIPROC_DIR, publish this worker's
+    # metrics for the scrapes the others serve
+    if registry.directory is None:
+        yield
+        return
+    writer = asyncio.create_task(write_snapshots(registry))
+    yield
+    writer.cancel()
+    with suppress(asyncio.CancelledError):
+        await writer
 
 
 app = FastAPI(
     title="Task Management API",
     description="A comprehensive task management API built with FastAPI",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+if task_cache is not None:
+    registry.share("cache", task_cache.stats)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -17,8 +44,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Only with a token, so unprofiled deployments do not pay for it
+if PROFILING_TOKEN:
+    app.add_middleware(ProfilingMiddleware, token=PROFILING_TOKEN)
+# The last_write cookie only matters when reads can go to a replica
+if REPLICA_URLS and READ_YOUR_WRITES:
+    app.add_middleware(ReadYourWritesMiddleware)
+# Outermost, so request latency includes every other middleware
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(task_routes.router)
+app.include_router(profile_routes.router)
 
 
 @app.get("/")
@@ -32,6 +68,10 @@ def read_root():
         "endpoints": {
             "tasks": "/tasks",
             "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
+            "cache_stats": "/cache/stats",
+            "metrics": "/metrics",
             "docs": "/docs",
             "redoc": "/redoc"
         }
@@ -44,6 +84,44 @@ def check_health():
     '''
     return {"status": "OK", "message": "API is running successfully"}
 
+@app.get("/health/live")
+async def check_liveness():
+    '''
+    Return OK while the process serves requests; never touches the database
+    '''
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def check_readiness(response: Response, probe: DatabaseProbe = Depends(get_database_probe)):
+    '''
+    Return database, connection pool, WAL and migration checks, with status
+    503 when any of them is degraded
+    '''
+    ready, report = await readiness(probe)
+    if not ready:
+        response.status_code = 503
+    return report
+
+@app.get("/cache/stats")
+async def cache_stats():
+    '''
+    Return hit/miss/eviction statistics of the task read cache, added up
+    over the running workers
+    '''
+    if task_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **combine_stats(registry.shared("cache"))}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    '''
+    Return request, DB query, connection pool and threadpool metrics in the
+    Prometheus text format
+    '''
+    # async so the threadpool gauges are read on the event loop
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # one worker per CPU; see app.server
+    from app.server import main
+    main()
\ No newline at end of file
@@ -0,0 +1,555 @@
+"""
+In-process metrics in the Prometheus text format, served by GET /metrics.
+
+Writes never take a lock: every thread updates its own shard (a plain
+dict) of counters and histogram buckets, and a scrape sums the shards.
+The event loop, each threadpool worker and each greenlet-driving thread
+therefore record without contending with each other; the registry lock is
+only taken the first time a thread records anything. Threads come and go
+(idle threadpool workers retire, background threads stop), so the shards
+of finished threads are folded into one retired shard whenever a new
+thread registers and at scrape time.
+
+With several worker processes (app.server), a scrape reaches one of them.
+When MULTIPROC_DIR names a directory shared by the workers, each worker
+rewrites a JSON snapshot of its values there every
+METRICS_SNAPSHOT_INTERVAL seconds, and a scrape sums its own fresh values
+with the other workers' snapshots. A worker whose snapshot is older than
+three intervals is gone: its counters and histograms still count, its
+gauges no longer do.
+
+What is recorded:
+
+  http_*        - MetricsMiddleware: requests by route template, method and
+                  status, their latency, and requests in flight
+  db_method_*   - DB calls made through ThreadpoolDB / AsyncDB, by method
+  db_query_*    - statements executed on an instrumented engine, attributed
+                  to the DB method that issued them
+  db_pool_*     - connection checkout wait and pool occupancy per engine
+  threadpool_*  - how long DB calls queue for a worker thread, and the
+                  worker tokens in use / waiting at scrape time
+  response_encode_seconds - JSON / NDJSON encoding of the fast list path
+"""
+import asyncio
+import contextvars
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from anyio import to_thread
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("app.metrics")
+
+Labels = Tuple[str, ...]
+# A collected sample: (label names, label values, value)
+Sample = Tuple[Labels, Labels, float]
+
+HTTP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Directory shared by the worker processes of one server, None for one process
+MULTIPROC_DIR = os.getenv("MULTIPROC_DIR") or None
+METRICS_SNAPSHOT_INTERVAL = float(os.getenv("METRICS_SNAPSHOT_INTERVAL", "5"))
+
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Registry:
+    """Metrics and scrape-time collectors, rendered in registration order"""
+
+    def __init__(self, directory: Optional[str] = None, interval: float = METRICS_SNAPSHOT_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self._metrics: List["_Metric"] = []
+        self._collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+        self._shared: Dict[str, Callable[[], dict]] = {}
+        # (owning thread, its values); shards of finished threads are
+        # summed into _retired
+        self._shards: List[Tuple[weakref.ref, dict]] = []
+        self._retired: dict = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def shard(self) -> dict:
+        '''
+        Return: the calling thread's values, {(metric name, labels): value}
+        '''
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            with self._lock:
+                self._retire_finished()
+                self._shards.append((weakref.ref(threading.current_thread()), values))
+            self._local.values = values
+            return values
+
+    def _retire_finished(self) -> None:
+        # called with _lock held; a finished thread no longer writes its shard
+        live = []
+        for ref, values in self._shards:
+            thread = ref()
+            if thread is None or not thread.is_alive():
+                _add_values(self._retired, values)
+            else:
+                live.append((ref, values))
+        self._shards = live
+
+    def register(self, metric: "_Metric") -> None:
+        self._metrics.append(metric)
+
+    def register_collector(self, name: str, kind: str, documentation: str,
+                           collect: Callable[[], Iterable[Sample]]) -> None:
+        '''
+        Add a metric whose samples collect() reads at scrape time (e.g.
+        pool occupancy); collect may raise to leave the metric out
+        '''
+        self._collectors.append((name, kind, documentation, collect))
+
+    def share(self, name: str, read: Callable[[], dict]) -> None:
+        '''
+        Add a per-process dict (e.g. cache statistics) that snapshots carry
+        to the other workers; see shared()
+        '''
+        self._shared[name] = read
+
+    def merged(self) -> dict:
+        '''
+        Return: the values of all threads summed per (metric name, labels)
+        '''
+        merged: dict = {}
+        with self._lock:
+            self._retire_finished()
+            shards = [values for _, values in self._shards]
+            _add_values(merged, self._retired)
+        for shard in shards:
+            # dict.copy() runs without releasing the GIL, so the owning
+            # thread cannot resize the dict in the middle of it
+            _add_values(merged, shard.copy())
+        return merged
+
+    def collect(self) -> Dict[str, List[Sample]]:
+        '''
+        Return: the samples of every collector that answers, by metric name
+        '''
+        collected = {}
+        for name, _, _, collect in self._collectors:
+            try:
+                collected[name] = list(collect())
+            except Exception:
+                continue
+        return collected
+
+    def snapshot(self) -> dict:
+        '''
+        Return: this process's values, collector samples and shared dicts,
+        as JSON-serializable data; take it on the event loop, where the
+        threadpool gauges answer
+        '''
+        shared = {}
+        for name, read in self._shared.items():
+            try:
+                shared[name] = read()
+            except Exception:
+                continue
+        return {
+            "pid": os.getpid(),
+            "written_at": time.time(),
+            "values": [[name, list(labels), value] for (name, labels), value in self.merged().items()],
+            "collected": {name: [[list(names), list(values), value] for names, values, value in samples]
+                          for name, samples in self.collect().items()},
+            "shared": shared,
+        }
+
+    def write_snapshot(self, snapshot: dict) -> None:
+        '''
+        Replace the snapshot file of snapshot["pid"] in directory atomically
+        '''
+        path = os.path.join(self.directory, f"metrics-{snapshot['pid']}.json")
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(snapshot, file)
+        os.replace(f"{path}.tmp", path)
+
+    def snapshots(self) -> List[dict]:
+        '''
+        Return: a fresh snapshot of this process, written for the other
+        workers, followed by the last snapshot of every other worker
+        '''
+        own = self.snapshot()
+        self.write_snapshot(own)
+        snapshots = [own]
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            try:
+                with open(path) as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if snapshot["pid"] != own["pid"]:
+                snapshots.append(snapshot)
+        return snapshots
+
+    def _live(self, snapshot: dict) -> bool:
+        return snapshot["written_at"] >= time.time() - 3 * self.interval
+
+    def shared(self, name: str) -> List[dict]:
+        '''
+        Return: the shared dict name of this process, followed by those of
+        the other running workers when a directory is set
+        '''
+        if self.directory is None:
+            return [self._shared[name]()] if name in self._shared else []
+        return [snapshot["shared"][name] for snapshot in self.snapshots()
+                if name in snapshot["shared"] and self._live(snapshot)]
+
+    def _aggregated(self) -> Tuple[dict, Dict[str, List[Sample]]]:
+        '''
+        Return: values and collector samples summed over the workers
+        '''
+        kinds = {metric.name: metric.kind for metric in self._metrics}
+        merged: dict = {}
+        summed: Dict[str, dict] = {}
+        for snapshot in self.snapshots():
+            live = self._live(snapshot)
+            for name, labels, value in snapshot["values"]:
+                # a gone worker's requests still happened; its gauges went with it
+                if live or kinds.get(name) != "gauge":
+                    _add_values(merged, {(name, tuple(labels)): value})
+            if not live:
+                continue
+            for name, samples in snapshot["collected"].items():
+                totals = summed.setdefault(name, {})
+                for label_names, label_values, value in samples:
+                    key = (tuple(label_names), tuple(label_values))
+                    totals[key] = totals.get(key, 0.0) + value
+        collected = {name: [(names, values, value) for (names, values), value in totals.items()]
+                     for name, totals in summed.items()}
+        return merged, collected
+
+    def render(self) -> str:
+        '''
+        Return: every metric in the Prometheus text exposition format 0.0.4,
+        summed over the workers when a directory is set
+        '''
+        if self.directory is None:
+            merged, collected = self.merged(), self.collect()
+        else:
+            merged, collected = self._aggregated()
+        by_metric: Dict[str, List[Tuple[Labels, object]]] = {}
+        for (name, labels), value in merged.items():
+            by_metric.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for labels, value in sorted(by_metric.get(metric.name, []), key=lambda item: item[0]):
+                lines.extend(metric.lines(labels, value))
+        for name, kind, documentation, _ in self._collectors:
+            if name not in collected:
+                continue
+            samples = collected[name]
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for label_names, label_values, value in samples:
+                lines.append(f"{name}{_format_labels(label_names, label_values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        '''
+        Zero every value (for tests; a live process never resets)
+        '''
+        with self._lock:
+            for _, shard in self._shards:
+                shard.clear()
+            self._retired.clear()
+
+
+def _add_values(total: dict, values: dict) -> None:
+    '''
+    Add values (counters, or histogram bucket lists) into total
+    '''
+    for key, value in values.items():
+        if isinstance(value, list):
+            summed = total.setdefault(key, [0.0] * len(value))
+            for i, part in enumerate(value):
+                summed[i] += part
+        else:
+            total[key] = total.get(key, 0.0) + value
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: Registry, name: str, documentation: str, labelnames: Labels = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def lines(self, labels: Labels, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry: Registry, name: str, documentation: str,
+                 labelnames: Labels = (), buckets: Tuple[float, ...] = HTTP_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        # Per-bucket (not cumulative) counts, then +Inf, sum and count
+        values = shard.get(key)
+        if values is None:
+            values = shard[key] = [0.0] * (len(self.buckets) + 3)
+        values[bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def lines(self, labels: Labels, value) -> List[str]:
+        names = self.labelnames + ("le",)
+        lines, cumulative = [], 0.0
+        for bound, count in zip(self.buckets + (float("inf"),), value):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} "
+                         f"{_format_value(cumulative)}")
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(value[-2])}")
+        lines.append(f"{self.name}_count{label_text} {_format_value(value[-1])}")
+        return lines
+
+
+registry = Registry(MULTIPROC_DIR)
+
+HTTP_REQUESTS = Counter(registry, "http_requests_total", "HTTP requests by route, method and status.",
+                        ("method", "route", "status"))
+HTTP_DURATION = Histogram(registry, "http_request_duration_seconds", "HTTP request latency by route.",
+                          ("method", "route"))
+HTTP_IN_FLIGHT = Gauge(registry, "http_requests_in_flight", "HTTP requests being served.")
+
+DB_METHOD_CALLS = Counter(registry, "db_method_calls_total", "DB method calls by method and outcome.",
+                          ("method", "outcome"))
+DB_METHOD_DURATION = Histogram(registry, "db_method_duration_seconds", "DB method latency, queries included.",
+                               ("method",), DB_BUCKETS)
+DB_QUERIES = Counter(registry, "db_queries_total", "SQL statements executed, by the DB method issuing them.",
+                     ("engine", "method"))
+DB_QUERY_DURATION = Histogram(registry, "db_query_duration_seconds",
+                              "SQL statement execution time, by the DB method issuing it.",
+                              ("engine", "method"), DB_BUCKETS)
+DB_POOL_WAIT = Histogram(registry, "db_pool_checkout_wait_seconds",
+                         "Time spent waiting for a pooled connection.", ("engine",), DB_BUCKETS)
+
+THREADPOOL_WAIT = Histogram(registry, "threadpool_queue_wait_seconds",
+                            "Time DB calls waited for a threadpool worker.", (), DB_BUCKETS)
+RESPONSE_ENCODE = Histogram(registry, "response_encode_seconds",
+                            "Time spent encoding fast-path JSON / NDJSON bodies.", ("format",), DB_BUCKETS)
+DB_READ_ROUTES = Counter(registry, "db_read_routes_total",
+                         "Read-only DB calls by the database serving them (primary or replica).", ("target",))
+GROUP_COMMIT_BATCH = Histogram(registry, "db_group_commit_batch_size",
+                               "Writes committed per group commit transaction.", (),
+                               (1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+# Name of the DB method running in this context; queries are attributed to it
+_db_method: contextvars.ContextVar[str] = contextvars.ContextVar("db_method", default="none")
+
+
+def call_db_method(db, name: str, *args, **kwargs):
+    '''
+    Call db.<name>(*args, **kwargs), timing it and attributing the SQL it
+    runs to name. Must run on the thread (or greenlet) that executes the
+    queries, e.g. inside run_in_threadpool or AsyncSession.run_sync.
+    '''
+    token = _db_method.set(name)
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        result = getattr(db, name)(*args, **kwargs)
+        outcome = "ok"
+        return result
+    finally:
+        DB_METHOD_DURATION.observe(time.perf_counter() - started, (name,))
+        DB_METHOD_CALLS.inc((name, outcome))
+        _db_method.reset(token)
+
+
+# instrumented engine -> its label; engines sharing a label are summed
+_engines: "weakref.WeakKeyDictionary[Engine, str]" = weakref.WeakKeyDictionary()
+
+
+def _pool_gauge(read: Callable[[object], float]) -> Callable[[], Iterable[Sample]]:
+    def collect():
+        totals: Dict[str, float] = {}
+        for engine, engine_name in list(_engines.items()):
+            # engine.pool, not the pool seen at install: dispose() replaces it.
+            # Only QueuePool-style pools report occupancy
+            if hasattr(engine.pool, "checkedout"):
+                totals[engine_name] = totals.get(engine_name, 0.0) + read(engine.pool)
+        for engine_name, value in totals.items():
+            yield ("engine",), (engine_name,), value
+    return collect
+
+
+registry.register_collector("db_pool_checked_out", "gauge", "Pooled connections in use.",
+                            _pool_gauge(lambda pool: pool.checkedout()))
+registry.register_collector("db_pool_size", "gauge", "Pooled connections kept open.",
+                            _pool_gauge(lambda pool: pool.size()))
+registry.register_collector("db_pool_overflow", "gauge", "Connections open beyond the pool size.",
+                            _pool_gauge(lambda pool: max(0, pool.overflow())))
+
+
+def install_engine_metrics(engine: Engine, name: str) -> None:
+    '''
+    Count and time every statement engine executes, and time connection
+    checkouts from its pool; name labels the engine ("sync", "async")
+    '''
+    if engine in _engines:
+        raise ValueError(f"Engine metrics already installed as '{_engines[engine]}'")
+    _engines[engine] = name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record_query(conn, cursor, statement, parameters, context, executemany):
+        labels = (name, _db_method.get())
+        DB_QUERY_DURATION.observe(time.perf_counter() - conn.info["metrics_query_start"].pop(), labels)
+        DB_QUERIES.inc(labels)
+
+    @event.listens_for(engine, "handle_error")
+    def _discard_timer(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_query_start"):
+            conn.info["metrics_query_start"].pop()
+
+    pool = engine.pool
+    # The pool has no "checkout requested" event; time the private getter
+    # that blocks while the pool is exhausted instead
+    do_get = getattr(pool, "_do_get", None)
+    if do_get is None:
+        logger.warning("%s has no _do_get; db_pool_checkout_wait_seconds is not recorded for engine '%s'",
+                       type(pool).__name__, name)
+        return
+
+    def _timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started, (name,))
+
+    pool._do_get = _timed_do_get
+
+
+def _threadpool_gauge(read: Callable[[object], float]) -> Callable[[], Iterable[Sample]]:
+    def collect():
+        # The limiter belongs to the running event loop, so this only
+        # answers on the loop; the scrape handler runs there
+        limiter = to_thread.current_default_thread_limiter()
+        yield (), (), read(limiter)
+    return collect
+
+
+registry.register_collector("threadpool_tokens_total", "gauge", "Threadpool worker limit.",
+                            _threadpool_gauge(lambda limiter: limiter.total_tokens))
+registry.register_collector("threadpool_tokens_borrowed", "gauge", "Threadpool workers busy.",
+                            _threadpool_gauge(lambda limiter: limiter.borrowed_tokens))
+registry.register_collector("threadpool_tasks_waiting", "gauge", "Calls queued for a free threadpool worker.",
+                            _threadpool_gauge(lambda limiter: limiter.statistics().tasks_waiting))
+
+
+async def write_snapshots(registry: Registry) -> None:
+    '''
+    Rewrite the snapshot of registry in its directory every interval
+    seconds, so scrapes served by other workers see this one; runs until
+    cancelled
+    '''
+    while True:
+        # taken on the loop for the threadpool gauges, written off it
+        await to_thread.run_sync(registry.write_snapshot, registry.snapshot())
+        await asyncio.sleep(registry.interval)
+
+
+def route_label(scope: dict) -> str:
+    '''
+    Return: the route template of a handled request (/tasks/{task_id}),
+    its path for plain Starlette routes (/docs), or "unmatched"
+    '''
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        return scope["path"]
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording HTTP request counts, latency and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            route = route_label(scope)
+            HTTP_REQUESTS.inc((scope["method"], route, str(status_code)))
+            HTTP_DURATION.observe(elapsed, (scope["method"], route))
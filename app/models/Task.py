@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, literal_column
 from typing import Optional
 from datetime import datetime, timezone
 from enum import Enum
@@ -16,7 +17,48 @@ class TaskPriority(str, Enum):
     high = "high"
     urgent = "urgent"
 
+# Sort order used by /tasks/sort-by/priority and /tasks/sort-by/status.
+PRIORITY_RANK = {
+    TaskPriority.urgent: 1,
+    TaskPriority.high: 2,
+    TaskPriority.medium: 3,
+    TaskPriority.low: 4,
+}
+STATUS_RANK = {
+    TaskStatus.pending: 1,
+    TaskStatus.in_progress: 2,
+    TaskStatus.completed: 3,
+    TaskStatus.cancelled: 4,
+}
+
+
+def _rank_sql(column: str, ranks: dict) -> str:
+    whens = " ".join(f"WHEN '{member.value}' THEN {rank}" for member, rank in ranks.items())
+    return f"CASE {column} {whens} ELSE {len(ranks) + 1} END"
+
+
+# The rank expressions are rendered as literal SQL (no bound parameters)
+# so that SQLite can match them against the expression indexes below.
+PRIORITY_RANK_SQL = _rank_sql("priority", PRIORITY_RANK)
+STATUS_RANK_SQL = _rank_sql("status", STATUS_RANK)
+
+# Tasks still being worked on; only these count as overdue
+OPEN_STATUSES = (TaskStatus.pending, TaskStatus.in_progress)
+
 class Task(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_task_status_priority_id", "status", "priority", "id"),
+        Index("ix_task_status_id", "status", "id"),
+        Index("ix_task_priority_id", "priority", "id"),
+        Index("ix_task_created_at_id", "created_at", "id"),
+        Index("ix_task_due_date", "due_date"),
+        Index("ix_task_title", "title"),
+        Index("ix_task_assigned_to", "assigned_to"),
+        Index("ix_task_priority_rank", literal_column(PRIORITY_RANK_SQL), "id"),
+        Index("ix_task_status_rank", literal_column(STATUS_RANK_SQL), "id"),
+        Index("ix_task_status_due_date", "status", "due_date"),
+    )
+
     id: Optional[int] = Field(
         default=None,
         primary_key=True,
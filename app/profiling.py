@@ -0,0 +1,343 @@
+"""
+Opt-in profiling of single requests.
+
+Profiling is off unless PROFILING_TOKEN is set. When it is, a request that
+carries the token in an X-Profile header or a ?profile= query parameter
+runs under cProfile, and every SQL statement it executes is recorded with
+its duration. The result goes to a ring buffer of the last
+PROFILE_BUFFER_SIZE profiles, served by the /debug/profiles routes as JSON
+(statements and the top PROFILE_TOP_N functions by cumulative time) or as
+a .prof file for pstats, snakeviz and similar tools. The response to the
+profiled request names its profile in an X-Profile-Id header.
+
+Without PROFILING_TOKEN neither the middleware nor the SQL listeners are
+installed, so requests pay nothing. With it, requests that are not
+profiled pay a header lookup and, per statement and threadpool call, one
+context variable read.
+
+cProfile observes a thread, not a request. The event loop part of the
+request is profiled on the loop thread, where other requests interleaving
+with it at await points are also recorded, so profile a quiet instance
+when the split matters. DB calls dispatched to the threadpool get their
+own profiler, merged into the request's. One request is profiled at a
+time; a second one asking meanwhile runs normally and is answered with
+X-Profile-Skipped: busy.
+
+With several worker processes sharing MULTIPROC_DIR (app.server), finished
+profiles are also written to its profiles/ subdirectory, and the routes
+read them from there, so any worker serves the profile of a request
+another one handled. PROFILE_BUFFER_SIZE then bounds all workers together.
+"""
+import contextvars
+import cProfile
+import glob
+import hmac
+import io
+import json
+import marshal
+import os
+import pstats
+import re
+import time
+import uuid
+from collections import deque
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import Deque, List, Optional, Tuple
+from urllib.parse import parse_qs, parse_qsl, urlencode
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.metrics import MULTIPROC_DIR
+
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN") or None
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "20"))
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "40"))
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_PARAM = "profile"
+# the routes serving the buffer take the same token and are never profiled
+PROFILES_PATH = "/debug/profiles"
+# Shared by the worker processes of one server, None for one process
+PROFILE_DIR = os.path.join(MULTIPROC_DIR, "profiles") if MULTIPROC_DIR else None
+
+
+class RequestProfile:
+    """The profile of one request: cProfile statistics plus its SQL"""
+
+    def __init__(self, method: str, path: str, query: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.query = query
+        self.started_at = datetime.now(timezone.utc)
+        self.status: Optional[int] = None
+        self.duration_ms: Optional[float] = None
+        self.queries: List[dict] = []
+        self.profilers: List[cProfile.Profile] = []
+        self.stats = b""
+        self.report = ""
+
+    def finish(self, status: int, elapsed: float) -> None:
+        '''
+        Merge the profilers of every thread the request ran on into the
+        pstats dump and the text report
+        '''
+        self.status = status
+        self.duration_ms = round(elapsed * 1000, 3)
+        stats = pstats.Stats(self.profilers[0])
+        for profiler in self.profilers[1:]:
+            stats.add(profiler)
+        self.stats = marshal.dumps(stats.stats)
+        report = io.StringIO()
+        stats.stream = report
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        self.report = report.getvalue()
+        self.profilers = []
+
+    def summary(self) -> dict:
+        '''
+        Return: what identifies the profile in the buffer listing
+        '''
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "started_at": self.started_at.isoformat(),
+            "status": self.status,
+            "duration_ms": self.duration_ms,
+            "sql_count": len(self.queries),
+            "sql_ms": round(sum(query["duration_ms"] for query in self.queries), 3),
+        }
+
+    def to_dict(self) -> dict:
+        return {**self.summary(), "sql": self.queries, "report": self.report}
+
+    @classmethod
+    def from_dict(cls, data: dict, stats: bytes) -> "RequestProfile":
+        '''
+        Return: the finished profile that to_dict() and stats describe
+        '''
+        profile = cls(data["method"], data["path"], data["query"])
+        profile.id = data["id"]
+        profile.started_at = datetime.fromisoformat(data["started_at"])
+        profile.status = data["status"]
+        profile.duration_ms = data["duration_ms"]
+        profile.queries = data["sql"]
+        profile.report = data["report"]
+        profile.stats = stats
+        return profile
+
+
+# most recent last
+profiles: Deque[RequestProfile] = deque(maxlen=PROFILE_BUFFER_SIZE)
+
+_current: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar(
+    "request_profile", default=None
+)
+
+
+def _stored() -> List[Tuple[int, str]]:
+    '''
+    Return: (mtime, id) of the profiles in PROFILE_DIR, oldest first
+    '''
+    stored = []
+    for path in glob.glob(os.path.join(PROFILE_DIR, "*.json")):
+        # another worker may evict it meanwhile
+        with suppress(OSError):
+            stored.append((os.stat(path).st_mtime_ns, os.path.basename(path)[:-len(".json")]))
+    return sorted(stored)
+
+
+def _load(profile_id: str) -> Optional[RequestProfile]:
+    path = os.path.join(PROFILE_DIR, profile_id)
+    try:
+        with open(f"{path}.json") as file:
+            data = json.load(file)
+        with open(f"{path}.prof", "rb") as file:
+            stats = file.read()
+    except (OSError, ValueError):
+        return None
+    return RequestProfile.from_dict(data, stats)
+
+
+def save_profile(profile: RequestProfile) -> None:
+    '''
+    Buffer a finished profile, in PROFILE_DIR too when it is set
+    '''
+    profiles.append(profile)
+    if PROFILE_DIR is None:
+        return
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, profile.id)
+    with open(f"{path}.prof", "wb") as file:
+        file.write(profile.stats)
+    # the .json appears last and marks the profile complete
+    with open(f"{path}.json.tmp", "w") as file:
+        json.dump(profile.to_dict(), file)
+    os.replace(f"{path}.json.tmp", f"{path}.json")
+    for _, evicted in _stored()[:-PROFILE_BUFFER_SIZE]:
+        for suffix in (".json", ".prof"):
+            with suppress(OSError):
+                os.remove(os.path.join(PROFILE_DIR, evicted + suffix))
+
+
+def recent_profiles() -> List[RequestProfile]:
+    '''
+    Return: the buffered profiles, newest first
+    '''
+    if PROFILE_DIR is None:
+        return list(reversed(profiles))
+    loaded = (_load(profile_id) for _, profile_id in reversed(_stored()[-PROFILE_BUFFER_SIZE:]))
+    return [profile for profile in loaded if profile is not None]
+
+
+def get_profile(profile_id: str) -> Optional[RequestProfile]:
+    '''
+    Return: the buffered profile with profile_id, None once it was evicted
+    '''
+    if PROFILE_DIR is not None:
+        # ids are 16 hex digits; anything else could name another file
+        return _load(profile_id) if re.fullmatch(r"[0-9a-f]{16}", profile_id) else None
+    for profile in profiles:
+        if profile.id == profile_id:
+            return profile
+    return None
+
+
+def authorized(token: Optional[str]) -> bool:
+    '''
+    Return: whether token is the profiling token
+    '''
+    if not PROFILING_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode())
+
+
+def profile_in_thread(fn, *args, **kwargs):
+    '''
+    Call fn(*args, **kwargs), profiling it when the request that handed it
+    to the current worker thread is being profiled
+    '''
+    profile = _current.get()
+    if profile is None:
+        return fn(*args, **kwargs)
+    profiler = cProfile.Profile()
+    profile.profilers.append(profiler)
+    profiler.enable()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+
+
+def install_sql_capture(engine: Engine) -> bool:
+    '''
+    Record the statements engine executes on behalf of profiled requests.
+
+    Return: False without installing anything when PROFILING_TOKEN is not set
+    '''
+    if not PROFILING_TOKEN:
+        return False
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        profile = _current.get()
+        if profile is None or not conn.info.get("profile_query_start"):
+            return
+        elapsed = time.perf_counter() - conn.info["profile_query_start"].pop()
+        # parameters are left out: they carry user data into the buffer
+        profile.queries.append({
+            "statement": statement,
+            "duration_ms": round(elapsed * 1000, 3),
+            "rows": cursor.rowcount,
+            "executemany": executemany,
+        })
+
+    @event.listens_for(engine, "handle_error")
+    def _discard_timer(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("profile_query_start"):
+            conn.info["profile_query_start"].pop()
+
+    return True
+
+
+def _without_token(query_string: bytes) -> str:
+    '''
+    Return: the query string without the profile parameter, so the token
+    never reaches the buffer that /debug/profiles lists
+    '''
+    query = query_string.decode("latin-1")
+    if PROFILE_PARAM + "=" not in query:
+        return query
+    return urlencode([(name, value) for name, value in parse_qsl(query, keep_blank_values=True)
+                      if name != PROFILE_PARAM])
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling the requests that carry the profiling token"""
+
+    def __init__(self, app, token: Optional[str] = None):
+        self.app = app
+        self.token = token or PROFILING_TOKEN
+        self._active = False
+
+    def _requested(self, scope) -> bool:
+        if scope["path"].startswith(PROFILES_PATH):
+            return False
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value, self.token.encode())
+        query_string = scope.get("query_string", b"")
+        if PROFILE_PARAM.encode() + b"=" in query_string:
+            values = parse_qs(query_string.decode("latin-1")).get(PROFILE_PARAM, [])
+            return any(hmac.compare_digest(value.encode(), self.token.encode()) for value in values)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if self._active:
+            async def send_skipped(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-profile-skipped", b"busy")]}
+                await send(message)
+
+            await self.app(scope, receive, send_skipped)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], _without_token(scope.get("query_string", b"")))
+        status_code = 500
+
+        async def send_with_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]}
+            await send(message)
+
+        profiler = cProfile.Profile()
+        profile.profilers.append(profiler)
+        token = _current.set(profile)
+        self._active = True
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            self._active = False
+            _current.reset(token)
+            profile.finish(status_code, elapsed)
+            save_profile(profile)
@@ -0,0 +1,93 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional, Tuple
+
+from fastapi import Request, Response, status
+
+# (task id, last change timestamp) - what a task's representation depends on
+TaskVersion = Tuple[int, datetime]
+
+
+def task_version(task) -> TaskVersion:
+    '''
+    Return: the version of a task object: its id and updated_at, or
+    created_at for tasks that were never updated
+    '''
+    return task.id, task.updated_at or task.created_at
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def make_etag(versions: Iterable[TaskVersion], extra: str = "") -> str:
+    '''
+    Strong ETag over the ordered task versions of a response, plus any
+    extra state that shapes it (e.g. the next cursor)
+    '''
+    digest = hashlib.sha1()
+    for task_id, changed_at in versions:
+        digest.update(f"{task_id}:{_as_utc(changed_at).isoformat()};".encode())
+    digest.update(extra.encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison: W/"x" matches "x"
+    candidates = (tag.strip() for tag in header.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def conditional_response(request: Request, response: Response,
+                         versions: Iterable[TaskVersion], extra: str = "",
+                         last_modified: bool = False) -> Optional[Response]:
+    '''
+    Set ETag, and with last_modified also Last-Modified, on response for
+    the given task versions.
+
+    Only single-task responses should pass last_modified: a collection
+    changes when a task leaves it (deleted, or no longer matching), which
+    moves no timestamp of the remaining tasks, so If-Modified-Since would
+    answer 304 for a stale list. Collections are validated by ETag alone.
+
+    Return: a 304 Not Modified response when the request's If-None-Match
+    (or, without it, If-Modified-Since) shows the client copy is current,
+    otherwise None and the caller returns its payload as usual.
+    '''
+    versions = list(versions)
+    etag = make_etag(versions, extra)
+    headers = {"ETag": etag}
+    if last_modified and versions:
+        last_modified = max(_as_utc(changed_at) for _, changed_at in versions)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and "Last-Modified" in headers:
+        try:
+            since = _as_utc(parsedate_to_datetime(if_modified_since))
+        except (TypeError, ValueError):
+            return None
+        # HTTP dates have second resolution
+        if last_modified.replace(microsecond=0) <= since:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
+
+
+def if_none_match_present(request: Request) -> bool:
+    '''
+    Return: whether the client sent If-None-Match, i.e. whether checking
+    the version before loading the full row can pay off
+    '''
+    return request.headers.get("if-none-match") is not None
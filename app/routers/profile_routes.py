@@ -0,0 +1,64 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+
+from app import profiling
+
+
+def require_profiling_token(
+    x_profile: Optional[str] = Header(None),
+    profile: Optional[str] = Query(None),
+) -> None:
+    '''
+    Dependency guarding the profile buffer: hidden unless profiling is
+    enabled, and only readable with the profiling token
+    '''
+    if not profiling.PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.authorized(x_profile or profile):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+
+router = APIRouter(
+    prefix=profiling.PROFILES_PATH,
+    tags=["Debug"],
+    dependencies=[Depends(require_profiling_token)],
+    include_in_schema=False,
+)
+
+
+def _get_profile(profile_id: str) -> profiling.RequestProfile:
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.get("/")
+def list_profiles():
+    '''
+    Return: summaries of the buffered request profiles, newest first
+    '''
+    return [profile.summary() for profile in profiling.recent_profiles()]
+
+
+@router.get("/{profile_id}")
+def read_profile(profile_id: str):
+    '''
+    Return: a request profile with its SQL statements and the top functions
+    by cumulative time
+    '''
+    return _get_profile(profile_id).to_dict()
+
+
+@router.get("/{profile_id}/pstats")
+def download_profile(profile_id: str):
+    '''
+    Return: the profile as a .prof file, readable by pstats and snakeviz
+    '''
+    profile = _get_profile(profile_id)
+    return Response(
+        content=profile.stats,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile.id}.prof"'},
+    )
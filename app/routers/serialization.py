@@ -0,0 +1,184 @@
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Response
+
+from app.metrics import RESPONSE_ENCODE
+from app.schemas.task import TaskCursorPage, TaskPage, TaskResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+
+# TASK_SERIALIZER selects how the list endpoints encode tasks:
+#   fast     - TaskResponse columns selected as row tuples and encoded
+#              straight to JSON bytes, no per-row model validation (default)
+#   pydantic - ORM tasks validated into the route's response_model
+TASK_SERIALIZERS = ("fast", "pydantic")
+TASK_SERIALIZER = os.getenv("TASK_SERIALIZER", "fast").lower()
+if TASK_SERIALIZER not in TASK_SERIALIZERS:
+    raise ValueError(f"Invalid TASK_SERIALIZER '{TASK_SERIALIZER}'. "
+                     f"Valid values are: {', '.join(TASK_SERIALIZERS)}")
+
+# Column order of the rows DB returns with as_rows=True, and of the JSON keys
+TASK_FIELDS = tuple(TaskResponse.model_fields)
+
+# Columns every projection also selects: the task version behind ETags
+VERSION_FIELDS = ("id", "created_at", "updated_at")
+
+
+def task_fields(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,title,status")
+) -> Optional[Tuple[str, ...]]:
+    '''
+    Dependency parsing ?fields= into TaskResponse field names, in
+    TaskResponse order. None when the parameter is absent.
+    '''
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(TASK_FIELDS)
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid fields '{fields}'. Valid fields are: {', '.join(TASK_FIELDS)}"
+        )
+    return tuple(name for name in TASK_FIELDS if name in requested)
+
+
+def select_fields(fields: Optional[Tuple[str, ...]]) -> Optional[Tuple[str, ...]]:
+    '''
+    Return: the columns to select for a projection, i.e. fields plus the
+    version columns (None, meaning all columns, when fields is None)
+    '''
+    if fields is None:
+        return None
+    return fields + tuple(name for name in VERSION_FIELDS if name not in fields)
+
+
+def fields_tag(fields: Optional[Tuple[str, ...]]) -> str:
+    '''
+    Return: ETag extra distinguishing a projection from the full representation
+    '''
+    return "" if fields is None else ";fields=" + ",".join(fields)
+
+
+def fast_serialization() -> bool:
+    '''
+    Return: whether list endpoints should fetch rows (DB as_rows=True) and
+    encode them with tasks_response / page_response
+    '''
+    return TASK_SERIALIZER == "fast"
+
+
+def _json_default(value):
+    """JSON encoder fallback matching TaskResponse's datetime encoding"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    '''
+    Encode content to JSON bytes with orjson, or the json module without it
+    '''
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def task_row(values: dict) -> dict:
+    '''
+    Return: a task row dict shaped like TaskResponse output
+    '''
+    due_date = values.get("due_date")
+    if due_date is not None and due_date.tzinfo is None:
+        # TaskResponse assumes UTC for naive deadlines
+        values["due_date"] = due_date.replace(tzinfo=timezone.utc)
+    return values
+
+
+def _rows(rows: List, fields: Optional[Tuple[str, ...]] = None) -> List[dict]:
+    fields = fields or TASK_FIELDS
+    if not rows:
+        return []
+    names = rows[0]._fields
+    if names == fields:
+        return [task_row(dict(zip(fields, row))) for row in rows]
+    # Rows carry extra columns (version, cursor key); keep only fields
+    positions = [names.index(name) for name in fields]
+    return [task_row({name: row[i] for name, i in zip(fields, positions)}) for row in rows]
+
+
+def _raw_response(content: Any, response: Response) -> Response:
+    # A returned Response bypasses the injected one; carry over its
+    # headers (ETag, Last-Modified)
+    started = time.perf_counter()
+    body = dumps(content)
+    RESPONSE_ENCODE.observe(time.perf_counter() - started, ("json",))
+    return Response(body, media_type="application/json", headers=dict(response.headers))
+
+
+def tasks_response(tasks: List, response: Response, fields: Optional[Tuple[str, ...]] = None):
+    '''
+    Return: in fast mode or for a projection, the task rows (only fields,
+    when given) as a raw JSON Response; otherwise tasks unchanged for the
+    route's response_model
+    '''
+    if not fast_serialization() and fields is None:
+        return tasks
+    return _raw_response(_rows(tasks, fields), response)
+
+
+def page_response(items: List, next_cursor: Optional[str], response: Response,
+                  fields: Optional[Tuple[str, ...]] = None):
+    '''
+    Return: a cursor page as a raw JSON Response in fast mode or for a
+    projection, otherwise a TaskCursorPage
+    '''
+    if not fast_serialization() and fields is None:
+        return TaskCursorPage(items=items, next_cursor=next_cursor)
+    return _raw_response({"items": _rows(items, fields), "next_cursor": next_cursor}, response)
+
+
+def envelope_response(items: List, has_more: bool, total: Optional[int], response: Response,
+                      fields: Optional[Tuple[str, ...]] = None):
+    '''
+    Return: an offset page envelope as a raw JSON Response in fast mode or
+    for a projection, otherwise a TaskPage
+    '''
+    if not fast_serialization() and fields is None:
+        return TaskPage(items=items, has_more=has_more, total=total)
+    return _raw_response({"items": _rows(items, fields), "has_more": has_more, "total": total}, response)
+
+
+def envelope_tag(has_more: bool, total: Optional[int]) -> str:
+    '''
+    Return: ETag extra for the envelope fields, which can change while the
+    listed tasks do not
+    '''
+    return f";has_more={int(has_more)};total={'' if total is None else total}"
+
+
+def task_response(task, response: Response, fields: Optional[Tuple[str, ...]] = None):
+    '''
+    Return: a single task, projected to fields as a raw JSON Response when
+    given, otherwise unchanged for the route's response_model
+    '''
+    if fields is None:
+        return task
+    return _raw_response(task_row({name: getattr(task, name) for name in fields}), response)
+
+
+def ndjson_lines(rows: Iterable[dict]) -> bytes:
+    '''
+    Return: row dicts encoded as NDJSON, one task per line
+    '''
+    started = time.perf_counter()
+    body = b"".join(dumps(task_row(row)) + b"\n" for row in rows)
+    RESPONSE_ENCODE.observe(time.perf_counter() - started, ("ndjson",))
+    return body
@@ -1,10 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from app.models.Task import TaskPriority, TaskStatus
 from app.schemas.task import TaskCreate, TaskUpdate, TaskResponse,TaskBulkUpdateRequest, TaskBulkDeleteRequest
-from app.schemas.task import BulkUpdateResponse, BulkDeleteResponse
-from app.db.database import DB
-from app.db.dependancies import get_db
-from typing import List, Optional
+from app.schemas.task import BulkUpdateResponse, BulkDeleteResponse, TaskCursorPage, TaskPage
+from app.schemas.task import TaskBulkCreateRequest, BulkCreateResponse, TaskStatsResponse
+from app.schemas.task import TaskChange, TaskChangePage
+from app.db.batching import BULK_CHUNK_SIZE
+from app.db.async_database import AsyncDB
+from app.db.changes import CHANGES_KEEPALIVE_SECONDS, CHANGES_STREAM_SECONDS, ChangeFeed, ChangesGone
+from app.db.dependancies import get_change_feed, get_task_db
+from app.routers.conditional import conditional_response, if_none_match_present, task_version
+from app.routers.serialization import fast_serialization, ndjson_lines, page_response, tasks_response
+from app.routers.serialization import fields_tag, select_fields, task_fields, task_response
+from app.routers.serialization import envelope_response, envelope_tag
+from typing import AsyncIterator, List, Optional, Tuple, Union
+import time
 from pydantic import BaseModel
 
 
@@ -17,35 +27,69 @@ router = APIRouter(prefix="/tasks", tags=["Tasks"])
     summary="Create a new task",
     response_description="The created task"
 )
-def creat_task(task: TaskCreate, db: DB = Depends(get_db)) -> TaskResponse:
+async def creat_task(task: TaskCreate, db: AsyncDB = Depends(get_task_db)) -> TaskResponse:
     """Create a new task with all the information"""
     try:
-        return db.create_task(task)
+        return await db.create_task(task)
     except ValueError as e:
         raise HTTPException(400, detail=str(e))
 
 
 @router.get(
     "/",
-    response_model=List[TaskResponse],
+    response_model=Union[List[TaskResponse], TaskCursorPage, TaskPage],
     status_code=status.HTTP_200_OK,
     summary="List all tasks with pagination and filters",
     response_description="List of paginated and filterd tasks"
 )
-def all_tasks(
+async def all_tasks(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1),
     priority: Optional[TaskPriority] = Query(None),
     status: Optional[TaskStatus] = Query(None),
-    db: DB = Depends(get_db)) -> List[TaskResponse]:
+    cursor: Optional[str] = Query(None, description="Opaque cursor; pass an empty value for the first page"),
+    order_by: str = Query("id", description="Keyset sort key used with cursor: id or created_at"),
+    fields: Optional[Tuple[str, ...]] = Depends(task_fields),
+    envelope: bool = Query(False, description="Wrap the page as {items, has_more, total}"),
+    count: Optional[str] = Query(None, description="Total for the envelope: exact or estimated"),
+    db: AsyncDB = Depends(get_task_db)) -> Union[List[TaskResponse], TaskCursorPage, TaskPage]:
     """
     Retrieve a list of tasks with pagination:
 
     - **skip**: number of items to skip (default 0)
     - **limit**: maximum number of items to return (default 10)
+    - **cursor**: switch to keyset pagination; the response becomes
+      `{"items": [...], "next_cursor": ...}` and `skip` is ignored
+    - **order_by**: sort key for cursor pagination (`id` or `created_at`)
+    - **fields**: comma-separated fields to return (e.g. `id,title,status`);
+      only those columns are read from the database
+    - **envelope**: return `{"items": [...], "has_more": ..., "total": ...}`
+      instead of a bare list (offset pagination only)
+    - **count**: fill in `total` (implies `envelope`): `exact`, or
+      `estimated` to stay cheap on large filtered lists
+
+    Responses carry an ETag over the listed tasks; a matching
+    `If-None-Match` gets `304 Not Modified`.
     """
     try:
-        return db.get_tasks_pagination_and_filter(skip, limit, priority, status)
+        as_rows, columns, tag = fast_serialization(), select_fields(fields), fields_tag(fields)
+        if cursor is not None:
+            items, next_cursor = await db.get_tasks_keyset(cursor, limit, priority, status, order_by,
+                                                           as_rows, columns)
+            not_modified = conditional_response(request, response, map(task_version, items),
+                                                (next_cursor or "") + tag)
+            return not_modified or page_response(items, next_cursor, response, fields)
+        if envelope or count is not None:
+            tasks, has_more, total = await db.get_tasks_page(skip, limit, priority, status, as_rows,
+                                                             columns, count)
+            not_modified = conditional_response(request, response, map(task_version, tasks),
+                                                tag + envelope_tag(has_more, total))
+            return not_modified or envelope_response(tasks, has_more, total, response, fields)
+        tasks = await db.get_tasks_pagination_and_filter(skip, limit, priority, status, as_rows, columns)
+        return (conditional_response(request, response, map(task_version, tasks), tag)
+                or tasks_response(tasks, response, fields))
     except ValueError as e:
         raise HTTPException(
             status_code=400,
@@ -55,27 +99,169 @@ def all_tasks(
 
 @router.get(
         "/search",
-        response_model=List[TaskResponse],
+        response_model=Union[List[TaskResponse], TaskPage],
         status_code=status.HTTP_200_OK,
         summary="Search tasks by text in title or description with pagination",
         response_description="List of tasks matching the search criteria with pagination"
     )
-def search_tasks(
+async def search_tasks(
+    request: Request,
+    response: Response,
     text: str = Query(..., description="Text to search in title / description"),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1),
-    db: DB = Depends(get_db)
-    ) -> List[TaskResponse]:
+    fields: Optional[Tuple[str, ...]] = Depends(task_fields),
+    envelope: bool = Query(False, description="Wrap the page as {items, has_more, total}"),
+    count: Optional[str] = Query(None, description="Total for the envelope: exact or estimated"),
+    db: AsyncDB = Depends(get_task_db)
+    ) -> Union[List[TaskResponse], TaskPage]:
     """
     Search tasks by text in title or description with pagination:
     - **text**: text to search for (required)
     - **skip**: number of items to skip (default 0) 
     - **limit**: maximum number of items to return (default 10)
+    - **fields**: comma-separated fields to return (e.g. `id,title,status`)
+    - **envelope** / **count**: as for `GET /tasks/`; an `estimated` total
+      may be a few seconds old
     """
     try:
-        return db.search_tasks(text, skip, limit)
+        as_rows, columns, tag = fast_serialization(), select_fields(fields), fields_tag(fields)
+        if envelope or count is not None:
+            tasks, has_more, total = await db.search_tasks_page(text, skip, limit, as_rows, columns, count)
+            not_modified = conditional_response(request, response, map(task_version, tasks),
+                                                tag + envelope_tag(has_more, total))
+            return not_modified or envelope_response(tasks, has_more, total, response, fields)
+        tasks = await db.search_tasks(text, skip, limit, as_rows, columns)
+        return (conditional_response(request, response, map(task_version, tasks), tag)
+                or tasks_response(tasks, response, fields))
     except HTTPException:
         raise 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail="Server error"
+        ) from e
+
+
+@router.get(
+    "/stats",
+    response_model=TaskStatsResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Task counts by status, priority and assignee",
+    response_description="Task counters"
+)
+async def task_stats(db: AsyncDB = Depends(get_task_db)) -> TaskStatsResponse:
+    """
+    Count tasks without scanning them:
+    - **total**, **by_status**, **by_priority**, **by_assignee** and
+      **unassigned** come from counters kept current on every write
+    - **overdue**: pending or in-progress tasks past their due date
+    """
+    return await db.get_task_stats()
+
+
+@router.get(
+    "/changes",
+    response_model=TaskChangePage,
+    status_code=status.HTTP_200_OK,
+    summary="Tasks created, updated or deleted since a sequence number",
+    response_description="The changes and the seq to resume from",
+    responses={200: {"content": {"text/event-stream": {}}}, 410: {"description": "since is too old"}}
+)
+async def task_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Last seq seen; omit to get the current seq"),
+    limit: int = Query(100, ge=1, le=1000),
+    wait: float = Query(0, ge=0, le=60, description="Seconds to wait for a change (long poll)"),
+    stream: bool = Query(False, description="Stream changes as server-sent events"),
+    feed: ChangeFeed = Depends(get_change_feed)
+) -> TaskChangePage:
+    """
+    Changes to tasks after **since**, instead of polling `GET /tasks/`:
+    - **since**: the `next` of the previous response; omit it to get no
+      changes and the seq to start from
+    - **limit**: maximum number of changes read per response
+    - **wait**: hold the request up to this many seconds until there is a
+      change, then answer right away
+    - **stream**: answer with `text/event-stream` (also chosen by an
+      `Accept: text/event-stream` header), one `change` event per change
+      with its seq as the event id. `since` defaults to the
+      `Last-Event-ID` header, then to the current seq. `wait`, when given,
+      is how long the stream stays open.
+
+    Each change carries the task's current row, or `task: null` once it
+    is deleted; a task changed several times appears once, at its latest
+    seq. Raises 410 (or sends a `reset` event) when changes after since
+    were removed by retention; reload `GET /tasks/` and start over.
+    """
+    if stream or "text/event-stream" in request.headers.get("accept", ""):
+        last_event_id = request.headers.get("last-event-id", "")
+        if since is None and last_event_id.isdigit():
+            since = int(last_event_id)
+        # errors (no change log) while a status can still be sent
+        _, head = await feed.changes(None)
+        return StreamingResponse(
+            _change_events(feed, head if since is None else since, limit, wait or CHANGES_STREAM_SECONDS),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    try:
+        changes, next_seq = await feed.changes(since, limit, wait)
+    except ChangesGone as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    return TaskChangePage(changes=changes, next=next_seq)
+
+
+async def _change_events(feed: ChangeFeed, since: int, limit: int, duration: float) -> AsyncIterator[bytes]:
+    """
+    Server-sent events for the changes after since, until duration
+    seconds have passed; a comment line keeps idle connections open
+    """
+    deadline = time.monotonic() + duration
+    yield b"retry: 1000\n\n"
+    while (remaining := deadline - time.monotonic()) > 0:
+        try:
+            changes, since = await feed.changes(since, limit, min(remaining, CHANGES_KEEPALIVE_SECONDS))
+        except ChangesGone as e:
+            yield f"event: reset\ndata: {e}\n\n".encode()
+            return
+        if not changes:
+            yield b": keep-alive\n\n"
+        for change in changes:
+            data = TaskChange.model_validate(change).model_dump_json()
+            yield f"id: {change['seq']}\nevent: change\ndata: {data}\n\n".encode()
+
+
+@router.post(
+    "/bulk-create",
+    status_code=status.HTTP_201_CREATED,
+    summary="Bulk create tasks",
+    response_description="IDs of the created tasks",
+    response_model=BulkCreateResponse
+)
+async def bulk_create_tasks(
+    payload: TaskBulkCreateRequest,
+    chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=10000, description="Rows per INSERT statement"),
+    db: AsyncDB = Depends(get_task_db)
+) -> BulkCreateResponse:
+    """
+    Bulk create tasks in a single transaction.
+    - **tasks**: List of tasks, each validated like a single create
+
+    Returns the new task IDs in the order the tasks were given.
+    Raises 400 if the tasks list is empty.
+    Raises 422 if validation fails on any item; nothing is inserted then.
+    """
+    try:
+        ids = await db.bulk_create_tasks(payload.tasks, chunk_size)
+
+        return BulkCreateResponse(created=len(ids), ids=ids)
+
+    except HTTPException:
+        raise
+
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -90,13 +276,17 @@ def search_tasks(
     response_description="Number of tasks updated",
     response_model=BulkUpdateResponse
 )
-def bulk_update_tasks(
+async def bulk_update_tasks(
     payload: TaskBulkUpdateRequest,
-    db: DB = Depends(get_db)
+    chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=10000, description="Tasks per chunk"),
+    atomic: bool = Query(True, description="Commit once (true) or after every chunk (false)"),
+    db: AsyncDB = Depends(get_task_db)
 ) -> BulkUpdateResponse:
     """
     Bulk update multiple tasks at once.
     - **updates**: List of task updates, each with required 'id' and optional fields to update
+    - **chunk_size**: Tasks per chunk of UPDATE statements
+    - **atomic**: All-or-nothing when true; when false each chunk is committed on its own
 
     Returns the count of tasks actually updated.
     Raises 404 if any task IDs don't exist.
@@ -106,7 +296,7 @@ def bulk_update_tasks(
     try:
         # Convert list of TaskUpdate to list of dicts, excluding unset fields
         tasks = [task.model_dump(exclude_unset=True) for task in payload.updates]
-        updated_count = db.bulk_update_tasks(tasks)
+        updated_count = await db.bulk_update_tasks(tasks, chunk_size, atomic)
 
         return BulkUpdateResponse(updated_count=updated_count)
     
@@ -127,16 +317,20 @@ def bulk_update_tasks(
         response_description="Number of tasks deleted",
         response_model=BulkDeleteResponse
 )
-def bulk_delete_tasks(
+async def bulk_delete_tasks(
     payload: TaskBulkDeleteRequest,
-    db: DB = Depends(get_db)    
+    chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=10000, description="IDs per DELETE statement"),
+    atomic: bool = Query(True, description="Commit once (true) or after every chunk (false)"),
+    db: AsyncDB = Depends(get_task_db)    
 ) -> BulkDeleteResponse:
     """
     Bulk delete multiple tasks at once.
     - **task_ids**: List of task IDs to delete
+    - **chunk_size**: IDs per DELETE statement
+    - **atomic**: All-or-nothing when true; when false each chunk is committed on its own
     """
     try:
-        count_deleted = db.bulk_delete_tasks(payload.task_ids)
+        count_deleted = await db.bulk_delete_tasks(payload.task_ids, chunk_size, atomic)
 
         return BulkDeleteResponse(deleted=count_deleted)
     
@@ -156,16 +350,34 @@ def bulk_delete_tasks(
     summary="Get a task by ID",
     response_description="The requested task"
 )
-def task_by_id(task_id: int, db: DB = Depends(get_db)) -> TaskResponse:
+async def task_by_id(task_id: int, request: Request, response: Response,
+                     fields: Optional[Tuple[str, ...]] = Depends(task_fields),
+                     db: AsyncDB = Depends(get_task_db)) -> TaskResponse:
     """
     Get a single task by its ID:
 
     - **task_id**: the ID of task to retrieve
+    - **fields**: comma-separated fields to return (e.g. `id,title,status`)
+
+    Supports `If-None-Match` (ETag) and `If-Modified-Since`; a client whose
+    copy is current gets `304 Not Modified` without the task being loaded.
     """
-    task = db.get_task(task_id)
+    if if_none_match_present(request):
+        version = await db.get_task_version(task_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        not_modified = conditional_response(request, response, [version], fields_tag(fields),
+                                            last_modified=True)
+        if not_modified:
+            return not_modified
+
+    # The whole row is read (and cached) once; fields only trims the output
+    task = await db.get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task
+    return (conditional_response(request, response, [task_version(task)], fields_tag(fields),
+                                 last_modified=True)
+            or task_response(task, response, fields))
 
 
 @router.put(
@@ -175,39 +387,87 @@ def task_by_id(task_id: int, db: DB = Depends(get_db)) -> TaskResponse:
     summary="Update a task",
     response_description="The updated task"
 )
-def update_task(task_id: int, updates: TaskUpdate,
-                db: DB = Depends(get_db)) -> TaskResponse:
+async def update_task(task_id: int, updates: TaskUpdate,
+                      db: AsyncDB = Depends(get_task_db)) -> TaskResponse:
     """
     Update an existing task:
     - **task_id**: the ID of task to update
     - **updates**: fields to update (all optional)
     """
-    task = db.update_task(task_id, updates)
+    task = await db.update_task(task_id, updates)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
 
 @router.delete("/{task_id}", status_code=204)
-def delete_task(task_id: int, db: DB = Depends(get_db)) -> None:
+async def delete_task(task_id: int, db: AsyncDB = Depends(get_task_db)) -> None:
     """
     Delete an existing task:
 
     - **task_id**: the ID of task to delete
     """
-    if not db.delete_task(task_id):
+    if not await db.delete_task(task_id):
         raise HTTPException(status_code=404, detail="Task not found")
     
     return None
 
 
-@router.get("/sort-by/{field}", response_model=List[TaskResponse], status_code=status.HTTP_200_OK)
-def sort_tasks(field: str, db: DB = Depends(get_db)) -> List[TaskResponse]:
+def _ndjson_body(chunks):
+    """
+    NDJSON body over chunks from either DB path: an async iterator from
+    AsyncDB, or a sync one that StreamingResponse reads on the threadpool.
+    """
+    if hasattr(chunks, "__aiter__"):
+        async def body():
+            async for chunk in chunks:
+                yield ndjson_lines(chunk)
+        return body()
+    return (ndjson_lines(chunk) for chunk in chunks)
+
+
+@router.get(
+    "/sort-by/{field}",
+    response_model=Union[List[TaskResponse], TaskCursorPage],
+    status_code=status.HTTP_200_OK,
+    responses={200: {"content": {"application/x-ndjson": {}}}}
+)
+async def sort_tasks(
+    request: Request,
+    response: Response,
+    field: str,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor; pass an empty value for the first page"),
+    stream: bool = Query(False, description="Stream every task as NDJSON instead of one page"),
+    chunk_size: int = Query(500, ge=1, le=5000),
+    fields: Optional[Tuple[str, ...]] = Depends(task_fields),
+    db: AsyncDB = Depends(get_task_db)):
     """
     Sort tasks by a specified field:
     - **field**: the field to sort by (e.g., 'priority', 'due_date')
+    - **limit**: maximum number of items to return (default 100)
+    - **cursor**: switch to keyset pagination; the response becomes
+      `{"items": [...], "next_cursor": ...}`
+    - **stream**: return all tasks as `application/x-ndjson`, read from the
+      database `chunk_size` rows at a time
+    - **fields**: comma-separated fields to return (e.g. `id,title,status`)
     """
     try:
-        return db.sort_tasks(field)
+        if stream:
+            chunks = await db.stream_sorted_tasks(field, chunk_size, fields)
+            return StreamingResponse(_ndjson_body(chunks), media_type="application/x-ndjson")
+        as_rows, columns, tag = fast_serialization(), select_fields(fields), fields_tag(fields)
+        if cursor is not None:
+            items, next_cursor = await db.sort_tasks_keyset(field, cursor, limit, as_rows, columns)
+            not_modified = conditional_response(request, response, map(task_version, items),
+                                                (next_cursor or "") + tag)
+            return not_modified or page_response(items, next_cursor, response, fields)
+        tasks = await db.sort_tasks(field, limit, as_rows, columns)
+        return (conditional_response(request, response, map(task_version, tasks), tag)
+                or tasks_response(tasks, response, fields))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail="Server error") from e
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Server error") from e
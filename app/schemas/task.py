@@ -1,6 +1,6 @@
 from enum import Enum
 from pydantic import BaseModel, Field, field_validator, ConfigDict
-from typing import Optional, List
+from typing import Dict, Optional, List
 from app.models.Task import TaskStatus, TaskPriority
 from datetime import datetime, timezone
 
@@ -65,6 +65,14 @@ class TaskResponse(TaskCreate):
     created_at: datetime
     updated_at: Optional[datetime]
 
+    @field_validator('due_date')
+    @classmethod
+    def validate_deadline(cls, val: Optional[datetime]) -> Optional[datetime]:
+         """Stored deadlines may have passed; only assume UTC when naive"""
+         if val and val.tzinfo is None:
+            val = val.replace(tzinfo=timezone.utc)
+         return val
+
     model_config = ConfigDict(
         from_attributes=True, 
         use_enum_values=True,
@@ -74,6 +82,34 @@ class TaskResponse(TaskCreate):
         }
     )
 
+class TaskCursorPage(BaseModel):
+    items: List[TaskResponse]
+    next_cursor: Optional[str] = None
+
+class TaskPage(BaseModel):
+    items: List[TaskResponse]
+    has_more: bool
+    total: Optional[int] = None
+
+class TaskStatsResponse(BaseModel):
+    total: int
+    by_status: Dict[TaskStatus, int]
+    by_priority: Dict[TaskPriority, int]
+    by_assignee: Dict[str, int]
+    unassigned: int
+    overdue: int
+
+class TaskChange(BaseModel):
+    seq: int
+    op: str
+    task_id: int
+    changed_at: datetime
+    task: Optional[TaskResponse] = None
+
+class TaskChangePage(BaseModel):
+    changes: List[TaskChange]
+    next: int
+
 class TaskBulkUpdateItem(BaseModel):
     id: int
     title: Optional[str] = None
@@ -107,10 +143,23 @@ class TaskBulkUpdateRequest(BaseModel):
     updates: List[TaskBulkUpdateItem]
 
 
+# Upper bound on tasks per bulk-create request
+BULK_CREATE_MAX_TASKS = 10000
+
+
+class TaskBulkCreateRequest(BaseModel):
+    tasks: List[TaskCreate] = Field(..., max_length=BULK_CREATE_MAX_TASKS)
+
+
 class TaskBulkDeleteRequest(BaseModel):
     task_ids: List[int]
 
 
+class BulkCreateResponse(BaseModel):
+    created: int
+    ids: List[int]
+
+
 class BulkUpdateResponse(BaseModel):
     updated_count: int
 
@@ -0,0 +1,146 @@
+"""
+Multi-process server entry point.
+
+    python -m app.server --workers 4 --port 8000
+
+One-time database setup runs in this (parent) process before any worker
+starts, so workers never race each other on it:
+
+  - alembic upgrade head, or create_db_and_tables with --no-migrate
+  - on SQLite, the SQLITE_PROFILE PRAGMAs, including journal_mode=WAL,
+    which is stored in the database file; workers connecting later find
+    WAL on and share the file through it
+  - compaction of the task_change log (app.db.changes)
+  - on PostgreSQL, folding the task_stats delta rows (app.db.stats)
+
+The parent then closes its connections and starts --workers uvicorn
+workers (WEB_CONCURRENCY, else one per CPU). Workers are spawned, not
+forked: each imports the app and creates its own engines, connection
+pools, group commit writer and metrics. Pool settings (DB_POOL_SIZE,
+DB_MAX_OVERFLOW) therefore apply per worker. For servers that fork a
+preloaded app instead (gunicorn --preload), app.db.session drops
+inherited pooled connections in the child.
+
+The in-process task cache is only invalidated by writes in its own
+process, so with more than one worker it is disabled unless TASK_CACHE is
+set explicitly.
+
+A request reaches one worker, so with more than one the workers share a
+directory, MULTIPROC_DIR (a fresh temporary one unless set): /metrics and
+/cache/stats add up every worker's snapshot there, and /debug/profiles
+serves the profiles any of them took (app.metrics, app.profiling).
+"""
+import argparse
+import glob
+import logging
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+import uvicorn
+
+from app.db.health import ALEMBIC_INI
+
+logger = logging.getLogger("app.server")
+
+
+def default_workers() -> int:
+    '''
+    Return: WEB_CONCURRENCY, else the number of CPUs
+    '''
+    return int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1
+
+
+def prepare_database(migrate: bool = True) -> None:
+    '''
+    Create or migrate the schema, on SQLite apply the file-level PRAGMAs,
+    compact the change log and fold the PostgreSQL task_stats deltas, once,
+    before workers start
+    '''
+    from app.db.changes import changes_enabled, compact_changes
+    from app.db.stats import fold_stats, stats_enabled
+    from app.db.session import DATABASE_URL, create_db_and_tables, engine
+
+    if migrate:
+        from alembic import command
+        from alembic.config import Config
+
+        config = Config(str(ALEMBIC_INI))
+        config.attributes["database_url"] = DATABASE_URL
+        config.attributes["configure_logger"] = False
+        command.upgrade(config, "head")
+    else:
+        create_db_and_tables()
+    if engine.dialect.name == "sqlite":
+        # connecting applies the profile PRAGMAs; journal_mode sticks to the file
+        with engine.connect() as conn:
+            journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+        logger.info("Database ready (journal_mode=%s)", journal_mode)
+    else:
+        logger.info("Database ready (%s)", engine.dialect.name)
+    with engine.begin() as conn:
+        if changes_enabled(conn):
+            compacted, expired = compact_changes(conn)
+            logger.info("Change log compacted (%d superseded, %d expired)", compacted, expired)
+        if stats_enabled(conn):
+            fold_stats(conn)
+    # nothing opened here may be inherited by a worker
+    engine.dispose()
+
+
+def prepare_multiproc_dir(workers: int) -> Optional[str]:
+    '''
+    Point the workers at a shared MULTIPROC_DIR: with more than one worker
+    and none set, create a temporary one; clear the snapshots a previous
+    server left in one that is set
+
+    Return: the directory created, for the caller to remove
+    '''
+    directory = os.getenv("MULTIPROC_DIR")
+    if directory:
+        for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+            os.remove(path)
+        return None
+    if workers <= 1:
+        return None
+    # spawned workers read it from the inherited environment
+    directory = os.environ["MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="task-api-")
+    return directory
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run the Task Management API with several worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--no-migrate", dest="migrate", action="store_false",
+                        help="create missing tables instead of running alembic upgrade head")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-access-log", dest="access_log", action="store_false")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s:     %(message)s")
+
+    if args.workers > 1 and "TASK_CACHE" not in os.environ:
+        # spawned workers read it from the inherited environment
+        os.environ["TASK_CACHE"] = "none"
+        logger.info("Task cache disabled: it is per process and would serve stale tasks across workers")
+
+    prepare_database(args.migrate)
+    created = prepare_multiproc_dir(args.workers)
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level=args.log_level,
+            access_log=args.access_log,
+        )
+    finally:
+        if created:
+            shutil.rmtree(created, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
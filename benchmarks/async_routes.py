@@ -0,0 +1,122 @@
+"""
+Requests/s of the task API with DB_MODE=sync vs DB_MODE=async.
+
+For each mode, starts uvicorn in a subprocess against a freshly seeded
+temporary database, then drives GET /tasks/{task_id} from N concurrent
+clients for a fixed duration.
+
+    python -m benchmarks.async_routes --clients 50,200,1000 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from sqlmodel import SQLModel
+
+from app.db.session import create_sqlite_engine
+from app.models.Task import Task
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def seed_database(directory: str, rows: int) -> None:
+    engine = create_sqlite_engine(f"sqlite:///{Path(directory) / 'db.sqlite3'}", "production")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(Task.__table__.insert(), [
+            {"title": f"task {i}", "status": "pending", "priority": "medium",
+             "created_at": datetime.utcnow()} for i in range(rows)
+        ])
+    engine.dispose()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode: str, directory: str, port: int, env: Optional[dict] = None) -> subprocess.Popen:
+    # The database URL is relative, so running from the temp dir points the
+    # app at the seeded database
+    env = {**os.environ, **(env or {}), "DB_MODE": mode, "PYTHONPATH": str(ROOT)}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=directory, env=env,
+    )
+    return wait_until_up(process, port)
+
+
+def wait_until_up(process: subprocess.Popen, port: int, timeout: float = 20) -> subprocess.Popen:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health")
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+
+async def drive(port: int, clients: int, duration: float, rows: int) -> dict:
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    done = errors = 0
+    stop = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal done, errors
+            while time.perf_counter() < stop:
+                try:
+                    res = await client.get(f"/tasks/{random.randint(1, rows)}")
+                    if res.status_code == 200:
+                        done += 1
+                    else:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    return {"requests_per_s": done / elapsed, "errors": errors}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", default="50,200,1000")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--modes", default="sync,async")
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'clients':>9}{'req/s':>10}{'errors':>9}")
+    for mode in args.modes.split(","):
+        with tempfile.TemporaryDirectory() as tmp:
+            seed_database(tmp, args.rows)
+            port = free_port()
+            server = start_server(mode, tmp, port)
+            try:
+                for clients in (int(c) for c in args.clients.split(",")):
+                    result = asyncio.run(drive(port, clients, args.duration, args.rows))
+                    print(f"{mode:<8}{clients:>9}{result['requests_per_s']:>10.0f}{result['errors']:>9}")
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
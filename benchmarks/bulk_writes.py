@@ -0,0 +1,94 @@
+"""
+Bulk update / delete cost across batch sizes, chunk sizes and commit modes.
+
+For every batch size, updates that many tasks through DB.bulk_update_tasks
+(executemany UPDATE keyed on id) and, as a baseline, through the single
+CASE-per-field UPDATE it replaced; then deletes them through
+DB.bulk_delete_tasks. Each run uses a fresh temporary database.
+
+    python -m benchmarks.bulk_writes --batches 100,1000,10000,20000 --chunks 100,500,2000
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlmodel import SQLModel, Session, case, update
+
+from app.db.database import DB
+from app.db.session import create_sqlite_engine
+from app.models.Task import Task
+from benchmarks.sqlite_profile import seed
+
+
+def case_update(session: Session, task_updates: list) -> None:
+    """One UPDATE with a CASE per field and an IN list, as bulk_update_tasks used to run"""
+    fields = {key for task_data in task_updates for key in task_data if key != "id"}
+    cases = {
+        field: case(*[(Task.id == task_data["id"], task_data[field])
+                      for task_data in task_updates if field in task_data],
+                    else_=getattr(Task, field))
+        for field in fields
+    }
+    session.exec(
+        update(Task)
+        .where(Task.id.in_([task_data["id"] for task_data in task_updates]))
+        .values(**cases, updated_at=datetime.now(timezone.utc))
+    )
+    session.commit()
+
+
+def timed(engine, action) -> float:
+    with Session(engine) as session:
+        start = time.perf_counter()
+        action(session)
+        return time.perf_counter() - start
+
+
+def run_batch(batch: int, chunks: list, case_max: int) -> list:
+    results = []
+    updates = [{"id": i, "title": f"renamed {i}", "status": "completed"} for i in range(1, batch + 1)]
+    ids = [task_data["id"] for task_data in updates]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(f"sqlite:///{Path(tmp) / 'bench.sqlite3'}")
+        SQLModel.metadata.create_all(engine)
+        seed(engine, batch)
+
+        if batch <= case_max:
+            results.append(("update", "case", "-", timed(engine, lambda s: case_update(s, updates))))
+        for chunk in chunks:
+            for atomic in (True, False):
+                mode = "atomic" if atomic else "per-chunk"
+                elapsed = timed(engine, lambda s: DB(s).bulk_update_tasks(updates, chunk, atomic))
+                results.append(("update", mode, chunk, elapsed))
+        for chunk in chunks:
+            for atomic in (True, False):
+                mode = "atomic" if atomic else "per-chunk"
+                elapsed = timed(engine, lambda s: DB(s).bulk_delete_tasks(ids, chunk, atomic))
+                results.append(("delete", mode, chunk, elapsed))
+                seed(engine, batch)
+                with engine.begin() as conn:
+                    # re-seeded rows get fresh ids; renumber them back to 1..batch
+                    conn.exec_driver_sql("UPDATE task SET id = id - (SELECT MIN(id) FROM task) + 1")
+        engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", default="100,1000,10000,20000")
+    parser.add_argument("--chunks", default="100,500,2000")
+    parser.add_argument("--case-max", type=int, default=5000,
+                        help="largest batch to run the quadratic CASE baseline on")
+    args = parser.parse_args()
+    chunks = [int(c) for c in args.chunks.split(",")]
+
+    print(f"{'op':<8}{'batch':>8}{'strategy':>12}{'chunk':>8}{'ms':>10}{'rows/s':>12}")
+    for batch in (int(b) for b in args.batches.split(",")):
+        for op, strategy, chunk, elapsed in run_batch(batch, chunks, args.case_max):
+            print(f"{op:<8}{batch:>8}{strategy:>12}{chunk:>8}{elapsed * 1000:>10.1f}{batch / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
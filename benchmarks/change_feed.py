@@ -0,0 +1,218 @@
+"""
+Fan-out of task changes to many subscribers: delivery latency and
+database reads per write, with clients polling vs long-polling vs
+streaming GET /tasks/changes.
+
+For each subscriber strategy, starts uvicorn in a subprocess against a
+freshly seeded temporary database. N subscribers follow the change feed
+while one writer creates --rate tasks per second for a fixed duration.
+Reports the latency from sending a create to each subscriber seeing it,
+the share of changes delivered, subscriber requests per second, and the
+SELECT statements the server ran per write (from /metrics).
+
+  poll      - GET /tasks/changes?since=... every --poll-interval seconds,
+              the cheapest form of the polling the feed replaces
+  long-poll - GET /tasks/changes?since=...&wait=30 in a loop
+  sse       - one text/event-stream response per subscriber
+
+    python -m benchmarks.change_feed --subscribers 10,100,1000 --modes poll,long-poll,sse
+
+Clients and server share the machine. Long polling costs a request per
+subscriber per write, so on few CPUs it slows the writer down too.
+
+--target feed runs the subscribers in-process on one ChangeFeed, without
+HTTP, counting statements on the engine; this isolates the cost of the
+fan-out itself.
+"""
+import argparse
+import asyncio
+import json
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.db.changes import ChangeFeed
+from app.db.database import DB
+from app.db.session import create_sqlite_engine
+from app.schemas.task import TaskCreate
+from benchmarks.async_routes import free_port, seed_database, start_server
+from benchmarks.group_commit import percentile
+
+
+class Deliveries:
+    """Send times of the writes, and when each subscriber saw them"""
+
+    def __init__(self):
+        self.sent = {}
+        self.latencies = []
+        self.requests = 0
+
+    def saw(self, change: dict) -> None:
+        task = change.get("task") or {}
+        sent = self.sent.get(task.get("title"))
+        if sent is not None:
+            self.latencies.append(time.perf_counter() - sent)
+
+    def result(self, subscribers: int, elapsed: float, reads: float) -> dict:
+        writes = len(self.sent)
+        return {
+            "writes": writes,
+            "p50_ms": percentile(self.latencies, 0.50) * 1000,
+            "p99_ms": percentile(self.latencies, 0.99) * 1000,
+            "delivered": len(self.latencies) / (writes * subscribers) if writes else 0.0,
+            "requests_per_s": self.requests / elapsed,
+            "reads_per_write": reads / writes if writes else 0.0,
+        }
+
+
+async def write_http(client: httpx.AsyncClient, deliveries: Deliveries, rate: float, stop: float) -> None:
+    n = 0
+    while time.perf_counter() < stop:
+        title = f"write {n}"
+        deliveries.sent[title] = time.perf_counter()
+        await client.post("/tasks/", json={"title": title})
+        n += 1
+        await asyncio.sleep(1 / rate)
+
+
+async def subscribe_http(client: httpx.AsyncClient, mode: str, since: int, deliveries: Deliveries,
+                         stop: float, poll_interval: float) -> None:
+    if mode == "sse":
+        deliveries.requests += 1
+        async with client.stream("GET", "/tasks/changes", params={"since": since, "stream": True}) as res:
+            async for line in res.aiter_lines():
+                if line.startswith("data: "):
+                    deliveries.saw(json.loads(line[len("data: "):]))
+                if time.perf_counter() >= stop:
+                    return
+        return
+    while (remaining := stop - time.perf_counter()) > 0:
+        deliveries.requests += 1
+        wait = min(30.0, remaining) if mode == "long-poll" else 0
+        page = (await client.get("/tasks/changes", params={"since": since, "wait": wait})).json()
+        for change in page["changes"]:
+            deliveries.saw(change)
+        since = page["next"]
+        if mode == "poll":
+            await asyncio.sleep(poll_interval)
+
+
+def select_count(metrics: str) -> float:
+    '''
+    Return: statements run by the server other than the writes' own
+    '''
+    return sum(float(value) for method, value in
+               re.findall(r'^db_queries_total\{engine="[^"]*",method="([^"]*)"\} (\S+)$', metrics, re.M)
+               if method != "create_task")
+
+
+async def drive_http(port: int, mode: str, subscribers: int, duration: float, rate: float,
+                     poll_interval: float) -> dict:
+    deliveries = Deliveries()
+    limits = httpx.Limits(max_connections=subscribers + 2, max_keepalive_connections=subscribers + 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        since = (await client.get("/tasks/changes")).json()["next"]
+        before = select_count((await client.get("/metrics")).text)
+        started = time.perf_counter()
+        stop = started + duration
+        # subscribers keep reading a little longer, so the last writes reach them
+        drained = stop + poll_interval + 1
+        readers = [asyncio.create_task(subscribe_http(client, mode, since, deliveries, drained, poll_interval))
+                   for _ in range(subscribers)]
+        await write_http(client, deliveries, rate, stop)
+        await asyncio.wait(readers, timeout=drained - time.perf_counter() + 1)
+        for reader in readers:
+            reader.cancel()
+        elapsed = time.perf_counter() - started
+        reads = select_count((await client.get("/metrics")).text) - before
+    return deliveries.result(subscribers, elapsed, reads)
+
+
+def drive_feed(directory: str, subscribers: int, duration: float, rate: float) -> dict:
+    engine = create_sqlite_engine(f"sqlite:///{Path(directory) / 'db.sqlite3'}", "production")
+    feed = ChangeFeed(engine)
+    deliveries = Deliveries()
+    reads = 0
+
+    def count_read(conn, cursor, statement, *args):
+        nonlocal reads
+        reads += statement.lstrip().upper().startswith("SELECT")
+
+    def write(stop: float):
+        n = 0
+        with Session(engine) as session:
+            db = DB(session)
+            while time.perf_counter() < stop:
+                title = f"write {n}"
+                deliveries.sent[title] = time.perf_counter()
+                db.create_task(TaskCreate(title=title))
+                n += 1
+                time.sleep(1 / rate)
+
+    async def subscribe(since: int, stop: float):
+        while time.perf_counter() < stop:
+            deliveries.requests += 1
+            changes, since = await feed.changes(since, 100, max(0.0, stop - time.perf_counter()))
+            for change in changes:
+                deliveries.saw(change)
+
+    async def run():
+        _, since = await feed.changes(None)
+        event.listen(engine, "before_cursor_execute", count_read)
+        started = time.perf_counter()
+        stop = started + duration
+        writer = threading.Thread(target=write, args=(stop,))
+        writer.start()
+        await asyncio.gather(*(subscribe(since, stop + 1) for _ in range(subscribers)))
+        writer.join()
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(run())
+    event.remove(engine, "before_cursor_execute", count_read)
+    engine.dispose()
+    return deliveries.result(subscribers, elapsed, reads)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", default="10,100")
+    parser.add_argument("--modes", default="poll,long-poll,sse")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--rate", type=float, default=20.0, help="creates per second")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--mode", default="async", help="DB_MODE of the server")
+    parser.add_argument("--target", choices=("http", "feed"), default="http")
+    args = parser.parse_args()
+
+    modes = ["feed"] if args.target == "feed" else args.modes.split(",")
+    print(f"{'strategy':<11}{'subscribers':>12}{'writes':>8}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'delivered':>11}{'requests/s':>12}{'reads/write':>13}")
+    for mode in modes:
+        for subscribers in (int(s) for s in args.subscribers.split(",")):
+            with tempfile.TemporaryDirectory() as tmp:
+                seed_database(tmp, args.rows)
+                if args.target == "feed":
+                    result = drive_feed(tmp, subscribers, args.duration, args.rate)
+                else:
+                    port = free_port()
+                    server = start_server(args.mode, tmp, port)
+                    try:
+                        result = asyncio.run(drive_http(port, mode, subscribers, args.duration, args.rate,
+                                                        args.poll_interval))
+                    finally:
+                        server.terminate()
+                        server.wait()
+            print(f"{mode:<11}{subscribers:>12}{result['writes']:>8}{result['p50_ms']:>9.1f}"
+                  f"{result['p99_ms']:>9.1f}{result['delivered']:>11.1%}{result['requests_per_s']:>12.0f}"
+                  f"{result['reads_per_write']:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Writes/s of POST /tasks/ and PUT /tasks/{task_id} with GROUP_COMMIT off
+and on.
+
+For each setting, starts uvicorn in a subprocess against a freshly seeded
+temporary database, then has N concurrent clients alternate creates and
+updates for a fixed duration. Reports throughput, latency percentiles and,
+with group commit on, the mean number of writes per commit (from
+/metrics). SQLITE_SYNCHRONOUS decides what a commit costs; FULL syncs
+the WAL on every commit, NORMAL (the production profile) only at
+checkpoints.
+
+    python -m benchmarks.group_commit --clients 1,16,64 --synchronous NORMAL,FULL
+
+--target db measures the write path without HTTP: N threads create tasks
+in-process, each through its own session (off) or through one
+GroupCommitWriter (on), which isolates commit cost from request handling
+when client and server share few CPUs.
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+from sqlmodel import Session
+
+from app.db.database import DB
+from app.db.group_commit import GroupCommitWriter
+from app.db.session import create_sqlite_engine
+from app.schemas.task import TaskCreate
+from benchmarks.async_routes import free_port, seed_database, start_server
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+async def drive(port: int, clients: int, duration: float, rows: int) -> dict:
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    latencies = []
+    errors = 0
+    stop = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        async def worker(n: int):
+            nonlocal errors
+            create = n % 2 == 0
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                try:
+                    if create:
+                        res = await client.post("/tasks/", json={"title": f"bench {n}"})
+                    else:
+                        res = await client.put(f"/tasks/{random.randint(1, rows)}", json={"status": "in_progress"})
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if res.status_code in (200, 201):
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+                create = not create
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(clients)))
+        elapsed = time.perf_counter() - started
+        metrics = (await client.get("/metrics")).text
+
+    return {
+        "writes_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "errors": errors,
+        "metrics": metrics,
+    }
+
+
+def drive_db(directory: str, clients: int, duration: float, group_commit: bool, window_ms: float) -> dict:
+    engine = create_sqlite_engine(f"sqlite:///{Path(directory) / 'db.sqlite3'}", "production")
+    writer = GroupCommitWriter(engine, window_ms=window_ms) if group_commit else None
+    latencies = []
+    errors = 0
+    stop = time.perf_counter() + duration
+
+    def worker(n: int):
+        nonlocal errors
+        task = TaskCreate(title=f"bench {n}")
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            try:
+                if writer is not None:
+                    writer.submit(DB.create_statement(task)).result()
+                else:
+                    with Session(engine) as session:
+                        DB(session).create_task(task)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    per_commit = None
+    if writer is not None:
+        writer.close()
+        per_commit = writer.writes / writer.batches if writer.batches else None
+    engine.dispose()
+    return {
+        "writes_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "errors": errors,
+        "per_commit": per_commit,
+    }
+
+
+def batch_mean(metrics: str, before: tuple) -> tuple:
+    '''
+    Return: (writes, commits) counted by the batch size histogram, and the
+    mean writes per commit since before
+    '''
+    total = re.search(r"^db_group_commit_batch_size_sum (\S+)$", metrics, re.M)
+    count = re.search(r"^db_group_commit_batch_size_count (\S+)$", metrics, re.M)
+    if not total or not count:
+        return before, None
+    now = (float(total.group(1)), float(count.group(1)))
+    commits = now[1] - before[1]
+    return now, (now[0] - before[0]) / commits if commits else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", default="1,16,64")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--mode", default="async", help="DB_MODE of the server")
+    parser.add_argument("--synchronous", default="NORMAL,FULL", help="SQLITE_SYNCHRONOUS values to run")
+    parser.add_argument("--window-ms", default="0", help="GROUP_COMMIT_WINDOW_MS with group commit on")
+    parser.add_argument("--target", choices=("http", "db"), default="http")
+    args = parser.parse_args()
+
+    print(f"{'synchronous':<12}{'group':<7}{'clients':>8}{'writes/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'per commit':>12}{'errors':>8}")
+    for synchronous in args.synchronous.split(","):
+        for group_commit in ("0", "1"):
+            env = {"SQLITE_SYNCHRONOUS": synchronous, "GROUP_COMMIT": group_commit,
+                   "GROUP_COMMIT_WINDOW_MS": args.window_ms}
+            with tempfile.TemporaryDirectory() as tmp:
+                seed_database(tmp, args.rows)
+                if args.target == "db":
+                    os.environ["SQLITE_SYNCHRONOUS"] = synchronous
+                    for clients in (int(c) for c in args.clients.split(",")):
+                        result = drive_db(tmp, clients, args.duration, group_commit == "1", float(args.window_ms))
+                        per_commit = f"{result['per_commit']:.1f}" if result["per_commit"] else "1.0"
+                        print(f"{synchronous:<12}{'on' if group_commit == '1' else 'off':<7}{clients:>8}"
+                              f"{result['writes_per_s']:>10.0f}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+                              f"{per_commit:>12}{result['errors']:>8}")
+                    continue
+                port = free_port()
+                server = start_server(args.mode, tmp, port, env)
+                counted = (0.0, 0.0)
+                try:
+                    for clients in (int(c) for c in args.clients.split(",")):
+                        result = asyncio.run(drive(port, clients, args.duration, args.rows))
+                        counted, mean = batch_mean(result["metrics"], counted)
+                        per_commit = f"{mean:.1f}" if mean else "1.0"
+                        print(f"{synchronous:<12}{'on' if group_commit == '1' else 'off':<7}{clients:>8}"
+                              f"{result['writes_per_s']:>10.0f}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+                              f"{per_commit:>12}{result['errors']:>8}")
+                finally:
+                    server.terminate()
+                    server.wait()
+
+
+if __name__ == "__main__":
+    main()
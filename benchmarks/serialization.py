@@ -0,0 +1,81 @@
+"""
+List endpoint serialization: response_model validation vs. rows to JSON bytes.
+
+For each response size, fetches that many sorted tasks and encodes them the
+way each TASK_SERIALIZER mode does:
+
+  pydantic - ORM tasks, validated into List[TaskResponse] by FastAPI's
+             serialize_response, then rendered by JSONResponse
+  fast     - TaskResponse columns as row tuples, encoded by
+             app.routers.serialization (orjson when installed)
+
+Reports the mean time per response for the fetch + encode.
+
+    python -m benchmarks.serialization --sizes 10,100,1000 --repeat 50
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlmodel import SQLModel, Session
+
+from app.db.database import DB
+from app.db.session import create_sqlite_engine
+from app.routers import serialization
+from app.schemas.task import TaskResponse
+from benchmarks.sqlite_profile import seed
+
+RESPONSE_FIELD = create_response_field(name="Response_sort_tasks", type_=List[TaskResponse])
+
+
+def pydantic_path(db: DB, size: int) -> bytes:
+    tasks = db.sort_tasks("title", size)
+    content = asyncio.run(serialize_response(field=RESPONSE_FIELD, response_content=tasks))
+    return JSONResponse(content).body
+
+
+def fast_path(db: DB, size: int) -> bytes:
+    rows = db.sort_tasks("title", size, as_rows=True)
+    return serialization.tasks_response(rows, Response()).body
+
+
+def mean_ms(engine, path, size: int, repeat: int) -> float:
+    with Session(engine) as session:
+        db = DB(session)
+        path(db, size)  # warm up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            path(db, size)
+        return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(f"sqlite:///{Path(tmp) / 'bench.sqlite3'}")
+        SQLModel.metadata.create_all(engine)
+        seed(engine, max(sizes))
+
+        encoder = "orjson" if serialization.orjson is not None else "json"
+        print(f"{'rows':>6}{'pydantic ms':>14}{f'fast ({encoder}) ms':>20}{'speedup':>10}")
+        for size in sizes:
+            slow = mean_ms(engine, pydantic_path, size, args.repeat)
+            fast = mean_ms(engine, fast_path, size, args.repeat)
+            print(f"{size:>6}{slow:>14.2f}{fast:>20.2f}{slow / fast:>9.1f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
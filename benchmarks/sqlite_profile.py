@@ -0,0 +1,107 @@
+"""
+Concurrent read/write throughput of the SQLite engine profiles.
+
+Seeds a temporary database per profile, then runs reader threads
+(DB.get_task) and writer threads (DB.update_task) against it for a fixed
+duration and reports operations per second and lock errors.
+
+    python -m benchmarks.sqlite_profile --rows 10000 --readers 8 --writers 4 --duration 5
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, Session
+
+from app.db.database import DB
+from app.db.session import create_sqlite_engine
+from app.models.Task import Task, TaskStatus
+from app.schemas.task import TaskUpdate
+
+
+def seed(engine, rows: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            Task.__table__.insert(),
+            [{"title": f"task {i}", "description": "benchmark row", "status": "pending",
+              "priority": "medium", "created_at": datetime.utcnow()} for i in range(rows)],
+        )
+
+
+def run_profile(profile: str, rows: int, readers: int, writers: int, duration: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(f"sqlite:///{Path(tmp) / 'bench.sqlite3'}", profile)
+        SQLModel.metadata.create_all(engine)
+        seed(engine, rows)
+
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+        stop = time.perf_counter() + duration
+        statuses = list(TaskStatus)
+
+        def reader():
+            done = errors = 0
+            while time.perf_counter() < stop:
+                try:
+                    with Session(engine) as session:
+                        DB(session).get_task(random.randint(1, rows))
+                    done += 1
+                except OperationalError:
+                    errors += 1
+            with lock:
+                counts["reads"] += done
+                counts["errors"] += errors
+
+        def writer():
+            done = errors = 0
+            while time.perf_counter() < stop:
+                try:
+                    with Session(engine) as session:
+                        DB(session).update_task(random.randint(1, rows),
+                                                TaskUpdate(status=random.choice(statuses)))
+                    done += 1
+                except OperationalError:
+                    errors += 1
+            with lock:
+                counts["writes"] += done
+                counts["errors"] += errors
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads += [threading.Thread(target=writer) for _ in range(writers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        engine.dispose()
+
+    return {
+        "profile": profile,
+        "reads_per_s": counts["reads"] / duration,
+        "writes_per_s": counts["writes"] / duration,
+        "lock_errors": counts["errors"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--profiles", default="default,production")
+    args = parser.parse_args()
+
+    print(f"{'profile':<12}{'reads/s':>12}{'writes/s':>12}{'lock errors':>14}")
+    for profile in args.profiles.split(","):
+        result = run_profile(profile, args.rows, args.readers, args.writers, args.duration)
+        print(f"{result['profile']:<12}{result['reads_per_s']:>12.0f}"
+              f"{result['writes_per_s']:>12.0f}{result['lock_errors']:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+SQL statements executed and latency per request, for each task endpoint.
+
+Runs the app in-process (TestClient) on the sync DB path against a
+temporary SQLite database and counts cursor executions per request, so
+regressions such as a reload SELECT after every write show up as a
+statement count above the expected one.
+
+    python -m benchmarks.statements_per_request --requests 500
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session
+
+from app.db.database import DB
+from app.db.dependancies import ThreadpoolDB, get_task_db
+from app.db.session import create_sqlite_engine
+from app.main import app
+
+PAYLOAD = {"title": "benchmark task", "description": "statement count", "priority": "high"}
+
+
+def scenarios(client: TestClient, task_ids: list):
+    '''
+    Yield (name, callable issuing one request); the write scenarios consume
+    task_ids so every request hits an existing row
+    '''
+    yield "POST /tasks/", lambda i: client.post("/tasks/", json=PAYLOAD)
+    yield "GET /tasks/{id}", lambda i: client.get(f"/tasks/{task_ids[i]}")
+    yield "PUT /tasks/{id}", lambda i: client.put(f"/tasks/{task_ids[i]}", json={"status": "completed"})
+    yield "GET /tasks/?limit=10", lambda i: client.get("/tasks/", params={"limit": 10})
+    yield "GET /tasks/search", lambda i: client.get("/tasks/search", params={"text": "statement"})
+    yield "DELETE /tasks/{id}", lambda i: client.delete(f"/tasks/{task_ids[i]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(f"sqlite:///{Path(tmp) / 'bench.sqlite3'}")
+        SQLModel.metadata.create_all(engine)
+        statements = []
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def count(conn, cursor, statement, *rest):
+            statements.append(statement)
+
+        def override():
+            with Session(engine) as session:
+                yield ThreadpoolDB(DB(session))
+
+        app.dependency_overrides[get_task_db] = override
+        try:
+            client = TestClient(app)
+            task_ids = [client.post("/tasks/", json=PAYLOAD).json()["id"] for _ in range(args.requests)]
+
+            print(f"{'request':<24}{'statements':>12}{'mean ms':>10}")
+            for name, request in scenarios(client, task_ids):
+                statements.clear()
+                start = time.perf_counter()
+                for i in range(args.requests):
+                    request(i)
+                elapsed = time.perf_counter() - start
+                print(f"{name:<24}{len(statements) / args.requests:>12.2f}"
+                      f"{elapsed * 1000 / args.requests:>10.2f}")
+        finally:
+            app.dependency_overrides.pop(get_task_db, None)
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,557 @@
+"""
+Latency and throughput of every task endpoint and the DB methods behind
+them, on seeded databases of realistic size, with JSON results that can be
+checked against a baseline.
+
+For each --rows size, seeds a template database once (kept in --data-dir
+across runs; 1M rows takes a few minutes) with a realistic mix of statuses,
+priorities, assignees, due dates and free text, then runs three suites,
+each on a fresh copy of the template:
+
+  inprocess - every route in app/routers/task_routes.py through TestClient,
+              one request at a time (DB_MODE picked by --db-mode)
+  uvicorn   - the same requests over HTTP against `uvicorn app.main:app`
+              in a subprocess, from --concurrency concurrent clients
+  db        - DB method microbenchmarks on a plain Session, no HTTP
+
+and reports p50/p95/p99 latency (ms) and throughput (per second) for each.
+Write scenarios clean up after themselves: the tasks the create scenarios
+add are the ones the delete scenarios remove.
+
+    python -m benchmarks.suite run --rows 10000,100000 --output results.json
+    python -m benchmarks.suite run --rows 10000 --baseline baseline.json --threshold 0.2
+    python -m benchmarks.suite compare baseline.json results.json --metric p95_ms
+
+`compare` (and `run --baseline`) exits with status 1 when a result is
+slower than its baseline by more than --threshold (a fraction, 0.2 = 20%)
+and by more than --min-delta-ms, so sub-millisecond noise does not fail it.
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import httpx
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db.async_database import AsyncDB
+from app.db.cache import task_cache
+from app.db.database import DB
+from app.db.dependancies import ThreadpoolDB, get_task_db
+from app.db.session import create_async_sqlite_engine, create_sqlite_engine
+from app.main import app
+from app.models.Task import Task, TaskPriority, TaskStatus
+from app.schemas.task import TaskCreate, TaskUpdate
+from benchmarks.async_routes import free_port, start_server
+
+ROOT = Path(__file__).resolve().parents[1]
+
+SEED = 20240501
+SEED_CHUNK = 20000
+
+# Value mixes of the seeded tasks: most work is open and medium priority,
+# a fifth is unassigned, a third has no due date and some are overdue
+STATUS_WEIGHTS = {TaskStatus.pending: 40, TaskStatus.in_progress: 25,
+                  TaskStatus.completed: 30, TaskStatus.cancelled: 5}
+PRIORITY_WEIGHTS = {TaskPriority.low: 25, TaskPriority.medium: 45,
+                    TaskPriority.high: 22, TaskPriority.urgent: 8}
+ASSIGNEES = [f"user{i:02d}" for i in range(50)]
+WORDS = ("invoice report deploy review migrate refactor parser dashboard billing "
+         "onboarding release backup audit search cache metrics login export import "
+         "schedule email customer vendor budget roadmap security incident").split()
+
+BULK_SIZE = 100
+
+
+# ---------------------------------------------------------------- seeding
+
+def task_rows(rows: int, rng: random.Random):
+    '''
+    Yield rows dicts for Task.__table__ inserts, reproducible for a seed
+    '''
+    now = datetime.utcnow()
+    statuses, status_weights = zip(*STATUS_WEIGHTS.items())
+    priorities, priority_weights = zip(*PRIORITY_WEIGHTS.items())
+    for i in range(rows):
+        created_at = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+        has_due_date = rng.random() < 0.65
+        yield {
+            "title": " ".join(rng.sample(WORDS, 3)) + f" #{i}",
+            "description": " ".join(rng.choices(WORDS, k=rng.randint(5, 25))) if rng.random() < 0.8 else None,
+            "status": rng.choices(statuses, status_weights)[0].value,
+            "priority": rng.choices(priorities, priority_weights)[0].value,
+            "created_at": created_at,
+            "updated_at": created_at + timedelta(hours=rng.randint(1, 500)) if rng.random() < 0.4 else None,
+            "due_date": now + timedelta(hours=rng.randint(-30 * 24, 90 * 24)) if has_due_date else None,
+            "assigned_to": rng.choice(ASSIGNEES) if rng.random() < 0.8 else None,
+        }
+
+
+def seed_template(data_dir: Path, rows: int) -> Path:
+    '''
+    Return: the path of a database seeded with rows tasks, creating it
+    (schema, FTS index and counters included) if it does not exist yet
+    '''
+    path = data_dir / f"tasks-{rows}.sqlite3"
+    if path.exists():
+        return path
+    partial = path.with_suffix(".partial")
+    partial.unlink(missing_ok=True)
+
+    started = time.perf_counter()
+    engine = create_sqlite_engine(f"sqlite:///{partial}", "production")
+    SQLModel.metadata.create_all(engine)
+    rng = random.Random(SEED)
+    generated = task_rows(rows, rng)
+    with engine.begin() as conn:
+        while True:
+            chunk = [row for _, row in zip(range(SEED_CHUNK), generated)]
+            if not chunk:
+                break
+            conn.execute(Task.__table__.insert(), chunk)
+    with engine.connect() as conn:
+        # Fold the WAL into the file so copying it copies everything
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    engine.dispose()
+    partial.rename(path)
+    print(f"seeded {rows} tasks in {time.perf_counter() - started:.1f}s -> {path}", file=sys.stderr)
+    return path
+
+
+def working_copy(template: Path, directory: Path) -> Path:
+    '''
+    Return: directory/db.sqlite3, a fresh copy of template (the name the
+    app's relative DATABASE_URL expects)
+    '''
+    path = directory / "db.sqlite3"
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    shutil.copyfile(template, path)
+    return path
+
+
+# ---------------------------------------------------------------- results
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Nearest-rank percentile of sorted samples"""
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(suite: str, rows: int, name: str, latencies: List[float],
+              elapsed: float, errors: int = 0) -> dict:
+    '''
+    Return: a result record from per-call latencies (seconds) and the wall
+    time they took together
+    '''
+    ordered = sorted(latencies)
+    return {
+        "suite": suite,
+        "rows": rows,
+        "name": name,
+        "count": len(ordered),
+        "errors": errors,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "throughput": len(ordered) / elapsed if elapsed else 0.0,
+    }
+
+
+def print_results(results: List[dict]) -> None:
+    print(f"{'suite':<10}{'rows':>9}  {'name':<38}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'per s':>10}{'errors':>8}")
+    for r in results:
+        print(f"{r['suite']:<10}{r['rows']:>9}  {r['name']:<38}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+              f"{r['p99_ms']:>9.2f}{r['throughput']:>10.0f}{r['errors']:>8}")
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+
+def compare(baseline: dict, current: dict, metric: str = "p95_ms",
+            threshold: float = 0.2, min_delta_ms: float = 0.5) -> List[dict]:
+    '''
+    Return: one row per result in current, with the baseline value of
+    metric and whether it regressed beyond threshold (a fraction) and
+    min_delta_ms
+    '''
+    def key(result):
+        return result["suite"], result["rows"], result["name"]
+
+    before = {key(r): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        old = before.get(key(result))
+        new_value = result[metric]
+        if old is None:
+            rows.append({**dict(zip(("suite", "rows", "name"), key(result))),
+                         "baseline": None, "current": new_value, "change": None, "status": "new"})
+            continue
+        old_value = old[metric]
+        change = (new_value - old_value) / old_value if old_value else 0.0
+        regressed = change > threshold and new_value - old_value > min_delta_ms
+        rows.append({**dict(zip(("suite", "rows", "name"), key(result))),
+                     "baseline": old_value, "current": new_value, "change": change,
+                     "status": "REGRESSION" if regressed else "ok"})
+    return rows
+
+
+def print_comparison(rows: List[dict], metric: str) -> int:
+    '''
+    Print the comparison; Return: the number of regressions
+    '''
+    print(f"{'suite':<10}{'rows':>9}  {'name':<38}{'base ' + metric:>14}{metric:>10}{'change':>9}  status")
+    for r in rows:
+        baseline = "-" if r["baseline"] is None else f"{r['baseline']:.2f}"
+        change = "-" if r["change"] is None else f"{r['change']:+.0%}"
+        print(f"{r['suite']:<10}{r['rows']:>9}  {r['name']:<38}{baseline:>14}{r['current']:>10.2f}"
+              f"{change:>9}  {r['status']}")
+    return sum(r["status"] == "REGRESSION" for r in rows)
+
+
+# ---------------------------------------------------------------- HTTP scenarios
+
+@dataclass
+class Scenario:
+    """
+    One endpoint to drive: request(i) returns (method, url, params, json)
+    for the i-th request; collect, when set, receives each response
+    """
+    name: str
+    request: Callable[[int], Tuple[str, str, Optional[dict], Optional[dict]]]
+    collect: Optional[Callable[[httpx.Response], None]] = None
+    max_requests: Optional[int] = None
+
+
+def future_due_date(rng: random.Random) -> str:
+    return (datetime.now(timezone.utc) + timedelta(days=rng.randint(1, 60))).isoformat()
+
+
+def scenarios(rows: int, requests: int) -> List[Scenario]:
+    '''
+    Return: the HTTP scenarios in run order. Reads and updates touch the
+    seeded tasks; deletes remove the tasks the create scenarios added.
+    '''
+    rng = random.Random(SEED)
+    seeded_ids = [rng.randint(1, rows) for _ in range(requests)]
+    words = [rng.choice(WORDS) for _ in range(requests)]
+    created: List[int] = []
+    bulk_created: List[int] = []
+
+    def payload(i: int) -> dict:
+        return {"title": f"bench {words[i]} {i}", "description": "benchmark task",
+                "priority": "high", "due_date": future_due_date(rng), "assigned_to": "bench"}
+
+    def bulk_delete(i: int):
+        return "DELETE", "/tasks/bulk-delete", None, {"task_ids": bulk_created[i * BULK_SIZE:(i + 1) * BULK_SIZE]}
+
+    return [
+        Scenario("GET /tasks/{id}", lambda i: ("GET", f"/tasks/{seeded_ids[i]}", None, None)),
+        Scenario("GET /tasks/?limit=50", lambda i: ("GET", "/tasks/", {"limit": 50, "skip": i % 20 * 50}, None)),
+        Scenario("GET /tasks/?status&priority", lambda i: (
+            "GET", "/tasks/", {"status": "pending", "priority": "high", "limit": 50}, None)),
+        Scenario("GET /tasks/?cursor", lambda i: (
+            "GET", "/tasks/", {"cursor": "", "order_by": "created_at", "limit": 50}, None)),
+        Scenario("GET /tasks/?count=estimated", lambda i: (
+            "GET", "/tasks/", {"status": "in_progress", "priority": "low", "limit": 50, "count": "estimated"}, None)),
+        Scenario("GET /tasks/?count=exact", lambda i: (
+            "GET", "/tasks/", {"status": "in_progress", "priority": "low", "limit": 50, "count": "exact"}, None)),
+        Scenario("GET /tasks/?fields=id,title,status", lambda i: (
+            "GET", "/tasks/", {"limit": 50, "fields": "id,title,status"}, None)),
+        Scenario("GET /tasks/search", lambda i: ("GET", "/tasks/search", {"text": words[i], "limit": 20}, None)),
+        Scenario("GET /tasks/sort-by/priority", lambda i: ("GET", "/tasks/sort-by/priority", {"limit": 50}, None)),
+        Scenario("GET /tasks/sort-by/due_date?cursor", lambda i: (
+            "GET", "/tasks/sort-by/due_date", {"cursor": "", "limit": 50}, None)),
+        Scenario("GET /tasks/sort-by/title?stream", lambda i: (
+            "GET", "/tasks/sort-by/title", {"stream": "true", "fields": "id,title"}, None), max_requests=5),
+        Scenario("GET /tasks/stats", lambda i: ("GET", "/tasks/stats", None, None)),
+        Scenario("POST /tasks/", lambda i: ("POST", "/tasks/", None, payload(i)),
+                 collect=lambda res: created.append(res.json()["id"])),
+        Scenario("PUT /tasks/{id}", lambda i: (
+            "PUT", f"/tasks/{seeded_ids[i]}", None, {"status": rng.choice(list(STATUS_WEIGHTS)).value})),
+        Scenario(f"POST /tasks/bulk-create ({BULK_SIZE})", lambda i: (
+            "POST", "/tasks/bulk-create", None, {"tasks": [payload(i)] * BULK_SIZE}),
+                 collect=lambda res: bulk_created.extend(res.json()["ids"])),
+        Scenario(f"PUT /tasks/bulk-update ({BULK_SIZE})", lambda i: (
+            "PUT", "/tasks/bulk-update", None,
+            {"updates": [{"id": task_id, "priority": "low"} for task_id in rng.sample(range(1, rows + 1), BULK_SIZE)]})),
+        Scenario(f"DELETE /tasks/bulk-delete ({BULK_SIZE})", bulk_delete),
+        Scenario("DELETE /tasks/{id}", lambda i: ("DELETE", f"/tasks/{created[i]}", None, None)),
+    ]
+
+
+def scenario_requests(scenario: Scenario, requests: int) -> int:
+    return min(requests, scenario.max_requests or requests)
+
+
+def run_inprocess(database: Path, rows: int, requests: int, db_mode: str) -> List[dict]:
+    '''
+    Drive every scenario through TestClient, one request at a time
+    '''
+    engine = create_sqlite_engine(f"sqlite:///{database}")
+    async_engine = create_async_sqlite_engine(f"sqlite+aiosqlite:///{database}")
+
+    def sync_db():
+        with Session(engine) as session:
+            yield ThreadpoolDB(DB(session, task_cache))
+
+    async def async_db():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield AsyncDB(session, task_cache)
+
+    if task_cache is not None:
+        task_cache.clear()
+    app.dependency_overrides[get_task_db] = sync_db if db_mode == "sync" else async_db
+    results = []
+    try:
+        client = TestClient(app)
+        for scenario in scenarios(rows, requests):
+            latencies, errors = [], 0
+            started = time.perf_counter()
+            for i in range(scenario_requests(scenario, requests)):
+                method, url, params, body = scenario.request(i)
+                sent = time.perf_counter()
+                res = client.request(method, url, params=params, json=body)
+                latencies.append(time.perf_counter() - sent)
+                if res.status_code >= 400:
+                    errors += 1
+                elif scenario.collect:
+                    scenario.collect(res)
+            results.append(summarize("inprocess", rows, scenario.name, latencies,
+                                     time.perf_counter() - started, errors))
+    finally:
+        app.dependency_overrides.pop(get_task_db, None)
+        engine.dispose()
+        asyncio.run(async_engine.dispose())
+    return results
+
+
+async def drive_scenario(client: httpx.AsyncClient, scenario: Scenario,
+                         requests: int, concurrency: int) -> Tuple[List[float], float, int]:
+    latencies: List[float] = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in pending:
+            method, url, params, body = scenario.request(i)
+            sent = time.perf_counter()
+            try:
+                res = await client.request(method, url, params=params, json=body)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - sent)
+            if res.status_code >= 400:
+                errors += 1
+            elif scenario.collect:
+                scenario.collect(res)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started, errors
+
+
+async def drive_server(port: int, rows: int, requests: int, concurrency: int) -> List[dict]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results = []
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+        for scenario in scenarios(rows, requests):
+            latencies, elapsed, errors = await drive_scenario(
+                client, scenario, scenario_requests(scenario, requests), concurrency)
+            if latencies:
+                results.append(summarize("uvicorn", rows, scenario.name, latencies, elapsed, errors))
+    return results
+
+
+def run_uvicorn(directory: Path, rows: int, requests: int, db_mode: str, concurrency: int) -> List[dict]:
+    '''
+    Drive every scenario over HTTP against uvicorn serving directory/db.sqlite3
+    '''
+    port = free_port()
+    server = start_server(db_mode, str(directory), port)
+    try:
+        return asyncio.run(drive_server(port, rows, requests, concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+# ---------------------------------------------------------------- DB microbenchmarks
+
+def db_benchmarks(rows: int) -> List[Tuple[str, Callable[[DB, int], object]]]:
+    '''
+    Return: (name, call(db, i)) pairs, one per DB method and typical arguments
+    '''
+    rng = random.Random(SEED)
+    ids = [rng.randint(1, rows) for _ in range(10000)]
+    words = [rng.choice(WORDS) for _ in range(1000)]
+    statuses = list(TaskStatus)
+
+    def pick(values, i):
+        return values[i % len(values)]
+
+    return [
+        ("get_task", lambda db, i: db.get_task(pick(ids, i))),
+        ("get_tasks_pagination_and_filter", lambda db, i: db.get_tasks_pagination_and_filter(
+            0, 50, TaskPriority.high, TaskStatus.pending)),
+        ("get_tasks_pagination_and_filter as_rows", lambda db, i: db.get_tasks_pagination_and_filter(
+            0, 50, TaskPriority.high, TaskStatus.pending, as_rows=True)),
+        ("get_tasks_keyset created_at", lambda db, i: db.get_tasks_keyset("", 50, order_by="created_at")),
+        ("get_tasks_page count=estimated", lambda db, i: db.get_tasks_page(
+            0, 50, TaskPriority.low, TaskStatus.in_progress, count="estimated")),
+        ("count_tasks exact", lambda db, i: db.count_tasks(TaskPriority.low, TaskStatus.in_progress, "exact")),
+        ("sort_tasks title", lambda db, i: db.sort_tasks("title", 50)),
+        ("sort_tasks priority", lambda db, i: db.sort_tasks("priority", 50)),
+        ("sort_tasks_keyset due_date", lambda db, i: db.sort_tasks_keyset("due_date", "", 50)),
+        ("search_tasks", lambda db, i: db.search_tasks(pick(words, i), 0, 20)),
+        ("count_search exact", lambda db, i: db.count_search(pick(words, i), "exact")),
+        ("get_task_stats", lambda db, i: db.get_task_stats()),
+        ("update_task", lambda db, i: db.update_task(pick(ids, i), TaskUpdate(status=pick(statuses, i)))),
+        ("create_task", lambda db, i: db.create_task(TaskCreate(title=f"bench {i}", priority=TaskPriority.high))),
+    ]
+
+
+def run_db(database: Path, rows: int, repeat: int) -> List[dict]:
+    '''
+    Time each DB method repeat times on one session, without a cache
+    '''
+    engine = create_sqlite_engine(f"sqlite:///{database}")
+    results = []
+    try:
+        with Session(engine) as session:
+            db = DB(session)
+            for name, call in db_benchmarks(rows):
+                call(db, 0)  # warm up
+                latencies = []
+                started = time.perf_counter()
+                for i in range(repeat):
+                    sent = time.perf_counter()
+                    call(db, i)
+                    latencies.append(time.perf_counter() - sent)
+                results.append(summarize("db", rows, name, latencies, time.perf_counter() - started))
+    finally:
+        engine.dispose()
+    return results
+
+
+# ---------------------------------------------------------------- CLI
+
+SUITES = ("inprocess", "uvicorn", "db")
+
+
+def run(args) -> int:
+    sizes = [int(size) for size in args.rows.split(",")]
+    suites = args.suites.split(",")
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise SystemExit(f"Unknown suites {', '.join(sorted(unknown))}. Valid suites are: {', '.join(SUITES)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(args.data_dir) if args.data_dir else Path(tmp)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        work_dir = Path(tmp) / "work"
+        work_dir.mkdir()
+
+        results = []
+        for rows in sizes:
+            template = seed_template(data_dir, rows)
+            if "inprocess" in suites:
+                database = working_copy(template, work_dir)
+                results += run_inprocess(database, rows, args.requests, args.db_mode)
+            if "uvicorn" in suites:
+                working_copy(template, work_dir)
+                results += run_uvicorn(work_dir, rows, args.requests, args.db_mode, args.concurrency)
+            if "db" in suites:
+                database = working_copy(template, work_dir)
+                results += run_db(database, rows, args.repeat)
+
+    print_results(results)
+    report = {
+        "environment": environment(),
+        "settings": {"rows": sizes, "suites": suites, "requests": args.requests, "repeat": args.repeat,
+                     "concurrency": args.concurrency, "db_mode": args.db_mode},
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nresults written to {args.output}")
+    if args.baseline:
+        print()
+        baseline = json.loads(Path(args.baseline).read_text())
+        rows = compare(baseline, report, args.metric, args.threshold, args.min_delta_ms)
+        return 1 if print_comparison(rows, args.metric) else 0
+    return 0
+
+
+def compare_files(args) -> int:
+    baseline = json.loads(Path(args.baseline).read_text())
+    current = json.loads(Path(args.current).read_text())
+    rows = compare(baseline, current, args.metric, args.threshold, args.min_delta_ms)
+    return 1 if print_comparison(rows, args.metric) else 0
+
+
+def add_threshold_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--metric", default="p95_ms", choices=["p50_ms", "p95_ms", "p99_ms"])
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown as a fraction of the baseline (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="ignore slowdowns smaller than this many milliseconds")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="seed, benchmark and optionally compare")
+    run_parser.add_argument("--rows", default="10000,100000,1000000")
+    run_parser.add_argument("--suites", default=",".join(SUITES))
+    run_parser.add_argument("--requests", type=int, default=200, help="requests per HTTP scenario")
+    run_parser.add_argument("--repeat", type=int, default=200, help="calls per DB microbenchmark")
+    run_parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients against uvicorn")
+    run_parser.add_argument("--db-mode", default="async", choices=["async", "sync"])
+    run_parser.add_argument("--data-dir", help="keep seeded template databases here between runs")
+    run_parser.add_argument("--output", help="write JSON results to this file")
+    run_parser.add_argument("--baseline", help="JSON results to compare against")
+    add_threshold_arguments(run_parser)
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="compare two JSON result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    add_threshold_arguments(compare_parser)
+    compare_parser.set_defaults(handler=compare_files)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
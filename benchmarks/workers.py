@@ -0,0 +1,110 @@
+"""
+Requests/s of python -m app.server with 1 worker vs N workers.
+
+For each worker count, starts the server in a subprocess against a freshly
+seeded temporary database, then drives it for a fixed duration from
+several client processes (one asyncio client can saturate a core on its
+own) with a read/write mix: GET /tasks/{task_id}, GET /tasks/?limit=20 and,
+for --write-ratio of requests, PUT /tasks/{task_id}.
+
+    python -m benchmarks.workers --workers 1,4 --clients 64 --client-procs 4
+
+Workers beyond the number of free cores cannot add throughput; on a
+machine shared with the client processes, N workers and the clients
+compete for the same cores.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.async_routes import ROOT, free_port, seed_database, wait_until_up
+
+
+def start_workers(workers: int, directory: str, port: int) -> subprocess.Popen:
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--workers", str(workers), "--port", str(port),
+         "--host", "127.0.0.1", "--no-migrate", "--log-level", "warning", "--no-access-log"],
+        cwd=directory, env=env,
+    )
+    return wait_until_up(process, port)
+
+
+async def drive(port: int, clients: int, duration: float, rows: int, write_ratio: float) -> tuple:
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    done = errors = 0
+    stop = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal done, errors
+            while time.perf_counter() < stop:
+                task_id = random.randint(1, rows)
+                roll = random.random()
+                try:
+                    if roll < write_ratio:
+                        res = await client.put(f"/tasks/{task_id}", json={"status": "in_progress"})
+                    elif roll < (1 + write_ratio) / 2:
+                        res = await client.get(f"/tasks/{task_id}")
+                    else:
+                        res = await client.get("/tasks/", params={"skip": task_id % 1000, "limit": 20})
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if res.status_code == 200:
+                    done += 1
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+    return done / elapsed, errors
+
+
+def client_process(args: tuple) -> tuple:
+    return asyncio.run(drive(*args))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}")
+    parser.add_argument("--clients", type=int, default=64, help="concurrent clients in total")
+    parser.add_argument("--client-procs", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    print(f"cpus={os.cpu_count()} client_procs={args.client_procs} clients={args.clients}")
+    print(f"{'workers':>8}{'req/s':>10}{'errors':>9}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            seed_database(tmp, args.rows)
+            port = free_port()
+            server = start_workers(workers, tmp, port)
+            try:
+                per_proc = max(1, args.clients // args.client_procs)
+                jobs = [(port, per_proc, args.duration, args.rows, args.write_ratio)] * args.client_procs
+                with multiprocessing.get_context("spawn").Pool(args.client_procs) as pool:
+                    results = pool.map(client_process, jobs)
+                # client processes start at slightly different times, so
+                # each one measures its own rate
+                rate = sum(result[0] for result in results)
+                errors = sum(result[1] for result in results)
+                print(f"{workers:>8}{rate:>10.0f}{errors:>9}")
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,10 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from sqlmodel import SQLModel
 from pathlib import Path
+import os
 
 from alembic import context
+from app.db.postgres import driver_url, is_postgres_url
 from app.models.Task import Task
 
 # this is the Alembic Config object, which provides
@@ -14,11 +16,19 @@ config = context.config
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 DB_PATH = str((BASE_DIR / 'db.sqlite3').resolve())
-config.set_main_option("sqlalchemy.url", f"sqlite:///{DB_PATH}")
+# python -m app.server migrates the database the app opens, which is
+# relative to its working directory rather than to this file; otherwise
+# DATABASE_URL (e.g. a PostgreSQL server) or the SQLite file next to it
+database_url = config.attributes.get("database_url") or os.getenv("DATABASE_URL") or f"sqlite:///{DB_PATH}"
+if is_postgres_url(database_url):
+    database_url = driver_url(database_url)
+# % is configparser interpolation syntax (URL-encoded passwords)
+config.set_main_option("sqlalchemy.url", database_url.replace("%", "%%"))
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+# (callers that configure logging themselves pass configure_logger=False)
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -27,6 +37,21 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = SQLModel.metadata
 
+POSTGRES_INDEXES = {
+    "ix_task_search", "ix_task_title_trgm", "ix_task_description_trgm", "ix_task_due_date_nulls_first",
+}
+
+
+
+def include_name(name, type_, parent_names):
+    """Keep autogenerate away from the FTS5 search index, its shadow tables, task_stats,
+    task_change and the PostgreSQL-only indexes."""
+    if type_ == "table" and name is not None and name.startswith(("task_fts", "task_stats", "task_change")):
+        return False
+    if type_ == "index" and name in POSTGRES_INDEXES:
+        return False
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -49,6 +74,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -72,7 +98,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_name=include_name
         )
 
         with context.begin_transaction():
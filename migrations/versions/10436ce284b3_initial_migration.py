@@ -42,3 +42,7 @@ def downgrade() -> None:
     # ### commands auto generated by Alembic - please adjust! ###
     op.drop_table('task')
     # ### end Alembic commands ###
+    # PostgreSQL keeps the native enum types after the table is gone
+    bind = op.get_bind()
+    sa.Enum(name='taskpriority').drop(bind, checkfirst=True)
+    sa.Enum(name='taskstatus').drop(bind, checkfirst=True)
@@ -0,0 +1,78 @@
+"""Add FTS5 search index over task title/description
+
+Revision ID: 5c2b8e41d7a9
+Revises: e1470f92f44c
+Create Date: 2026-10-18 11:40:02.815337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2b8e41d7a9'
+down_revision: Union[str, Sequence[str], None] = 'e1470f92f44c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def fts5_available(bind) -> bool:
+    """SQLite builds without FTS5 keep using the LIKE search fallback."""
+    if bind.dialect.name != 'sqlite':
+        return False
+    try:
+        bind.execute(sa.text("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)"))
+        bind.execute(sa.text("DROP TABLE temp.fts5_probe"))
+    except sa.exc.OperationalError:
+        return False
+    return True
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if not fts5_available(bind):
+        return
+
+    op.execute("""
+        CREATE VIRTUAL TABLE task_fts USING fts5(
+            title, description,
+            content='task', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER task_fts_ai AFTER INSERT ON task BEGIN
+            INSERT INTO task_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER task_fts_ad AFTER DELETE ON task BEGIN
+            INSERT INTO task_fts(task_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER task_fts_au AFTER UPDATE OF title, description ON task BEGIN
+            INSERT INTO task_fts(task_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO task_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    """)
+    # Index the rows that already exist
+    op.execute("INSERT INTO task_fts(task_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS task_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS task_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS task_fts_ai")
+    op.execute("DROP TABLE IF EXISTS task_fts")
@@ -0,0 +1,92 @@
+"""Add task_stats counters and the status/due_date index
+
+Revision ID: 8d3f6a1c2b90
+Revises: 5c2b8e41d7a9
+Create Date: 2026-10-18 15:12:44.107263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f6a1c2b90'
+down_revision: Union[str, Sequence[str], None] = '5c2b8e41d7a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Overdue count: one range seek per open status
+    op.create_index('ix_task_status_due_date', 'task', ['status', 'due_date'], unique=False)
+
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("""
+        CREATE TABLE task_stats (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+    """)
+    op.execute("""
+        CREATE TRIGGER task_stats_ai AFTER INSERT ON task BEGIN
+            INSERT INTO task_stats(dimension, value, count) VALUES
+                ('total', '', 1),
+                ('status', new.status, 1),
+                ('priority', new.priority, 1),
+                ('assignee', COALESCE(new.assigned_to, ''), 1)
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + excluded.count;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER task_stats_ad AFTER DELETE ON task BEGIN
+            INSERT INTO task_stats(dimension, value, count) VALUES
+                ('total', '', -1),
+                ('status', old.status, -1),
+                ('priority', old.priority, -1),
+                ('assignee', COALESCE(old.assigned_to, ''), -1)
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + excluded.count;
+            DELETE FROM task_stats
+            WHERE dimension = 'assignee' AND value = COALESCE(old.assigned_to, '') AND count = 0;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER task_stats_au AFTER UPDATE OF status, priority, assigned_to ON task BEGIN
+            INSERT INTO task_stats(dimension, value, count) VALUES
+                ('status', old.status, -1),
+                ('status', new.status, 1),
+                ('priority', old.priority, -1),
+                ('priority', new.priority, 1),
+                ('assignee', COALESCE(old.assigned_to, ''), -1),
+                ('assignee', COALESCE(new.assigned_to, ''), 1)
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + excluded.count;
+            DELETE FROM task_stats
+            WHERE dimension = 'assignee' AND value = COALESCE(old.assigned_to, '') AND count = 0;
+        END
+    """)
+    # Count the rows that already exist
+    op.execute("""
+        INSERT INTO task_stats(dimension, value, count)
+        SELECT 'total', '', COUNT(*) FROM task
+        UNION ALL SELECT 'status', status, COUNT(*) FROM task GROUP BY status
+        UNION ALL SELECT 'priority', priority, COUNT(*) FROM task GROUP BY priority
+        UNION ALL SELECT 'assignee', COALESCE(assigned_to, ''), COUNT(*) FROM task
+            GROUP BY COALESCE(assigned_to, '')
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS task_stats_au")
+        op.execute("DROP TRIGGER IF EXISTS task_stats_ad")
+        op.execute("DROP TRIGGER IF EXISTS task_stats_ai")
+        op.execute("DROP TABLE IF EXISTS task_stats")
+
+    op.drop_index('ix_task_status_due_date', table_name='task')
@@ -0,0 +1,48 @@
+"""Add PostgreSQL tsvector and trigram search indexes
+
+Revision ID: b7e2c4f1a9d3
+Revises: 8d3f6a1c2b90
+Create Date: 2026-10-18 17:26:51.640219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2c4f1a9d3'
+down_revision: Union[str, Sequence[str], None] = '8d3f6a1c2b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Must match app.db.postgres.SEARCH_VECTOR_SQL for search_tasks to use it
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(f"CREATE INDEX ix_task_search ON task USING gin (({SEARCH_VECTOR_SQL}))")
+    # Serve the LIKE '%text%' fallback and ad-hoc substring queries
+    op.execute("CREATE INDEX ix_task_title_trgm ON task USING gin (lower(title) gin_trgm_ops)")
+    op.execute(
+        "CREATE INDEX ix_task_description_trgm ON task "
+        "USING gin (lower(coalesce(description, '')) gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP INDEX IF EXISTS ix_task_description_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_task_title_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_task_search")
@@ -0,0 +1,35 @@
+"""Add a PostgreSQL (due_date NULLS FIRST, id) index for due date sorts
+
+Revision ID: c4e8a1f7d2b6
+Revises: f3a9d2e6b4c1
+Create Date: 2026-10-18 20:12:45.208731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1f7d2b6'
+down_revision: Union[str, Sequence[str], None] = 'f3a9d2e6b4c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # Due date sorts order by due_date NULLS FIRST, id; a plain ascending
+    # index keeps NULLs last on PostgreSQL and cannot serve that order.
+    # SQLite already stores NULLs first, so ix_task_due_date serves it there.
+    op.execute("CREATE INDEX ix_task_due_date_nulls_first ON task (due_date NULLS FIRST, id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP INDEX IF EXISTS ix_task_due_date_nulls_first")
@@ -0,0 +1,120 @@
+"""Add the task_stats counters on PostgreSQL
+
+Revision ID: d5f1b8c3e9a7
+Revises: c4e8a1f7d2b6
+Create Date: 2026-10-18 20:41:09.663120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f1b8c3e9a7'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a1f7d2b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _insert_deltas(*selects: str) -> str:
+    return f"""
+        INSERT INTO task_stats(dimension, value, count)
+        SELECT dimension, value, SUM(delta) FROM (
+            {' UNION ALL '.join(selects)}
+        ) AS deltas(dimension, value, delta)
+        GROUP BY dimension, value
+        HAVING SUM(delta) != 0;
+    """
+
+
+def _deltas(rows: str, sign: int, total: bool) -> str:
+    selects = [f"SELECT 'total', '', {sign} FROM {rows}"] if total else []
+    selects += [
+        f"SELECT 'status', CAST(status AS TEXT), {sign} FROM {rows}",
+        f"SELECT 'priority', CAST(priority AS TEXT), {sign} FROM {rows}",
+        f"SELECT 'assignee', COALESCE(assigned_to, ''), {sign} FROM {rows}",
+    ]
+    return ' UNION ALL '.join(selects)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # Writers append delta rows instead of updating one row per counter,
+    # which would lock it until commit and queue concurrent creates on the
+    # 'total' row; readers sum the rows of each counter
+    op.execute("""
+        CREATE TABLE task_stats (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count BIGINT NOT NULL
+        )
+    """)
+    op.execute("CREATE INDEX ix_task_stats_dimension_value ON task_stats (dimension, value)")
+    op.execute("""
+        CREATE FUNCTION task_stats_fold() RETURNS void LANGUAGE sql AS $$
+            WITH folded AS (
+                DELETE FROM task_stats
+                WHERE ctid IN (SELECT ctid FROM task_stats FOR UPDATE SKIP LOCKED)
+                RETURNING dimension, value, count
+            )
+            INSERT INTO task_stats(dimension, value, count)
+            SELECT dimension, value, SUM(count) FROM folded
+            GROUP BY dimension, value
+            HAVING SUM(count) != 0
+        $$
+    """)
+    op.execute(f"""
+        CREATE FUNCTION task_stats_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {_insert_deltas(_deltas('new_rows', 1, True))}
+            ELSIF TG_OP = 'DELETE' THEN
+                {_insert_deltas(_deltas('old_rows', -1, True))}
+            ELSE
+                {_insert_deltas(_deltas('new_rows', 1, False), _deltas('old_rows', -1, False))}
+            END IF;
+            IF random() < 0.01 THEN
+                PERFORM task_stats_fold();
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute(
+        "CREATE TRIGGER task_stats_ai AFTER INSERT ON task REFERENCING NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION task_stats_apply()"
+    )
+    op.execute(
+        "CREATE TRIGGER task_stats_ad AFTER DELETE ON task REFERENCING OLD TABLE AS old_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION task_stats_apply()"
+    )
+    op.execute(
+        "CREATE TRIGGER task_stats_au AFTER UPDATE ON task "
+        "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION task_stats_apply()"
+    )
+    # Count the rows that already exist
+    op.execute("""
+        INSERT INTO task_stats(dimension, value, count)
+        SELECT 'total', '', COUNT(*) FROM task
+        UNION ALL SELECT 'status', CAST(status AS TEXT), COUNT(*) FROM task GROUP BY status
+        UNION ALL SELECT 'priority', CAST(priority AS TEXT), COUNT(*) FROM task GROUP BY priority
+        UNION ALL SELECT 'assignee', COALESCE(assigned_to, ''), COUNT(*) FROM task
+            GROUP BY COALESCE(assigned_to, '')
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP TRIGGER IF EXISTS task_stats_au ON task")
+    op.execute("DROP TRIGGER IF EXISTS task_stats_ad ON task")
+    op.execute("DROP TRIGGER IF EXISTS task_stats_ai ON task")
+    op.execute("DROP FUNCTION IF EXISTS task_stats_apply()")
+    op.execute("DROP FUNCTION IF EXISTS task_stats_fold()")
+    op.execute("DROP TABLE IF EXISTS task_stats")
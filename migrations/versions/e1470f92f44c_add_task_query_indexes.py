@@ -0,0 +1,53 @@
+"""Add secondary indexes for task queries
+
+Revision ID: e1470f92f44c
+Revises: 97eb17987c6b
+Create Date: 2026-10-18 09:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1470f92f44c'
+down_revision: Union[str, Sequence[str], None] = '97eb17987c6b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PRIORITY_RANK_SQL = (
+    "CASE priority WHEN 'urgent' THEN 1 WHEN 'high' THEN 2 "
+    "WHEN 'medium' THEN 3 WHEN 'low' THEN 4 ELSE 5 END"
+)
+STATUS_RANK_SQL = (
+    "CASE status WHEN 'pending' THEN 1 WHEN 'in_progress' THEN 2 "
+    "WHEN 'completed' THEN 3 WHEN 'cancelled' THEN 4 ELSE 5 END"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_task_status_priority_id', 'task', ['status', 'priority', 'id'])
+    op.create_index('ix_task_status_id', 'task', ['status', 'id'])
+    op.create_index('ix_task_priority_id', 'task', ['priority', 'id'])
+    op.create_index('ix_task_created_at_id', 'task', ['created_at', 'id'])
+    op.create_index('ix_task_due_date', 'task', ['due_date'])
+    op.create_index('ix_task_title', 'task', ['title'])
+    op.create_index('ix_task_assigned_to', 'task', ['assigned_to'])
+    op.create_index('ix_task_priority_rank', 'task', [sa.text(PRIORITY_RANK_SQL), 'id'])
+    op.create_index('ix_task_status_rank', 'task', [sa.text(STATUS_RANK_SQL), 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_status_rank', table_name='task')
+    op.drop_index('ix_task_priority_rank', table_name='task')
+    op.drop_index('ix_task_assigned_to', table_name='task')
+    op.drop_index('ix_task_title', table_name='task')
+    op.drop_index('ix_task_due_date', table_name='task')
+    op.drop_index('ix_task_created_at_id', table_name='task')
+    op.drop_index('ix_task_priority_id', table_name='task')
+    op.drop_index('ix_task_status_id', table_name='task')
+    op.drop_index('ix_task_status_priority_id', table_name='task')
@@ -0,0 +1,70 @@
+"""Number PostgreSQL task changes on publish instead of locking writers
+
+Revision ID: e7c2a9d4f1b3
+Revises: d5f1b8c3e9a7
+Create Date: 2026-10-18 21:08:52.310457
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c2a9d4f1b3'
+down_revision: Union[str, Sequence[str], None] = 'd5f1b8c3e9a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _log_function(table: str, lock: bool) -> str:
+    locking = "PERFORM pg_advisory_xact_lock(hashtext('task_change'));" if lock else ""
+    return f"""
+        CREATE OR REPLACE FUNCTION task_change_log() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            {locking}
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO {table}(task_id, op) VALUES (OLD.id, 'delete');
+            ELSE
+                INSERT INTO {table}(task_id, op)
+                VALUES (NEW.id, CASE TG_OP WHEN 'INSERT' THEN 'create' ELSE 'update' END);
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # The trigger no longer takes the advisory lock; entries wait in
+    # task_change_pending until app.db.changes.publish_changes numbers them
+    op.execute("""
+        CREATE TABLE task_change_pending (
+            id BIGSERIAL PRIMARY KEY,
+            task_id INTEGER NOT NULL,
+            op VARCHAR(8) NOT NULL,
+            changed_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+        )
+    """)
+    op.execute(_log_function('task_change_pending', lock=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(_log_function('task_change', lock=True))
+    # Publish what is still pending before dropping it
+    op.execute("SELECT pg_advisory_xact_lock(hashtext('task_change'))")
+    op.execute("""
+        WITH published AS (
+            DELETE FROM task_change_pending RETURNING id, task_id, op, changed_at
+        )
+        INSERT INTO task_change(task_id, op, changed_at)
+        SELECT task_id, op, changed_at FROM published ORDER BY id
+    """)
+    op.execute("DROP TABLE IF EXISTS task_change_pending")
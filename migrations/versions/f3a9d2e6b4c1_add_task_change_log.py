@@ -0,0 +1,92 @@
+"""Add the task_change log behind GET /tasks/changes
+
+Revision ID: f3a9d2e6b4c1
+Revises: b7e2c4f1a9d3
+Create Date: 2026-10-18 19:04:37.518362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9d2e6b4c1'
+down_revision: Union[str, Sequence[str], None] = 'b7e2c4f1a9d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # AUTOINCREMENT: seqs are never reused, even after the newest rows go
+        op.execute("""
+            CREATE TABLE task_change (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id INTEGER NOT NULL,
+                op TEXT NOT NULL,
+                changed_at DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+            )
+        """)
+        op.execute("CREATE INDEX ix_task_change_task_id_seq ON task_change (task_id, seq)")
+        op.execute("""
+            CREATE TRIGGER task_change_ai AFTER INSERT ON task BEGIN
+                INSERT INTO task_change(task_id, op) VALUES (new.id, 'create');
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER task_change_au AFTER UPDATE ON task BEGIN
+                INSERT INTO task_change(task_id, op) VALUES (new.id, 'update');
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER task_change_ad AFTER DELETE ON task BEGIN
+                INSERT INTO task_change(task_id, op) VALUES (old.id, 'delete');
+            END
+        """)
+    elif dialect == 'postgresql':
+        op.execute("""
+            CREATE TABLE task_change (
+                seq BIGSERIAL PRIMARY KEY,
+                task_id INTEGER NOT NULL,
+                op VARCHAR(8) NOT NULL,
+                changed_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+            )
+        """)
+        op.execute("CREATE INDEX ix_task_change_task_id_seq ON task_change (task_id, seq)")
+        # The advisory lock makes writes to task commit in seq order
+        op.execute("""
+            CREATE FUNCTION task_change_log() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                PERFORM pg_advisory_xact_lock(hashtext('task_change'));
+                IF TG_OP = 'DELETE' THEN
+                    INSERT INTO task_change(task_id, op) VALUES (OLD.id, 'delete');
+                ELSE
+                    INSERT INTO task_change(task_id, op)
+                    VALUES (NEW.id, CASE TG_OP WHEN 'INSERT' THEN 'create' ELSE 'update' END);
+                END IF;
+                RETURN NULL;
+            END
+            $$
+        """)
+        op.execute(
+            "CREATE TRIGGER task_change_log AFTER INSERT OR UPDATE OR DELETE ON task "
+            "FOR EACH ROW EXECUTE FUNCTION task_change_log()"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS task_change_ad")
+        op.execute("DROP TRIGGER IF EXISTS task_change_au")
+        op.execute("DROP TRIGGER IF EXISTS task_change_ai")
+        op.execute("DROP TABLE IF EXISTS task_change")
+    elif dialect == 'postgresql':
+        op.execute("DROP TRIGGER IF EXISTS task_change_log ON task")
+        op.execute("DROP FUNCTION IF EXISTS task_change_log()")
+        op.execute("DROP TABLE IF EXISTS task_change")
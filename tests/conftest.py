@@ -34,6 +34,65 @@ def client_fixture(session: Session):
     def override_get_db():
         yield DB(session)
     app.dependency_overrides = { }
-    from app.db.dependancies import get_db
+    from app.db.dependancies import get_db, get_task_db, ThreadpoolDB
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_task_db] = lambda: ThreadpoolDB(DB(session))
+    return TestClient(app)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(name="sqlite_timeout")
+def sqlite_timeout_fixture():
+    """Seconds a file_engine connection waits on a locked database."""
+    return 5.0
+
+@pytest.fixture(name="file_engine")
+def file_engine_fixture(tmp_path, sqlite_timeout):
+    """File-backed sqlite engine with the schema created, usable from any thread."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'file.sqlite3'}",
+        connect_args={"check_same_thread": False, "timeout": sqlite_timeout},
+    )
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture(name="engine_task_db")
+def engine_task_db_fixture():
+    """Build get_task_db overrides serving a ThreadpoolDB on a new session of an engine."""
+    from app.db.dependancies import ThreadpoolDB
+
+    def override(engine):
+        def get_task_db():
+            with Session(engine) as session:
+                yield ThreadpoolDB(DB(session))
+        return get_task_db
+    return override
+
+@pytest.fixture(name="async_engine")
+def async_engine_fixture(tmp_path):
+    """File-backed sqlite+aiosqlite engine with the schema created."""
+    from sqlalchemy.pool import NullPool
+    from app.db.session import create_async_sqlite_engine
+    path = tmp_path / "async.sqlite3"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(sync_engine)
+    sync_engine.dispose()
+    return create_async_sqlite_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+
+@pytest.fixture(name="async_client")
+def async_client_fixture(async_engine):
+    """Provide a FastAPI test client running the routes on AsyncDB."""
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from app.db.async_database import AsyncDB
+    from app.db.dependancies import get_task_db
+
+    async def override_get_task_db():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield AsyncDB(session)
+    app.dependency_overrides = { }
+    app.dependency_overrides[get_task_db] = override_get_task_db
     return TestClient(app)
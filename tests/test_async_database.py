@@ -0,0 +1,56 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db.async_database import AsyncDB
+from app.models.Task import TaskPriority, TaskStatus
+from app.schemas.task import TaskCreate, TaskUpdate
+
+pytestmark = pytest.mark.anyio
+
+
+def future_time(hours: int = 1) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(hours=hours)
+
+
+@pytest.fixture(name="async_db")
+async def async_db_fixture(async_engine):
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield AsyncDB(session)
+
+
+async def test_async_crud_round_trip(async_db: AsyncDB):
+    created = await async_db.create_task(TaskCreate(title="async", due_date=future_time()))
+    assert created.id is not None
+
+    fetched = await async_db.get_task(created.id)
+    assert fetched.title == "async"
+
+    updated = await async_db.update_task(created.id, TaskUpdate(status=TaskStatus.completed))
+    assert updated.status == TaskStatus.completed and updated.updated_at is not None
+
+    assert await async_db.delete_task(created.id) is True
+    assert await async_db.get_task(created.id) is None
+
+
+async def test_async_lists_sort_and_search(async_db: AsyncDB):
+    for i, priority in enumerate([TaskPriority.low, TaskPriority.urgent, TaskPriority.high]):
+        await async_db.create_task(TaskCreate(title=f"item {i}", priority=priority, description="async search"))
+
+    page, cursor = await async_db.get_tasks_keyset("", limit=2)
+    assert len(page) == 2 and cursor is not None
+
+    by_priority = await async_db.sort_tasks("priority")
+    assert [t.priority for t in by_priority] == [TaskPriority.urgent, TaskPriority.high, TaskPriority.low]
+
+    chunks = [chunk async for chunk in await async_db.stream_sorted_tasks("priority", chunk_size=2)]
+    assert [len(c) for c in chunks] == [2, 1]
+
+    assert len(await async_db.search_tasks("search")) == 3
+
+
+async def test_async_bulk_operations(async_db: AsyncDB):
+    a = await async_db.create_task(TaskCreate(title="a"))
+    b = await async_db.create_task(TaskCreate(title="b"))
+    assert await async_db.bulk_update_tasks([{"id": a.id, "title": "A"}, {"id": b.id, "title": "B"}]) == 2
+    assert await async_db.bulk_delete_tasks([a.id, b.id]) == 2
@@ -0,0 +1,245 @@
+import threading
+import time
+from fnmatch import fnmatch
+
+import pytest
+
+from app.db.cache import CacheBackend, KeyValueStoreCache, LRUCache, combine_stats
+from app.db.database import DB
+from app.schemas.task import TaskCreate, TaskUpdate
+
+
+def test_lru_cache_hits_misses_and_evictions():
+    cache = LRUCache(maxsize=2, ttl=60)
+    assert cache.get(1) is None
+    cache.set(1, {"id": 1})
+    cache.set(2, {"id": 2})
+    assert cache.get(1) == {"id": 1}
+    cache.set(3, {"id": 3})  # evicts 2, the least recently used
+
+    assert cache.get(2) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (1, 2, 1, 2)
+
+
+def test_lru_cache_ttl_expiry():
+    cache = LRUCache(maxsize=10, ttl=0.01)
+    cache.set(1, {"id": 1})
+    time.sleep(0.02)
+    assert cache.get(1) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_get_task_is_served_from_cache(session, db: DB):
+    cache = LRUCache()
+    cached_db = DB(session, cache)
+    created = db.create_task(TaskCreate(title="cached"))
+
+    assert cached_db.get_task(created.id).title == "cached"
+    assert cached_db.get_task(created.id).title == "cached"
+    assert cache.stats()["hits"] == 1
+    assert cached_db.get_task(99999) is None
+
+
+def test_writes_invalidate_cached_tasks(session):
+    cache = LRUCache()
+    db = DB(session, cache)
+    a = db.create_task(TaskCreate(title="a"))
+    b = db.create_task(TaskCreate(title="b"))
+
+    db.get_task(a.id)
+    db.update_task(a.id, TaskUpdate(title="a2"))
+    assert db.get_task(a.id).title == "a2"
+
+    db.get_task(a.id), db.get_task(b.id)
+    db.bulk_update_tasks([{"id": a.id, "title": "a3"}])
+    assert db.get_task(a.id).title == "a3"
+
+    db.bulk_delete_tasks([b.id])
+    assert db.get_task(b.id) is None
+
+    db.get_task(a.id)
+    db.delete_task(a.id)
+    assert db.get_task(a.id) is None
+    assert cache.stats()["invalidations"] == 4
+
+
+@pytest.mark.parametrize("atomic", [True, False])
+def test_bulk_writes_invalidate_each_task_once(session, atomic):
+    invalidated = []
+
+    class RecordingCache(LRUCache):
+        def delete_many(self, keys):
+            keys = list(keys)
+            invalidated.extend(keys)
+            super().delete_many(keys)
+
+    db = DB(session, RecordingCache())
+    ids = [db.create_task(TaskCreate(title=f"t{i}")).id for i in range(5)]
+    invalidated.clear()
+
+    db.bulk_update_tasks([{"id": task_id, "title": "changed"} for task_id in ids], chunk_size=2, atomic=atomic)
+    assert sorted(invalidated) == ids
+    invalidated.clear()
+    db.bulk_delete_tasks(ids, chunk_size=2, atomic=atomic)
+    assert sorted(invalidated) == ids
+
+
+def test_stats_of_worker_caches_add_up():
+    first, second = LRUCache(maxsize=10), LRUCache(maxsize=10)
+    first.set(1, {"id": 1})
+    first.get(1)
+    second.get(1)
+    second.get(2)
+
+    combined = combine_stats([first.stats(), second.stats()])
+    assert combined["hits"] == 1 and combined["misses"] == 2 and combined["size"] == 1
+    assert combined["hit_ratio"] == 1 / 3
+    assert combined["maxsize"] == 10 and combined["workers"] == 2
+
+
+class WatchError(Exception):
+    pass
+
+
+class FakeRedis:
+    """Minimal local stand-in for the redis-py client API."""
+
+    def __init__(self):
+        self.data = {}
+        # bumped on every write, for WATCH
+        self.versions = {}
+
+    def _touch(self, name):
+        self.versions[name] = self.versions.get(name, 0) + 1
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def set(self, name, value, ex=None):
+        self.data[name] = value
+        self._touch(name)
+        return True
+
+    def incr(self, name):
+        self.data[name] = str(int(self.data.get(name, 0)) + 1)
+        self._touch(name)
+        return int(self.data[name])
+
+    def delete(self, *names):
+        for name in names:
+            self._touch(name)
+        return sum(self.data.pop(name, None) is not None for name in names)
+
+    def scan_iter(self, pattern):
+        return [name for name in list(self.data) if fnmatch(name, pattern)]
+
+    def transaction(self, func, *watches):
+        while True:
+            pipe = FakePipeline(self, watches)
+            func(pipe)
+            try:
+                return pipe.execute()
+            except WatchError:
+                continue
+
+
+class FakePipeline:
+    """WATCH/MULTI/EXEC over FakeRedis: immediate reads, then queued writes."""
+
+    def __init__(self, client, watches):
+        self.client = client
+        self.watched = {name: client.versions.get(name, 0) for name in watches}
+        self.queued = []
+
+    def get(self, name):
+        return self.client.get(name)
+
+    def multi(self):
+        pass
+
+    def set(self, *args, **kwargs):
+        self.queued.append((args, kwargs))
+
+    def execute(self):
+        if any(self.client.versions.get(name, 0) != version for name, version in self.watched.items()):
+            raise WatchError()
+        return [self.client.set(*args, **kwargs) for args, kwargs in self.queued]
+
+
+def test_key_value_store_cache_backend(session):
+    cache = KeyValueStoreCache(FakeRedis())
+    db = DB(session, cache)
+    created = db.create_task(TaskCreate(title="kv"))
+
+    db.get_task(created.id)
+    hit = db.get_task(created.id)
+    assert hit.title == "kv" and hit.created_at == created.created_at
+
+    db.delete_task(created.id)
+    assert db.get_task(created.id) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["invalidations"] == 1
+
+
+def test_cache_backend_is_abstract():
+    class Partial(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+@pytest.mark.parametrize("make_cache", [LRUCache, lambda: KeyValueStoreCache(FakeRedis())], ids=["lru", "kv"])
+def test_read_racing_a_write_does_not_refill_the_old_row(session, make_cache):
+    cache = make_cache()
+    db = DB(session, cache)
+    created = db.create_task(TaskCreate(title="old"))
+    session.expunge_all()
+
+    # get_task reads the old row, then an update commits and invalidates
+    # the task before the read fills the cache
+    read, invalidated = threading.Event(), threading.Event()
+    fill = cache.fill
+
+    def slow_fill(key, value, token):
+        read.set()
+        invalidated.wait(5)
+        fill(key, value, token)
+
+    cache.fill = slow_fill
+    reader = threading.Thread(target=db.get_task, args=(created.id,))
+    reader.start()
+    read.wait(5)
+    cache.delete_many([created.id])
+    invalidated.set()
+    reader.join()
+    cache.fill = fill
+
+    assert cache.get(created.id) is None
+    db.update_task(created.id, TaskUpdate(title="new"))
+    session.expunge_all()
+    assert db.get_task(created.id).title == "new"
+
+
+def test_fill_does_not_overwrite_a_tombstone_written_after_its_check(session, monkeypatch):
+    client = FakeRedis()
+    cache = KeyValueStoreCache(client)
+    cache.delete_many([1])
+    token = cache.begin_fill(1)
+    assert client.get("task:1") == "invalidated:1"
+
+    # another process invalidates the key between fill's GET and its SET
+    get = FakePipeline.get
+
+    def get_then_invalidate(pipe, name):
+        monkeypatch.setattr(FakePipeline, "get", get)
+        current = get(pipe, name)
+        cache.delete_many([1])
+        return current
+
+    monkeypatch.setattr(FakePipeline, "get", get_then_invalidate)
+    cache.fill(1, {"id": 1, "title": "stale"}, token)
+
+    assert client.get("task:1") == "invalidated:2"
+    assert cache.get(1) is None
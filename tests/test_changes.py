@@ -0,0 +1,118 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.db.changes import ChangeFeed, ChangesGone, change_table, compact_changes
+from app.db.database import DB
+from app.db.dependancies import get_change_feed, get_task_db
+from app.main import app
+from app.schemas.task import TaskCreate, TaskUpdate
+
+
+@pytest.fixture(name="feed")
+def feed_fixture(file_engine):
+    return ChangeFeed(file_engine, poll_interval=0.05)
+
+
+@pytest.fixture(name="changes_client")
+def changes_client_fixture(file_engine, feed, engine_task_db):
+    app.dependency_overrides = {get_task_db: engine_task_db(file_engine), get_change_feed: lambda: feed}
+    yield TestClient(app)
+    app.dependency_overrides = {}
+
+
+def log(engine):
+    with engine.connect() as conn:
+        return [(row.task_id, row.op) for row in conn.execute(select(change_table).order_by(change_table.c.seq))]
+
+
+def test_every_write_path_appends_to_the_log(file_engine):
+    with Session(file_engine) as session:
+        db = DB(session)
+        first = db.create_task(TaskCreate(title="one")).id
+        second, third = db.bulk_create_tasks([TaskCreate(title="two"), TaskCreate(title="three")])
+        db.update_task(first, TaskUpdate(title="uno"))
+        db.bulk_update_tasks([{"id": second, "title": "dos"}])
+        db.delete_task(third)
+        db.bulk_delete_tasks([second])
+
+        assert log(file_engine) == [
+            (first, "create"), (second, "create"), (third, "create"),
+            (first, "update"), (second, "update"), (third, "delete"), (second, "delete"),
+        ]
+        changes = db.get_changes(0, 100)
+    assert [change["seq"] for change in changes] == list(range(1, 8))
+    assert changes[0]["task"]["title"] == "uno"
+    assert changes[1]["task"] is None
+
+
+def test_long_poll_returns_only_new_changes_collapsed_per_task(changes_client):
+    head = changes_client.get("/tasks/changes").json()
+    assert head == {"changes": [], "next": 0}
+
+    created = changes_client.post("/tasks/", json={"title": "first"}).json()
+    changes_client.put(f"/tasks/{created['id']}", json={"title": "renamed"})
+    other = changes_client.post("/tasks/", json={"title": "second"}).json()
+
+    page = changes_client.get("/tasks/changes", params={"since": head["next"]}).json()
+    assert [(change["task_id"], change["op"]) for change in page["changes"]] == [
+        (created["id"], "update"), (other["id"], "create"),
+    ]
+    assert page["changes"][0]["task"]["title"] == "renamed"
+    assert page["next"] == 3
+    assert changes_client.get("/tasks/changes", params={"since": 3}).json() == {"changes": [], "next": 3}
+
+
+def test_waiting_subscribers_share_one_read_and_wake_on_a_write(file_engine, feed):
+    async def subscribe():
+        _, head = await feed.changes(None)
+        waiters = [asyncio.create_task(feed.changes(head, wait=5)) for _ in range(50)]
+        await asyncio.sleep(0.2)
+        refreshes = feed.refreshes
+
+        def write():
+            with Session(file_engine) as session:
+                DB(session).create_task(TaskCreate(title="news"))
+        threading.Thread(target=write).start()
+        return await asyncio.gather(*waiters), feed.refreshes - refreshes
+
+    results, refreshes = asyncio.run(subscribe())
+    assert all([change["task"]["title"] for change in changes] == ["news"] for changes, _ in results)
+    assert refreshes <= 3
+    assert feed.db_reads == 0
+
+
+def test_compaction_and_retention(changes_client, file_engine, feed):
+    ids = [changes_client.post("/tasks/", json={"title": f"task {i}"}).json()["id"] for i in range(3)]
+    for _ in range(2):
+        changes_client.put(f"/tasks/{ids[0]}", json={"priority": "high"})
+
+    with file_engine.begin() as conn:
+        assert compact_changes(conn, retention_seconds=3600) == (2, 0)
+    assert [op for _, op in log(file_engine)] == ["create", "create", "update"]
+    page = changes_client.get("/tasks/changes", params={"since": 0}).json()
+    assert [change["seq"] for change in page["changes"]] == [2, 3, 5]
+
+    with file_engine.begin() as conn:
+        assert compact_changes(conn, retention_seconds=60, now=datetime.utcnow() + timedelta(minutes=5)) == (0, 3)
+    assert log(file_engine) == [(0, "truncate")]
+    fresh = ChangeFeed(file_engine)
+    with pytest.raises(ChangesGone):
+        fresh.read(3, 100)
+    assert changes_client.get("/tasks/changes", params={"since": 3}).status_code == 410
+    assert fresh.read(5, 100) == []
+
+
+def test_event_stream_resumes_from_last_event_id(changes_client):
+    ids = [changes_client.post("/tasks/", json={"title": f"task {i}"}).json()["id"] for i in range(3)]
+
+    res = changes_client.get("/tasks/changes", params={"wait": 0.2},
+                             headers={"Accept": "text/event-stream", "Last-Event-ID": "1"})
+    assert res.headers["content-type"].startswith("text/event-stream")
+    events = [block for block in res.text.split("\n\n") if block.startswith("id:")]
+    assert [event.splitlines()[0] for event in events] == ["id: 2", "id: 3"]
+    assert f'"task_id":{ids[2]}' in events[1]
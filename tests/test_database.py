@@ -1,8 +1,13 @@
 import pytest
 from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from sqlalchemy import event, text
 from sqlmodel import select
 
+from app.db.batching import bound_parameter_limit, rows_per_statement
+from app.db.counting import page_total
 from app.db.database import DB
+from app.db.stats import rebuild_stats, stats_drift
 from app.models.Task import Task, TaskPriority, TaskStatus
 from app.schemas.task import TaskCreate, TaskUpdate
 
@@ -74,17 +79,10 @@ def test_get_tasks_pagination_no_filters(db: DB):
 def test_get_tasks_filter_by_priority_and_status(db: DB):
     created = seed_tasks_for_filtering(db)
     items = db.get_tasks_pagination_and_filter(priority=TaskPriority.high)
-    # NOTE: Current DB implementation applies both filters even if one is None,
-    # which may return empty. This assertion accepts either 0 or the expected 1
-    # to document current behavior. Update when implementation is fixed.
-    assert len(items) in (0, 1)
-    if len(items) == 1:
-        assert items[0].priority == TaskPriority.high
+    assert [t.id for t in items] == [created[1].id]
 
     items2 = db.get_tasks_pagination_and_filter(status=TaskStatus.completed)
-    assert len(items2) in (0, 1)
-    if len(items2) == 1:
-        assert items2[0].status == TaskStatus.completed
+    assert [t.id for t in items2] == [created[2].id]
 
     items3 = db.get_tasks_pagination_and_filter(
         priority=TaskPriority.urgent, status=TaskStatus.cancelled
@@ -118,3 +116,317 @@ def test_sort_tasks_invalid_field_raises(db: DB):
         db.sort_tasks("unknown")
 
 
+def test_get_tasks_keyset_walks_all_pages(db: DB):
+    created = seed_tasks_for_filtering(db)
+    seen, cursor = [], ""
+    while True:
+        page, cursor = db.get_tasks_keyset(cursor, limit=3)
+        seen.extend(t.id for t in page)
+        if cursor is None:
+            break
+    assert seen == sorted(t.id for t in created)
+
+
+def test_get_tasks_keyset_created_at_and_filters(db: DB):
+    seed_tasks_for_filtering(db)
+    page, cursor = db.get_tasks_keyset("", limit=1, order_by="created_at")
+    assert len(page) == 1 and cursor is not None
+    rest, _ = db.get_tasks_keyset(cursor, limit=10, order_by="created_at")
+    assert page[0].id not in {t.id for t in rest}
+    assert len(rest) == 3
+
+    filtered, cursor = db.get_tasks_keyset("", priority=TaskPriority.high)
+    assert [t.priority for t in filtered] == [TaskPriority.high]
+    assert cursor is None
+
+
+def test_get_tasks_keyset_rejects_bad_cursor(db: DB):
+    with pytest.raises(ValueError):
+        db.get_tasks_keyset("not-a-cursor")
+    seed_tasks_for_filtering(db)
+    _, cursor = db.get_tasks_keyset("", limit=1, order_by="id")
+    with pytest.raises(ValueError):
+        db.get_tasks_keyset(cursor, order_by="created_at")
+
+
+def test_sort_tasks_limit(db: DB):
+    seed_tasks_for_filtering(db)
+    assert len(db.sort_tasks("title", limit=2)) == 2
+
+
+@pytest.mark.parametrize("field", ["title", "created_at", "due_date", "priority", "status"])
+def test_sort_tasks_keyset_matches_full_sort(db: DB, field: str):
+    seed_tasks_for_filtering(db)
+    db.create_task(TaskCreate(title="no deadline"))
+    expected = [t.id for t in db.sort_tasks(field)]
+
+    seen, cursor = [], ""
+    while True:
+        page, cursor = db.sort_tasks_keyset(field, cursor, limit=2)
+        seen.extend(t.id for t in page)
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_stream_sorted_tasks_chunks(db: DB):
+    seed_tasks_for_filtering(db)
+    chunks = list(db.stream_sorted_tasks("priority", chunk_size=3))
+    assert [len(c) for c in chunks] == [3, 1]
+    assert [row["title"] for chunk in chunks for row in chunk] == [t.title for t in db.sort_tasks("priority")]
+    assert "author" not in chunks[0][0]
+
+
+def test_stream_sorted_tasks_invalid_field_raises_eagerly(db: DB):
+    with pytest.raises(Exception):
+        db.stream_sorted_tasks("unknown")
+
+
+def seed_tasks_for_search(db: DB):
+    db.create_task(TaskCreate(title="Refactor parser", description="tokenizer cleanup"))
+    db.create_task(TaskCreate(title="Write docs", description="release notes for the parser"))
+    db.create_task(TaskCreate(title="Notes", description="notes about release planning"))
+
+
+def test_search_tasks_ranks_title_matches_first(db: DB):
+    seed_tasks_for_search(db)
+    assert [t.title for t in db.search_tasks("parser")] == ["Refactor parser", "Write docs"]
+
+
+def test_search_tasks_prefix_and_phrase(db: DB):
+    seed_tasks_for_search(db)
+    assert {t.title for t in db.search_tasks("pars*")} == {"Refactor parser", "Write docs"}
+    assert [t.title for t in db.search_tasks('"release notes"')] == ["Write docs"]
+    # FTS5 operators in user input are treated as plain text: no syntax
+    # error, and keywords match like any other word
+    with pytest.raises(HTTPException) as exc_info:
+        db.search_tasks("OR NOT")
+    assert exc_info.value.status_code == 404
+    db.create_task(TaskCreate(title="NOT done"))
+    assert [t.title for t in db.search_tasks("NOT done")] == ["NOT done"]
+    assert [t.title for t in db.search_tasks("NOT")] == ["NOT done"]
+
+
+def test_search_tasks_index_follows_updates_and_deletes(db: DB):
+    seed_tasks_for_search(db)
+    first = db.search_tasks("tokenizer")[0]
+    db.update_task(first.id, TaskUpdate(description="lexer cleanup"))
+    assert [t.id for t in db.search_tasks("lexer")] == [first.id]
+    db.delete_task(first.id)
+    with pytest.raises(Exception):
+        db.search_tasks("lexer")
+
+
+def test_search_tasks_falls_back_to_like_without_fts(session, db: DB):
+    from app.db import fts
+    seed_tasks_for_search(db)
+    fts.drop_fts(session.connection())
+    session.commit()
+    fts._fts_enabled.clear()
+
+    assert [t.title for t in db.search_tasks("ACTOR")] == ["Refactor parser"]
+
+
+def test_get_task_version(db: DB):
+    created = db.create_task(TaskCreate(title="versioned"))
+    assert db.get_task_version(created.id) == (created.id, created.created_at)
+    updated = db.update_task(created.id, TaskUpdate(title="v2"))
+    assert db.get_task_version(created.id) == (created.id, updated.updated_at)
+    assert db.get_task_version(99999) is None
+
+
+def test_bulk_create_tasks_chunks_in_one_transaction(db: DB):
+    tasks = [TaskCreate(title=f"bulk {i}", priority=TaskPriority.low) for i in range(7)]
+    ids = db.bulk_create_tasks(tasks, chunk_size=3)
+    assert len(ids) == 7
+    assert [db.get_task(task_id).title for task_id in ids] == [f"bulk {i}" for i in range(7)]
+    assert all(db.get_task(task_id).created_at is not None for task_id in ids)
+    # new rows reach the search index through the FTS triggers
+    assert db.search_tasks("bulk", limit=10)
+
+    with pytest.raises(HTTPException) as exc:
+        db.bulk_create_tasks([])
+    assert exc.value.status_code == 400
+
+
+def test_bulk_update_tasks_chunks_by_field_set(db: DB):
+    ids = db.bulk_create_tasks([TaskCreate(title=f"t{i}", priority=TaskPriority.low) for i in range(5)])
+    updates = [
+        {"id": ids[0], "title": "first"},
+        {"id": ids[1], "title": "second"},
+        {"id": ids[2], "status": TaskStatus.completed},
+        {"id": ids[3], "title": "fourth", "priority": TaskPriority.urgent},
+    ]
+    assert db.bulk_update_tasks(updates, chunk_size=3) == 4
+
+    tasks = [db.get_task(task_id) for task_id in ids]
+    assert [t.title for t in tasks] == ["first", "second", "t2", "fourth", "t4"]
+    assert tasks[2].status == TaskStatus.completed
+    assert [t.priority for t in tasks] == [TaskPriority.low] * 3 + [TaskPriority.urgent, TaskPriority.low]
+    assert tasks[4].updated_at is None and all(t.updated_at for t in tasks[:4])
+
+
+@pytest.mark.parametrize("atomic, expected", [(True, "t0"), (False, "changed")])
+def test_bulk_update_tasks_atomic_vs_per_chunk(db: DB, atomic: bool, expected: str):
+    ids = db.bulk_create_tasks([TaskCreate(title=f"t{i}") for i in range(2)])
+    # the second chunk violates NOT NULL on title
+    updates = [{"id": ids[0], "title": "changed"}, {"id": ids[1], "title": None}]
+    with pytest.raises(Exception):
+        db.bulk_update_tasks(updates, chunk_size=1, atomic=atomic)
+    assert db.get_task(ids[0]).title == expected
+
+
+def test_bulk_delete_tasks_chunked(db: DB):
+    ids = db.bulk_create_tasks([TaskCreate(title=f"t{i}") for i in range(5)])
+    assert db.bulk_delete_tasks(ids + [99999], chunk_size=2, atomic=False) == 5
+    assert all(db.get_task(task_id) is None for task_id in ids)
+    with pytest.raises(HTTPException) as exc:
+        db.bulk_delete_tasks(ids)
+    assert exc.value.status_code == 404
+
+
+def test_rows_per_statement_respects_parameter_limit(session):
+    limit = bound_parameter_limit(session.connection())
+    assert limit >= 999
+    assert rows_per_statement(500, 7, limit=999) == 142
+    assert rows_per_statement(100, 7, limit=999) == 100
+    assert rows_per_statement(500, 2000, limit=999) == 1
+
+
+def test_single_row_writes_take_one_statement(session, db: DB):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.split()[0])
+
+    event.listen(session.get_bind(), "before_cursor_execute", record)
+    created = db.create_task(TaskCreate(title="one", due_date=future_time()))
+    updated = db.update_task(created.id, TaskUpdate(title="two"))
+    deleted = db.delete_task(created.id)
+    event.remove(session.get_bind(), "before_cursor_execute", record)
+
+    assert statements == ["INSERT", "UPDATE", "DELETE"]
+    assert created.id and created.created_at and created.due_date
+    assert updated.title == "two" and updated.updated_at and updated.due_date == created.due_date
+    assert deleted
+    assert db.update_task(created.id, TaskUpdate(title="gone")) is None
+    assert not db.delete_task(created.id)
+
+
+def test_fields_project_columns_in_sql(session, db: DB):
+    db.create_task(TaskCreate(title="projected", description="long " * 100))
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", record)
+    rows = db.sort_tasks("title", fields=("id", "title"))
+    page, _ = db.get_tasks_keyset("", fields=("title",), order_by="created_at")
+    event.remove(session.get_bind(), "before_cursor_execute", record)
+
+    assert [tuple(row) for row in rows] == [(1, "projected")]
+    assert page[0]._fields == ("title", "created_at", "id")
+    assert all("description" not in statement for statement in statements)
+
+
+def test_task_stats_follow_every_write_path(session, db: DB):
+    ids = db.bulk_create_tasks([
+        TaskCreate(title="a", assigned_to="alice", priority=TaskPriority.high, due_date=future_time()),
+        TaskCreate(title="b", assigned_to="bob"),
+        TaskCreate(title="c"),
+    ])
+    db.create_task(TaskCreate(title="d", assigned_to="alice", status=TaskStatus.completed, due_date=future_time()))
+    db.update_task(ids[1], TaskUpdate(assigned_to="alice", status=TaskStatus.in_progress))
+    db.bulk_update_tasks([{"id": ids[2], "priority": TaskPriority.urgent}])
+    db.bulk_delete_tasks([ids[0]])
+
+    stats = db.get_task_stats()
+    assert stats["total"] == 3
+    assert stats["by_status"] == {TaskStatus.pending: 1, TaskStatus.in_progress: 1,
+                                  TaskStatus.completed: 1, TaskStatus.cancelled: 0}
+    assert stats["by_priority"][TaskPriority.urgent] == 1
+    assert stats["by_priority"][TaskPriority.high] == 0
+    assert stats["by_assignee"] == {"alice": 2}
+    assert stats["unassigned"] == 1
+    assert stats["overdue"] == 0
+    # completed tasks are never overdue
+    assert db.get_task_stats(now=datetime.utcnow() + timedelta(days=2))["overdue"] == 0
+
+    assert stats_drift(session.connection()) == []
+    session.execute(text("UPDATE task_stats SET count = 99 WHERE dimension = 'total'"))
+    assert stats_drift(session.connection()) == [("total", "", 99, 3)]
+    rebuild_stats(session.connection())
+    assert db.get_task_stats() == stats
+
+
+def test_task_stats_overdue_uses_status_due_date_index(session, db: DB):
+    db.create_task(TaskCreate(title="late", due_date=future_time()))
+    assert db.get_task_stats(now=datetime.utcnow() + timedelta(days=1))["overdue"] == 1
+    plan = session.execute(text(
+        "EXPLAIN QUERY PLAN SELECT count(*) FROM task "
+        "WHERE status IN ('pending', 'in_progress') AND due_date < '2100-01-01'"
+    )).all()
+    assert "COVERING INDEX ix_task_status_due_date" in plan[0][3]
+
+
+def test_task_stats_fall_back_to_group_by(session, db: DB):
+    from app.db import stats as stats_module
+    db.create_task(TaskCreate(title="counted", assigned_to="alice"))
+    expected = db.get_task_stats()
+    stats_module.drop_stats(session.connection())
+    stats_module._stats_enabled.pop(session.get_bind(), None)
+    assert db.get_task_stats() == expected
+
+
+def test_get_tasks_page_has_more_and_total(db: DB):
+    for i in range(5):
+        db.create_task(TaskCreate(title=f"t{i}", priority=TaskPriority.high if i % 2 else TaskPriority.low))
+
+    items, has_more, total = db.get_tasks_page(skip=0, limit=2)
+    assert (len(items), has_more, total) == (2, True, None)
+    assert db.get_tasks_page(skip=0, limit=2, count="exact")[1:] == (True, 5)
+    assert db.get_tasks_page(skip=4, limit=2, count="exact")[1:] == (False, 5)
+    assert db.get_tasks_page(skip=0, limit=1, priority=TaskPriority.high, count="estimated")[1:] == (True, 2)
+    with pytest.raises(ValueError):
+        db.get_tasks_page(count="approximate")
+
+
+def test_page_total_counts_only_when_the_page_cannot_tell():
+    def count():
+        raise AssertionError("count should not run")
+
+    assert page_total(0, 0, False, count) == 0
+    assert page_total(20, 3, False, count) == 23
+    # past the end the total is at most skip; a next page proves skip + returned + 1
+    assert page_total(50, 0, False, lambda: 80) == 50
+    assert page_total(0, 10, True, lambda: 4) == 11
+
+
+def test_count_tasks_uses_counters_and_estimates_combined_filters(session, db: DB):
+    db.bulk_create_tasks(
+        [TaskCreate(title=f"h{i}", priority=TaskPriority.high, status=TaskStatus.pending) for i in range(3)]
+        + [TaskCreate(title=f"l{i}", priority=TaskPriority.low, status=TaskStatus.completed) for i in range(1)]
+    )
+    statements = []
+    event.listen(session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *rest: statements.append(statement))
+
+    assert db.count_tasks() == 4
+    assert db.count_tasks(status=TaskStatus.pending) == 3
+    assert db.count_tasks(priority=TaskPriority.low) == 1
+    assert not any("FROM task " in statement for statement in statements)
+
+    # 4 * (3/4) * (3/4) assumes status and priority are independent
+    assert db.count_tasks(TaskPriority.high, TaskStatus.pending, "estimated") == 2
+    assert db.count_tasks(TaskPriority.high, TaskStatus.pending, "exact") == 3
+
+
+def test_count_search_caches_estimates(db: DB):
+    seed_tasks_for_search(db)
+    exact = db.count_search("parser")
+    assert exact > 0
+    assert db.count_search("parser", "estimated") == exact
+    db.create_task(TaskCreate(title="another parser"))
+    assert db.count_search("parser", "estimated") == exact
+    assert db.count_search("parser", "exact") == exact + 1
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, insert, select
+
+from app.db.cache import LRUCache
+from app.db.database import DB
+from app.db.dependancies import ThreadpoolDB, get_task_db
+from app.db.group_commit import GroupCommitDB, GroupCommitWriter
+from app.main import app
+from app.models.Task import Task
+from app.schemas.task import TaskCreate, TaskUpdate
+
+
+def test_concurrent_writes_share_a_commit(file_engine):
+    writer = GroupCommitWriter(file_engine, window_ms=100, max_batch=8)
+    futures = [writer.submit(DB.create_statement(TaskCreate(title=f"task {i}"))) for i in range(20)]
+    tasks = [future.result(timeout=5) for future in futures]
+    writer.close()
+
+    assert [task.title for task in tasks] == [f"task {i}" for i in range(20)]
+    assert len({task.id for task in tasks}) == 20
+    assert 3 <= writer.batches < 20
+    assert writer.writes == 20
+    with Session(file_engine) as session:
+        assert len(session.exec(select(Task)).all()) == 20
+
+
+def test_failed_write_only_fails_its_request(file_engine):
+    writer = GroupCommitWriter(file_engine, window_ms=100)
+    good = writer.submit(DB.create_statement(TaskCreate(title="kept")))
+    bad = writer.submit(insert(Task).values(title=None).returning(Task))
+    missing = writer.submit(DB.update_statement(999, TaskUpdate(title="nobody")))
+    renamed = writer.submit(DB.update_statement(1, TaskUpdate(title="renamed")))
+
+    assert good.result(timeout=5).title == "kept"
+    with pytest.raises(IntegrityError):
+        bad.result(timeout=5)
+    assert missing.result(timeout=5) is None
+    assert renamed.result(timeout=5).title == "renamed"
+    writer.close()
+    with Session(file_engine) as session:
+        assert [task.title for task in session.exec(select(Task)).all()] == ["renamed"]
+
+
+def test_writes_invalidate_the_cache(file_engine):
+    cache = LRUCache(maxsize=16, ttl=60)
+    writer = GroupCommitWriter(file_engine, cache)
+    created = writer.submit(DB.create_statement(TaskCreate(title="cached"))).result(timeout=5)
+    cache.set(created.id, created.model_dump())
+    writer.submit(DB.update_statement(created.id, TaskUpdate(title="fresh"))).result(timeout=5)
+    writer.close()
+    assert cache.get(created.id) is None
+
+
+def test_routes_with_group_commit(session):
+    writer = GroupCommitWriter(session.get_bind())
+    app.dependency_overrides = {get_task_db: lambda: GroupCommitDB(ThreadpoolDB(DB(session)), writer)}
+    client = TestClient(app)
+
+    created = client.post("/tasks/", json={"title": "grouped"})
+    assert created.status_code == 201
+    task_id = created.json()["id"]
+    updated = client.put(f"/tasks/{task_id}", json={"status": "completed"})
+    assert updated.json()["status"] == "completed"
+    assert client.put("/tasks/999", json={"title": "x"}).status_code == 404
+    assert client.get(f"/tasks/{task_id}").json()["title"] == "grouped"
+    writer.close()
+
+
+def test_cancelled_waiter_does_not_stop_the_writer(file_engine):
+    writer = GroupCommitWriter(file_engine, window_ms=50)
+
+    async def cancel_one_then_write():
+        abandoned = asyncio.ensure_future(writer.write(DB.create_statement(TaskCreate(title="abandoned"))))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        return await asyncio.wait_for(writer.write(DB.create_statement(TaskCreate(title="next"))), timeout=5)
+
+    assert asyncio.run(cancel_one_then_write()).title == "next"
+    assert writer._thread.is_alive()
+    writer.close()
+    with Session(file_engine) as session:
+        assert [task.title for task in session.exec(select(Task)).all()] == ["next"]
@@ -0,0 +1,83 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, create_engine
+
+from app.db.health import DatabaseProbe, get_database_probe, migration_head, readiness
+from app.main import app
+
+
+@pytest.fixture(name="sqlite_timeout")
+def sqlite_timeout_fixture():
+    # a locked database has to fail the probe rather than wait it out
+    return 0.05
+
+
+def test_live_and_ready(client: TestClient, session):
+    app.dependency_overrides[get_database_probe] = lambda: DatabaseProbe(session.get_bind())
+
+    assert client.get("/health/live").json() == {"status": "alive"}
+    res = client.get("/health/ready")
+    assert res.status_code == 200
+    body = res.json()
+    assert body["status"] == "ready"
+    assert body["checks"]["database"]["error"] is None
+    assert body["checks"]["migrations"] == {"current": None, "head": migration_head(), "ok": True}
+    assert body["checks"]["wal"] == {"bytes": 0, "ok": True}
+
+
+@pytest.mark.anyio
+async def test_probe_is_cached_between_checks(file_engine):
+    probe = DatabaseProbe(file_engine, interval=60)
+    for _ in range(5):
+        ready, _ = await readiness(probe)
+        assert ready
+    assert probe.probes == 1
+
+
+@pytest.mark.anyio
+async def test_locked_database_is_degraded(file_engine):
+    locker = sqlite3.connect(file_engine.url.database)
+    locker.execute("BEGIN EXCLUSIVE")
+    try:
+        ready, report = await readiness(DatabaseProbe(file_engine, interval=0))
+        assert not ready
+        assert report["status"] == "degraded"
+        assert "locked" in report["checks"]["database"]["error"]
+    finally:
+        locker.rollback()
+        locker.close()
+    ready, _ = await readiness(DatabaseProbe(file_engine, interval=0))
+    assert ready
+
+
+@pytest.mark.anyio
+async def test_slow_probe_times_out(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'slow.sqlite3'}", connect_args={"timeout": 0.5})
+    SQLModel.metadata.create_all(engine)
+    locker = sqlite3.connect(engine.url.database)
+    locker.execute("BEGIN EXCLUSIVE")
+    try:
+        ready, report = await readiness(DatabaseProbe(engine, interval=0, timeout=0.05))
+        assert not ready
+        assert "timed out" in report["checks"]["database"]["error"]
+    finally:
+        locker.rollback()
+        locker.close()
+        engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_behind_migration_head_is_degraded(file_engine):
+    with file_engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)")
+        conn.exec_driver_sql("INSERT INTO alembic_version VALUES ('0000000000')")
+    ready, report = await readiness(DatabaseProbe(file_engine))
+    assert not ready
+    assert report["checks"]["migrations"]["current"] == "0000000000"
+
+    with file_engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE alembic_version SET version_num = ?", (migration_head(),))
+    ready, _ = await readiness(DatabaseProbe(file_engine))
+    assert ready
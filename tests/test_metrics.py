@@ -0,0 +1,144 @@
+import logging
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from app.metrics import Counter, Gauge, Histogram, Registry, install_engine_metrics, registry
+
+
+def sample_lines(text: str, prefix: str) -> list:
+    return [line for line in text.splitlines() if line.startswith(prefix)]
+
+
+def test_counters_sum_across_threads():
+    registry = Registry()
+    counter = Counter(registry, "jobs_total", "Jobs.", ("kind",))
+    gauge = Gauge(registry, "jobs_running", "Running jobs.")
+
+    def work():
+        for _ in range(1000):
+            counter.inc(("a",))
+            gauge.inc()
+            gauge.dec()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc(('say "hi"\n',), 2)
+
+    text = registry.render()
+    assert 'jobs_total{kind="a"} 8000' in text
+    assert 'jobs_total{kind="say \\"hi\\"\\n"} 2' in text
+    assert sample_lines(text, "jobs_running ") == ["jobs_running 0"]
+    assert "# TYPE jobs_total counter" in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = Histogram(registry, "latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, ("/x",))
+
+    assert sample_lines(registry.render(), "latency_seconds") == [
+        'latency_seconds_bucket{route="/x",le="0.1"} 2',
+        'latency_seconds_bucket{route="/x",le="1"} 3',
+        'latency_seconds_bucket{route="/x",le="+Inf"} 4',
+        'latency_seconds_sum{route="/x"} 3.65',
+        'latency_seconds_count{route="/x"} 4',
+    ]
+
+
+def test_metrics_endpoint_reports_routes_db_methods_and_queries(client: TestClient, session):
+    install_engine_metrics(session.get_bind(), "test")
+    created = client.post("/tasks/", json={"title": "measured"}).json()
+    client.get(f"/tasks/{created['id']}")
+    client.get("/tasks/999999")
+
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = res.text
+    assert sample_lines(text, 'http_requests_total{method="GET",route="/tasks/{task_id}",status="404"}')
+    assert sample_lines(text, 'http_request_duration_seconds_count{method="POST",route="/tasks/"}')
+    assert sample_lines(text, 'db_method_calls_total{method="create_task",outcome="ok"}')
+    assert 'db_queries_total{engine="test",method="create_task"} 1' in text
+    assert sample_lines(text, 'db_pool_checkout_wait_seconds_count{engine="test"}')
+    assert sample_lines(text, "threadpool_queue_wait_seconds_count")
+    assert sample_lines(text, "threadpool_tokens_total ")
+    # the scrape itself is in flight while it renders
+    assert "http_requests_in_flight 1" in text
+
+
+def test_shards_of_finished_threads_are_retired():
+    registry = Registry()
+    counter = Counter(registry, "jobs_total", "Jobs.")
+    histogram = Histogram(registry, "job_seconds", "Job time.", buckets=(1.0,))
+
+    for _ in range(50):
+        thread = threading.Thread(target=lambda: (counter.inc(), histogram.observe(0.5)))
+        thread.start()
+        thread.join()
+        assert len(registry._shards) <= 2
+
+    text = registry.render()
+    assert sample_lines(text, "jobs_total ") == ["jobs_total 50"]
+    assert 'job_seconds_bucket{le="1"} 50' in text
+    assert len(registry._shards) == 0
+    registry.reset()
+    assert sample_lines(registry.render(), "jobs_total ") == []
+
+
+def test_workers_sharing_a_directory_are_summed(tmp_path):
+    def worker():
+        registry = Registry(str(tmp_path))
+        counter = Counter(registry, "jobs_total", "Jobs.", ("kind",))
+        gauge = Gauge(registry, "jobs_running", "Running jobs.")
+        registry.register_collector("pool_size", "gauge", "Pool size.", lambda: [((), (), 5)])
+        return registry, counter, gauge
+
+    registry, counter, gauge = worker()
+    counter.inc(("a",))
+    gauge.inc()
+    other, other_counter, other_gauge = worker()
+    other_counter.inc(("a",), 2)
+    other_counter.inc(("b",))
+    other_gauge.inc(amount=3)
+    snapshot = other.snapshot()
+    snapshot["pid"] = -1
+    other.write_snapshot(snapshot)
+
+    text = registry.render()
+    assert 'jobs_total{kind="a"} 3' in text and 'jobs_total{kind="b"} 1' in text
+    assert sample_lines(text, "jobs_running ") == ["jobs_running 4"]
+    assert sample_lines(text, "pool_size ") == ["pool_size 10"]
+
+    # a worker that stopped writing is gone: its counters stay, its gauges do not
+    snapshot["written_at"] -= 3 * other.interval + 1
+    other.write_snapshot(snapshot)
+    text = registry.render()
+    assert 'jobs_total{kind="a"} 3' in text
+    assert sample_lines(text, "jobs_running ") == ["jobs_running 1"]
+    assert sample_lines(text, "pool_size ") == ["pool_size 5"]
+
+
+def test_engines_are_instrumented_once_and_summed_per_name(caplog):
+    first = create_engine("sqlite://", poolclass=QueuePool, pool_size=2)
+    second = create_engine("sqlite://", poolclass=QueuePool, pool_size=3)
+    install_engine_metrics(first, "shared")
+    install_engine_metrics(second, "shared")
+    with pytest.raises(ValueError):
+        install_engine_metrics(first, "other")
+    assert 'db_pool_size{engine="shared"} 5' in registry.render()
+
+    # pool-wait timing needs the private QueuePool getter; without it only that metric is skipped
+    unusual = create_engine("sqlite://")
+    unusual.pool = SimpleNamespace()
+    with caplog.at_level(logging.WARNING, logger="app.metrics"):
+        install_engine_metrics(unusual, "unusual")
+    assert "_do_get" in caplog.text
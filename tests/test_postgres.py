@@ -0,0 +1,284 @@
+"""
+PostgreSQL backend tests. The statement builders are checked offline
+against the postgresql dialect; the rest run against TEST_POSTGRES_URL, or
+a throwaway cluster started with initdb/pg_ctl when those are on PATH, and
+are skipped otherwise.
+"""
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql
+from sqlmodel import Session
+
+from app.db import postgres
+from app.db.changes import ChangeFeed
+from app.db.database import DB
+from app.db.health import ALEMBIC_INI, migration_head
+from app.db.stats import fold_stats, stats_drift
+from app.models.Task import Task, TaskPriority, TaskStatus
+from app.schemas.task import TaskCreate, TaskUpdate
+
+
+def compile_pg(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_urls_use_psycopg(monkeypatch):
+    from app.db.session import async_database_url
+
+    assert postgres.driver_url("postgres://u:p@db/tasks") == "postgresql+psycopg://u:p@db/tasks"
+    assert postgres.driver_url("postgresql+psycopg2://db/tasks") == "postgresql+psycopg://db/tasks"
+    assert async_database_url("postgresql://db/tasks") == "postgresql+psycopg://db/tasks"
+    assert async_database_url("sqlite:///./db.sqlite3") == "sqlite+aiosqlite:///./db.sqlite3"
+    assert not postgres.is_postgres_url("sqlite:///./db.sqlite3")
+
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "0")
+    options = postgres.pool_options()
+    assert options["pool_size"] == 3
+    assert options["pool_pre_ping"] is False
+    assert options["pool_recycle"] == postgres.POOL_DEFAULTS["pool_recycle"]
+
+
+def test_update_from_values_casts_to_column_types():
+    items = [{"id": 1, "status": TaskStatus.completed}, {"id": 2, "status": TaskStatus.cancelled}]
+    sql = compile_pg(postgres.update_from_values(Task.__table__, ("status",), items, datetime.now(timezone.utc)))
+    assert "UPDATE task SET status=CAST(v.status AS taskstatus)" in sql
+    assert "FROM (VALUES" in sql
+    assert "WHERE task.id = v.id" in sql
+
+
+def test_due_date_sorts_put_nulls_first():
+    assert "ORDER BY task.due_date NULLS FIRST, task.id" in compile_pg(DB.sorted_rows_statement("due_date"))
+
+
+def test_build_tsquery_syntax():
+    sql = compile_pg(postgres.build_tsquery('deploy pars* "release notes"'))
+    assert "plainto_tsquery" in sql
+    assert "to_tsquery" in sql
+    assert "phraseto_tsquery" in sql
+    assert sql.count("&&") == 2
+    with pytest.raises(ValueError):
+        postgres.build_tsquery('* ""')
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def postgres_url(tmp_path_factory):
+    pytest.importorskip("psycopg")
+    url = os.getenv("TEST_POSTGRES_URL")
+    if url:
+        yield url
+        return
+    initdb, pg_ctl = shutil.which("initdb"), shutil.which("pg_ctl")
+    if not (initdb and pg_ctl):
+        pytest.skip("no TEST_POSTGRES_URL and no initdb/pg_ctl on PATH")
+
+    data = tmp_path_factory.mktemp("pgdata")
+    port = _free_port()
+    subprocess.run([initdb, "-D", str(data), "-U", "postgres", "--auth=trust"], check=True, capture_output=True)
+    subprocess.run(
+        [pg_ctl, "-D", str(data), "-l", str(data / "server.log"), "-w", "start",
+         "-o", f"-p {port} -k {data} -c listen_addresses=''"],
+        check=True, capture_output=True,
+    )
+    try:
+        yield f"postgresql://postgres@/postgres?host={data}&port={port}"
+    finally:
+        subprocess.run([pg_ctl, "-D", str(data), "-m", "immediate", "stop"], capture_output=True)
+
+
+def _alembic(url: str, revision: str, downgrade: bool = False) -> None:
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["database_url"] = url
+    config.attributes["configure_logger"] = False
+    (command.downgrade if downgrade else command.upgrade)(config, revision)
+
+
+@pytest.fixture(scope="module")
+def pg_engine(postgres_url):
+    engine = postgres.create_postgres_engine(postgres_url)
+    _alembic(postgres_url, "head")
+    yield engine
+    _alembic(postgres_url, "base", downgrade=True)
+    engine.dispose()
+
+
+@pytest.fixture(name="pg_db")
+def pg_db_fixture(pg_engine):
+    with pg_engine.begin() as conn:
+        # TRUNCATE fires no row triggers; reset the counters with the rows
+        conn.exec_driver_sql("TRUNCATE task, task_stats RESTART IDENTITY")
+    with Session(pg_engine) as session:
+        yield DB(session)
+
+
+def test_migrations_create_native_enums_and_search_indexes(pg_engine):
+    with pg_engine.connect() as conn:
+        enums = {row[0] for row in conn.exec_driver_sql("SELECT typname FROM pg_type WHERE typtype = 'e'")}
+        assert {"taskstatus", "taskpriority"} <= enums
+        assert conn.exec_driver_sql("SELECT version_num FROM alembic_version").scalar() == migration_head()
+        indexes = {index["name"] for index in inspect(conn).get_indexes("task")}
+    assert {"ix_task_search", *postgres.TRIGRAM_INDEXES} <= indexes
+
+
+def test_bulk_create_tasks_copies_rows_in_order(pg_engine, pg_db: DB):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(pg_engine, "before_cursor_execute", listener)
+    try:
+        due = datetime.now(timezone.utc) + timedelta(days=1)
+        ids = pg_db.bulk_create_tasks([
+            TaskCreate(title=f"Task {i}", priority=TaskPriority.high, due_date=due) for i in range(25)
+        ])
+    finally:
+        event.remove(pg_engine, "before_cursor_execute", listener)
+
+    assert ids == sorted(ids) and len(set(ids)) == 25
+    assert not any(statement.lstrip().upper().startswith("INSERT") for statement in statements)
+    task = pg_db.get_task(ids[7])
+    assert task.title == "Task 7"
+    assert task.priority == TaskPriority.high
+    assert task.due_date == due.replace(tzinfo=None)
+    # the sequence moved past the copied ids
+    assert pg_db.create_task(TaskCreate(title="After")).id == ids[-1] + 1
+
+
+def test_bulk_update_tasks_uses_update_from_values(pg_engine, pg_db: DB):
+    ids = pg_db.bulk_create_tasks([TaskCreate(title=f"Task {i}") for i in range(6)])
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(pg_engine, "before_cursor_execute", listener)
+    try:
+        updated = pg_db.bulk_update_tasks(
+            [{"id": task_id, "status": TaskStatus.completed} for task_id in ids[:4]]
+            + [{"id": ids[4], "title": "Renamed", "priority": "urgent"}, {"id": 999999, "title": "Missing"}],
+            chunk_size=3,
+        )
+    finally:
+        event.remove(pg_engine, "before_cursor_execute", listener)
+
+    assert updated == 5
+    updates = [statement for statement in statements if statement.startswith("UPDATE")]
+    assert updates and all("FROM (VALUES" in statement for statement in updates)
+    assert pg_db.get_task(ids[3]).status == TaskStatus.completed
+    renamed = pg_db.get_task(ids[4])
+    assert (renamed.title, renamed.priority) == ("Renamed", TaskPriority.urgent)
+    assert renamed.updated_at is not None
+    assert pg_db.get_task(ids[5]).status == TaskStatus.pending
+
+
+def test_search_tasks_with_tsvector(pg_db: DB):
+    pg_db.bulk_create_tasks([
+        TaskCreate(title="Write notes", description="deploy checklist"),
+        TaskCreate(title="Deploy the parser", description="release notes attached"),
+        TaskCreate(title="Unrelated", description="nothing here"),
+    ])
+
+    assert [task.title for task in pg_db.search_tasks("deploy")] == ["Deploy the parser", "Write notes"]
+    assert [task.title for task in pg_db.search_tasks("pars*")] == ["Deploy the parser"]
+    assert [task.title for task in pg_db.search_tasks('"release notes"')] == ["Deploy the parser"]
+    assert pg_db.search_tasks("deploy & | !") != []
+    assert pg_db.count_search("notes") == 2
+
+
+def test_due_date_keyset_pages_cross_null_and_dated_rows(pg_db: DB):
+    due = datetime(2030, 1, 1)
+    ids = pg_db.bulk_create_tasks([
+        TaskCreate(title=f"Task {i}", due_date=due + timedelta(days=i % 3) if i % 2 else None) for i in range(9)
+    ])
+    dated = sorted((due + timedelta(days=i % 3), ids[i]) for i in range(9) if i % 2)
+    expected = [ids[i] for i in range(9) if not i % 2] + [task_id for _, task_id in dated]
+
+    pages, cursor = [], ""
+    while True:
+        page, cursor = pg_db.sort_tasks_keyset("due_date", cursor, limit=2)
+        pages.extend(task.id for task in page)
+        if cursor is None:
+            break
+    assert pages == expected
+    assert [task.id for task in pg_db.sort_tasks("due_date")] == expected
+    assert [row["id"] for chunk in pg_db.stream_sorted_tasks("due_date", chunk_size=4) for row in chunk] == expected
+
+
+def test_task_stats_group_by_enums(pg_db: DB):
+    pg_db.bulk_create_tasks([
+        TaskCreate(title="a", status=TaskStatus.completed, assigned_to="ana"),
+        TaskCreate(title="b", priority=TaskPriority.urgent),
+    ])
+    stats = pg_db.get_task_stats()
+    assert stats["total"] == 2
+    assert stats["by_status"][TaskStatus.completed] == 1
+    assert stats["by_priority"][TaskPriority.urgent] == 1
+    assert stats["by_assignee"] == {"ana": 1}
+    assert stats["unassigned"] == 1
+
+
+def test_task_stats_triggers_track_every_write_path(pg_engine, pg_db: DB):
+    ids = pg_db.bulk_create_tasks([TaskCreate(title=f"t{i}", assigned_to="ana" if i % 2 else None) for i in range(6)])
+    pg_db.create_task(TaskCreate(title="one", priority=TaskPriority.urgent))
+    pg_db.update_task(ids[0], TaskUpdate(status=TaskStatus.completed, assigned_to="bo"))
+    pg_db.update_task(ids[1], TaskUpdate(title="renamed"))
+    pg_db.bulk_update_tasks([{"id": task_id, "priority": "low"} for task_id in ids[2:4]])
+    pg_db.delete_task(ids[5])
+    pg_db.bulk_delete_tasks([ids[4]])
+
+    with pg_engine.begin() as conn:
+        assert stats_drift(conn) == []
+        fold_stats(conn)
+        assert stats_drift(conn) == []
+        counters = conn.exec_driver_sql("SELECT dimension, value, count FROM task_stats").all()
+    assert len(counters) == len({(dimension, value) for dimension, value, _ in counters})
+    stats = pg_db.get_task_stats()
+    assert (stats["total"], stats["by_assignee"], stats["unassigned"]) == (5, {"ana": 2, "bo": 1}, 2)
+    assert pg_db.count_tasks(priority=TaskPriority.low) == 2
+
+
+def test_change_log_writers_do_not_wait_for_each_other(pg_engine, pg_db: DB):
+    feed = ChangeFeed(pg_engine)
+    head = asyncio.run(feed.changes(None))[1]
+    first, second = pg_engine.connect(), pg_engine.connect()
+    try:
+        first.execute(DB.create_statement(TaskCreate(title="first")))
+        # the first writer is still open; the second must not wait for it
+        second.exec_driver_sql("SET lock_timeout = '2s'")
+        second.execute(DB.create_statement(TaskCreate(title="second")))
+        second.commit()
+        assert [change["task"]["title"] for change in feed.read(head, 10)] == []
+        feed.refresh()
+        assert [change["task"]["title"] for change in feed.read(head, 10)] == ["second"]
+        first.commit()
+    finally:
+        first.close()
+        second.close()
+
+    feed.refresh()
+    changes = feed.read(head, 10)
+    # numbered in the order they were published, not written
+    assert [change["task"]["title"] for change in changes] == ["second", "first"]
+    assert changes[0]["seq"] < changes[1]["seq"]
+
+
+def test_downgrade_drops_native_enums(postgres_url, pg_engine):
+    _alembic(postgres_url, "base", downgrade=True)
+    try:
+        with pg_engine.connect() as conn:
+            assert conn.exec_driver_sql(
+                "SELECT count(*) FROM pg_type WHERE typname IN ('taskstatus', 'taskpriority')"
+            ).scalar() == 0
+    finally:
+        _alembic(postgres_url, "head")
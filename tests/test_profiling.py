@@ -0,0 +1,83 @@
+import marshal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import profiling
+from app.main import app
+from app.profiling import ProfilingMiddleware, install_sql_capture
+
+TOKEN = "s3cret"
+
+
+@pytest.fixture(name="profiled_client")
+def profiled_client_fixture(client: TestClient, session, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", TOKEN)
+    monkeypatch.setattr(profiling, "profiles", type(profiling.profiles)(maxlen=2))
+    install_sql_capture(session.get_bind())
+    return TestClient(ProfilingMiddleware(app, token=TOKEN))
+
+
+def test_profiles_requests_with_the_token(profiled_client: TestClient):
+    profiled_client.post("/tasks/", json={"title": "profiled task"})
+    assert "x-profile-id" not in profiled_client.get("/tasks/").headers
+    assert "x-profile-id" not in profiled_client.get("/tasks/", headers={"X-Profile": "wrong"}).headers
+    assert not profiling.profiles
+
+    res = profiled_client.get("/tasks/sort-by/title", headers={"X-Profile": TOKEN})
+    assert res.status_code == 200
+    profile_id = res.headers["x-profile-id"]
+
+    profile = profiled_client.get(f"/debug/profiles/{profile_id}", headers={"X-Profile": TOKEN}).json()
+    assert profile["path"] == "/tasks/sort-by/title"
+    assert profile["status"] == 200
+    assert profile["sql_count"] == len(profile["sql"]) >= 1
+    assert any("FROM task" in query["statement"] for query in profile["sql"])
+    assert "cumulative" in profile["report"]
+
+    download = profiled_client.get(f"/debug/profiles/{profile_id}/pstats?profile={TOKEN}")
+    assert download.headers["content-disposition"] == f'attachment; filename="{profile_id}.prof"'
+    assert marshal.loads(download.content)
+
+
+def test_ring_buffer_keeps_recent_profiles(profiled_client: TestClient):
+    ids = [profiled_client.get(f"/tasks/?profile={TOKEN}").headers["x-profile-id"] for _ in range(3)]
+
+    listing = profiled_client.get("/debug/profiles/", headers={"X-Profile": TOKEN}).json()
+    assert [profile["id"] for profile in listing] == ids[:0:-1]
+    assert profiled_client.get(f"/debug/profiles/{ids[0]}", headers={"X-Profile": TOKEN}).status_code == 404
+
+
+def test_token_is_not_stored_with_the_query(profiled_client: TestClient):
+    res = profiled_client.get(f"/tasks/?limit=5&profile={TOKEN}&skip=0")
+    profile_id = res.headers["x-profile-id"]
+
+    listing = profiled_client.get("/debug/profiles/", headers={"X-Profile": TOKEN}).json()
+    assert [profile["query"] for profile in listing] == ["limit=5&skip=0"]
+    profile = profiled_client.get(f"/debug/profiles/{profile_id}", headers={"X-Profile": TOKEN})
+    assert TOKEN not in profile.text
+
+
+def test_profile_routes_need_the_token(client: TestClient, monkeypatch):
+    assert client.get("/debug/profiles/").status_code == 404
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", TOKEN)
+    assert client.get("/debug/profiles/", headers={"X-Profile": "wrong"}).status_code == 403
+    assert client.get("/debug/profiles/", headers={"X-Profile": TOKEN}).status_code == 200
+
+
+def test_workers_share_profiles_through_the_directory(profiled_client: TestClient, tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE_BUFFER_SIZE", 2)
+    profile_ids = [profiled_client.get("/tasks/", headers={"X-Profile": TOKEN}).headers["x-profile-id"]
+                   for _ in range(3)]
+
+    # as served by a worker that did not take them
+    profiling.profiles.clear()
+    listing = profiled_client.get("/debug/profiles/", headers={"X-Profile": TOKEN}).json()
+    assert [item["id"] for item in listing] == profile_ids[:0:-1]
+    assert len(list(tmp_path.iterdir())) == 4
+    profile = profiled_client.get(f"/debug/profiles/{profile_ids[-1]}", headers={"X-Profile": TOKEN})
+    assert profile.status_code == 200 and profile.json()["path"] == "/tasks/"
+    download = profiled_client.get(f"/debug/profiles/{profile_ids[-1]}/pstats", headers={"X-Profile": TOKEN})
+    assert marshal.loads(download.content)
+    assert profiled_client.get("/debug/profiles/..%2Fsecret", headers={"X-Profile": TOKEN}).status_code == 404
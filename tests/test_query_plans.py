@@ -0,0 +1,98 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.db.database import DB
+from app.db.pagination import encode_cursor
+from app.models.Task import TaskPriority, TaskStatus
+from app.schemas.task import TaskCreate, TaskUpdate
+
+
+def future_time(hours: int = 1) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(hours=hours)
+
+
+def seed(db: DB) -> None:
+    for i, (priority, status) in enumerate(zip(TaskPriority, TaskStatus)):
+        db.create_task(TaskCreate(
+            title=f"t{i}", priority=priority, status=status,
+            due_date=future_time(i + 1), assigned_to="alice",
+        ))
+
+
+def capture_statements(session: Session, call) -> list:
+    """Run call() and collect the SELECT/UPDATE/DELETE statements it executes."""
+    captured = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            captured.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return captured
+
+
+def query_plan(session: Session, statement: str, parameters) -> list:
+    rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[3] for row in rows]
+
+
+# Unfiltered OFFSET pagination walks the table by design, so it is not
+# listed here. The last element says whether a temp B-tree sort is allowed:
+# ranked search has to sort its matches by bm25.
+CASES = [
+    ("get_task", lambda db: db.get_task(1), False),
+    ("filter_priority", lambda db: db.get_tasks_pagination_and_filter(priority=TaskPriority.high), False),
+    ("filter_status", lambda db: db.get_tasks_pagination_and_filter(status=TaskStatus.pending), False),
+    ("filter_both", lambda db: db.get_tasks_pagination_and_filter(
+        priority=TaskPriority.low, status=TaskStatus.pending), False),
+    ("keyset_id", lambda db: db.get_tasks_keyset(encode_cursor("id", 1, 1), limit=2), False),
+    ("keyset_created_at", lambda db: db.get_tasks_keyset(
+        encode_cursor("created_at", datetime(2000, 1, 1), 1), limit=2, order_by="created_at"), False),
+    ("keyset_priority", lambda db: db.get_tasks_keyset("", priority=TaskPriority.high), False),
+    ("keyset_status", lambda db: db.get_tasks_keyset("", status=TaskStatus.pending), False),
+    ("sort_title", lambda db: db.sort_tasks("title"), False),
+    ("sort_created_at", lambda db: db.sort_tasks("created_at"), False),
+    ("sort_due_date", lambda db: db.sort_tasks("due_date"), False),
+    ("sort_priority", lambda db: db.sort_tasks("priority"), False),
+    ("sort_status", lambda db: db.sort_tasks("status"), False),
+    ("sort_keyset_title", lambda db: db.sort_tasks_keyset("title", encode_cursor("title", "t1", 2), limit=2), False),
+    ("sort_keyset_due_date", lambda db: db.sort_tasks_keyset(
+        "due_date", encode_cursor("due_date", datetime(2000, 1, 1), 1), limit=2), False),
+    ("sort_keyset_due_date_null", lambda db: db.sort_tasks_keyset(
+        "due_date", encode_cursor("due_date", None, 1), limit=2), False),
+    ("sort_keyset_priority", lambda db: db.sort_tasks_keyset("priority", encode_cursor("priority", 2, 1), limit=2), False),
+    ("sort_keyset_status", lambda db: db.sort_tasks_keyset("status", encode_cursor("status", 2, 1), limit=2), False),
+    ("update_task", lambda db: db.update_task(1, TaskUpdate(title="x")), False),
+    ("delete_task", lambda db: db.delete_task(1), False),
+    ("bulk_update_tasks", lambda db: db.bulk_update_tasks([{"id": 1, "title": "y"}, {"id": 2, "title": "z"}]), False),
+    ("bulk_delete_tasks", lambda db: db.bulk_delete_tasks([1, 2]), False),
+    ("search_tasks", lambda db: db.search_tasks("t1"), True),
+    ("get_task_stats", lambda db: db.get_task_stats(), False),
+    ("count_tasks_estimated", lambda db: db.count_tasks(TaskPriority.low, TaskStatus.pending, "estimated"), False),
+    ("count_tasks_exact", lambda db: db.count_tasks(TaskPriority.low, TaskStatus.pending, "exact"), False),
+    ("get_changes", lambda db: db.get_changes(1, 10), False),
+    ("change_head", lambda db: db.change_head(), False),
+    ("change_horizon", lambda db: db.change_horizon(), False),
+]
+
+
+@pytest.mark.parametrize("call, allow_sort", [c[1:] for c in CASES], ids=[c[0] for c in CASES])
+def test_db_queries_do_not_scan_task_table(session: Session, db: DB, call, allow_sort: bool):
+    seed(db)
+    session.expunge_all()
+    statements = capture_statements(session, lambda: call(db))
+    assert statements, "expected the DB method to execute at least one query"
+
+    for statement, parameters in statements:
+        plan = query_plan(session, statement, parameters)
+        assert "SCAN task" not in plan, f"full table scan for:\n{statement}\nplan: {plan}"
+        if allow_sort:
+            continue
+        assert not any("TEMP B-TREE" in step for step in plan), f"sort without index for:\n{statement}\nplan: {plan}"
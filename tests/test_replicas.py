@@ -0,0 +1,76 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, text
+
+from app.db.cache import task_cache
+from app.db.dependancies import get_task_db, replica_routed
+from app.db.replicas import LAST_WRITE_COOKIE, Replica, ReplicaSet, ReadYourWritesMiddleware, SnapshotReplica
+from app.db.session import create_sqlite_engine
+from app.main import app
+
+
+@pytest.fixture(name="primary")
+def primary_fixture(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'primary.sqlite3'}", "production")
+    SQLModel.metadata.create_all(engine)
+    if task_cache is not None:
+        task_cache.clear()
+    yield engine
+    app.dependency_overrides = {}
+    engine.dispose()
+
+
+def test_snapshot_replica_serves_reads_and_writers_read_their_writes(tmp_path, primary, engine_task_db):
+    replica = SnapshotReplica(f"sqlite:///{tmp_path / 'replica.sqlite3'}", "replica_test", primary, interval=3600)
+    replica.refresh()
+    app.dependency_overrides = {get_task_db: replica_routed(engine_task_db(primary), ReplicaSet([replica]), "sync")}
+    writer = TestClient(ReadYourWritesMiddleware(app))
+    reader = TestClient(ReadYourWritesMiddleware(app))
+
+    created = writer.post("/tasks/", json={"title": "fresh"})
+    assert created.status_code == 201
+    assert float(writer.cookies[LAST_WRITE_COOKIE]) >= replica.synced_at
+    task_id = created.json()["id"]
+
+    # the writer's reads stay on the primary until the replica catches up
+    assert writer.get(f"/tasks/{task_id}").json()["title"] == "fresh"
+    assert reader.get(f"/tasks/{task_id}").status_code == 404
+    assert LAST_WRITE_COOKIE not in reader.cookies
+
+    replica.refresh()
+    assert reader.get(f"/tasks/{task_id}").json()["title"] == "fresh"
+    assert reader.get("/tasks/search", params={"text": "fresh"}).status_code == 200
+    assert replica.refreshes == 2
+    replica.engine.dispose()
+
+
+def test_async_reads_on_a_read_only_pool_of_the_primary_file(primary, engine_task_db):
+    replica = Replica(str(primary.url), "replica_test", lag=0.0)
+    statements = []
+    event.listen(replica.async_engine().sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    app.dependency_overrides = {get_task_db: replica_routed(engine_task_db(primary), ReplicaSet([replica]), "async")}
+    client = TestClient(app)
+
+    client.post("/tasks/", json={"title": "one", "priority": "high"})
+    assert [task["title"] for task in client.get("/tasks/").json()] == ["one"]
+    assert client.get("/tasks/stats").json()["by_priority"]["high"] == 1
+    assert statements and all(statement.lstrip().upper().startswith("SELECT") for statement in statements)
+
+    with pytest.raises(OperationalError, match="readonly"):
+        with replica.engine.begin() as conn:
+            conn.execute(text("DELETE FROM task"))
+
+
+def test_choose_skips_replicas_behind_the_clients_last_write(tmp_path, primary):
+    url = str(primary.url)
+    lagging, current = Replica(url, "lagging", lag=10.0), Replica(url, "current", lag=0.0)
+    replicas = ReplicaSet([lagging, current])
+
+    assert {replicas.choose().name for _ in range(4)} == {"lagging", "current"}
+    assert replicas.choose(time.time() - 5).name == "current"
+    assert replicas.choose(time.time() + 5) is None
@@ -1,5 +1,7 @@
+import json
 import pytest
 from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
 from fastapi.testclient import TestClient
 from app.models.Task import TaskPriority, TaskStatus
 
@@ -146,6 +148,27 @@ def test_search_tasks_no_results_404(client: TestClient):
     assert res.status_code == 404
 
 
+def test_bulk_create_success(client: TestClient):
+    payload = {"tasks": [create_payload(title=f"bulk {i}") for i in range(5)]}
+    res = client.post("/tasks/bulk-create?chunk_size=2", json=payload)
+    assert res.status_code == 201
+    body = res.json()
+    assert body["created"] == 5
+    titles = [client.get(f"/tasks/{task_id}").json()["title"] for task_id in body["ids"]]
+    assert titles == [f"bulk {i}" for i in range(5)]
+
+
+def test_bulk_create_validates_whole_batch(client: TestClient):
+    payload = {"tasks": [create_payload(title="ok"), create_payload(title="  ")]}
+    res = client.post("/tasks/bulk-create", json=payload)
+    assert res.status_code == 422
+    assert res.json()["detail"][0]["loc"][:3] == ["body", "tasks", 1]
+    # nothing from the rejected batch was inserted
+    assert client.get("/tasks/search", params={"text": "ok"}).status_code == 404
+
+    assert client.post("/tasks/bulk-create", json={"tasks": []}).status_code == 400
+
+
 def test_bulk_update_success(client: TestClient):
     t1 = create_task(client, title="one")
     t2 = create_task(client, title="two")
@@ -188,6 +211,17 @@ def test_bulk_update_items_without_id(client: TestClient):
     
 
 
+def test_bulk_update_and_delete_per_chunk_commit(client: TestClient):
+    ids = client.post("/tasks/bulk-create", json={"tasks": [create_payload() for _ in range(3)]}).json()["ids"]
+    payload = {"updates": [{"id": task_id, "status": TaskStatus.completed.value} for task_id in ids]}
+    res = client.put("/tasks/bulk-update?chunk_size=2&atomic=false", json=payload)
+    assert res.json() == {"updated_count": 3}
+    assert client.get(f"/tasks/{ids[2]}").json()["status"] == TaskStatus.completed.value
+
+    res = client.request("DELETE", "/tasks/bulk-delete?chunk_size=2&atomic=false", json={"task_ids": ids})
+    assert res.json() == {"deleted": 3}
+
+
 def test_bulk_delete_success(client: TestClient):
     t1 = create_task(client)
     t2 = create_task(client)
@@ -210,3 +244,258 @@ def test_bulk_delete_all_nonexistent_returns_404(client: TestClient):
     assert res.status_code == 404
 
 
+def test_list_tasks_cursor_pagination(client: TestClient):
+    ids = [create_task(client, title=f"c{i}")["id"] for i in range(5)]
+
+    res = client.get("/tasks/", params={"cursor": "", "limit": 2})
+    assert res.status_code == 200
+    body = res.json()
+    assert [t["id"] for t in body["items"]] == ids[:2]
+
+    seen = [t["id"] for t in body["items"]]
+    while body["next_cursor"]:
+        body = client.get("/tasks/", params={"cursor": body["next_cursor"], "limit": 2}).json()
+        seen.extend(t["id"] for t in body["items"])
+    assert seen == ids
+
+
+def test_list_tasks_invalid_cursor_400(client: TestClient):
+    res = client.get("/tasks/", params={"cursor": "garbage!"})
+    assert res.status_code == 400
+    res = client.get("/tasks/", params={"cursor": "", "order_by": "title"})
+    assert res.status_code == 400
+
+
+def test_sort_tasks_limit_and_cursor(client: TestClient):
+    for title in ["d", "b", "a", "c"]:
+        create_task(client, title=title)
+
+    res = client.get("/tasks/sort-by/title", params={"limit": 2})
+    assert [t["title"] for t in res.json()] == ["a", "b"]
+
+    page = client.get("/tasks/sort-by/title", params={"cursor": "", "limit": 3}).json()
+    assert [t["title"] for t in page["items"]] == ["a", "b", "c"]
+    page = client.get("/tasks/sort-by/title", params={"cursor": page["next_cursor"], "limit": 3}).json()
+    assert [t["title"] for t in page["items"]] == ["d"]
+    assert page["next_cursor"] is None
+
+
+def test_sort_tasks_stream_ndjson(client: TestClient):
+    import json
+    created = [create_task(client, title=f"s{i}") for i in range(3)]
+
+    res = client.get("/tasks/sort-by/title", params={"stream": True, "chunk_size": 2})
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in res.text.splitlines()]
+    assert rows == created
+
+    assert client.get("/tasks/sort-by/unknown", params={"stream": True}).status_code == 400
+
+
+def test_search_tasks_phrase_and_prefix(client: TestClient):
+    create_task(client, title="Release notes", description="draft")
+    create_task(client, title="Notes on release", description="draft")
+    res = client.get("/tasks/search", params={"text": '"release notes"'})
+    assert [t["title"] for t in res.json()] == ["Release notes"]
+    res = client.get("/tasks/search", params={"text": "rel*"})
+    assert len(res.json()) == 2
+
+
+def test_routes_on_async_db(async_client: TestClient):
+    created = create_task(async_client, title="async route")
+    assert async_client.get(f"/tasks/{created['id']}").json()["title"] == "async route"
+
+    res = async_client.put(f"/tasks/{created['id']}", json={"status": TaskStatus.completed.value})
+    assert res.json()["status"] == TaskStatus.completed.value
+
+    assert async_client.get("/tasks/", params={"cursor": ""}).json()["items"][0]["id"] == created["id"]
+    assert async_client.get("/tasks/search", params={"text": "async"}).status_code == 200
+
+    stream = async_client.get("/tasks/sort-by/title", params={"stream": True})
+    assert stream.text.count("\n") == 1
+    stream = async_client.get("/tasks/sort-by/title", params={"stream": True, "fields": "id"})
+    assert json.loads(stream.text) == {"id": created["id"]}
+
+    assert async_client.delete(f"/tasks/{created['id']}").status_code == 204
+    assert async_client.get(f"/tasks/{created['id']}").status_code == 404
+
+
+def test_cache_stats_endpoint(client: TestClient):
+    body = client.get("/cache/stats").json()
+    assert body["enabled"] is True
+    assert {"hits", "misses", "evictions"} <= body.keys()
+
+
+def test_get_task_etag_and_not_modified(client: TestClient):
+    created = create_task(client, title="etag")
+    res = client.get(f"/tasks/{created['id']}")
+    etag, last_modified = res.headers["etag"], res.headers["last-modified"]
+    assert etag.startswith('"')
+
+    res304 = client.get(f"/tasks/{created['id']}", headers={"If-None-Match": etag})
+    assert res304.status_code == 304
+    assert res304.content == b""
+    assert res304.headers["etag"] == etag
+
+    assert client.get(f"/tasks/{created['id']}", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    client.put(f"/tasks/{created['id']}", json={"title": "changed"})
+    res = client.get(f"/tasks/{created['id']}", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.json()["title"] == "changed"
+    assert res.headers["etag"] != etag
+
+    assert client.get("/tasks/999999", headers={"If-None-Match": etag}).status_code == 404
+
+
+def test_collection_etags(client: TestClient):
+    first = create_task(client, title="one")
+    create_task(client, title="two")
+
+    for url, params in [("/tasks/", {}), ("/tasks/", {"cursor": ""}),
+                        ("/tasks/search", {"text": "one"}), ("/tasks/sort-by/title", {})]:
+        res = client.get(url, params=params)
+        etag = res.headers["etag"]
+        assert client.get(url, params=params, headers={"If-None-Match": etag}).status_code == 304
+
+    etag = client.get("/tasks/").headers["etag"]
+    client.delete(f"/tasks/{first['id']}")
+    assert client.get("/tasks/", headers={"If-None-Match": etag}).status_code == 200
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/tasks/", {"limit": 10}),
+    ("/tasks/", {"cursor": "", "limit": 2, "order_by": "created_at"}),
+    ("/tasks/search", {"text": "desc"}),
+    ("/tasks/", {"limit": 2, "count": "exact"}),
+    ("/tasks/search", {"text": "desc", "envelope": True}),
+    ("/tasks/sort-by/priority", {"limit": 10}),
+    ("/tasks/sort-by/due_date", {"cursor": "", "limit": 2}),
+])
+def test_fast_serialization_matches_response_model(client: TestClient, monkeypatch, path, params):
+    from app.routers import serialization
+    create_task(client, title="naïve", priority=TaskPriority.high.value)
+    create_task(client, title="second", due_date=None)
+    created = create_task(client, title="third", assigned_to=None)
+    client.put(f"/tasks/{created['id']}", json={"status": TaskStatus.completed.value})
+
+    monkeypatch.setattr(serialization, "TASK_SERIALIZER", "pydantic")
+    expected = client.get(path, params=params)
+    monkeypatch.setattr(serialization, "TASK_SERIALIZER", "fast")
+    res = client.get(path, params=params)
+
+    assert res.status_code == expected.status_code == 200
+    assert res.headers["content-type"] == "application/json"
+    assert res.json() == expected.json()
+    assert res.headers["etag"] == expected.headers["etag"]
+    assert res.headers.get("last-modified") == expected.headers.get("last-modified")
+
+
+def test_collections_are_validated_by_etag_only(client: TestClient):
+    create_task(client, title="kept")
+    removed = create_task(client, title="removed")
+    res = client.get("/tasks/")
+    assert "last-modified" not in res.headers
+    etag = res.headers["etag"]
+
+    client.delete(f"/tasks/{removed['id']}")
+    # later than every remaining task's timestamp
+    since = format_datetime(datetime.now(timezone.utc) + timedelta(minutes=1), usegmt=True)
+    res = client.get("/tasks/", headers={"If-Modified-Since": since})
+    assert res.status_code == 200
+    assert [task["title"] for task in res.json()] == ["kept"]
+    assert client.get("/tasks/", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_fields_projection_on_reads(client: TestClient):
+    first = create_task(client, title="alpha", priority=TaskPriority.high.value)
+    create_task(client, title="beta", priority=TaskPriority.low.value)
+    create_task(client, title="gamma", priority=TaskPriority.urgent.value)
+
+    res = client.get("/tasks/", params={"fields": "title,id"})
+    assert res.status_code == 200
+    assert res.json()[0] == {"id": first["id"], "title": "alpha"}
+
+    res = client.get(f"/tasks/{first['id']}", params={"fields": "status,due_date"})
+    assert res.json() == {"status": first["status"], "due_date": first["due_date"]}
+
+    # cursor pages still chain when the sort key is not among the fields
+    page = client.get("/tasks/sort-by/priority", params={"cursor": "", "limit": 2, "fields": "title"}).json()
+    assert page["items"] == [{"title": "gamma"}, {"title": "alpha"}]
+    page = client.get("/tasks/sort-by/priority", params={"cursor": page["next_cursor"], "fields": "title"}).json()
+    assert page == {"items": [{"title": "beta"}], "next_cursor": None}
+
+    res = client.get("/tasks/search", params={"text": "beta", "fields": "title"})
+    assert res.json() == [{"title": "beta"}]
+
+    res = client.get("/tasks/sort-by/title", params={"stream": "true", "fields": "id"})
+    assert [json.loads(line) for line in res.text.splitlines()][0] == {"id": first["id"]}
+
+
+def test_fields_validation_and_etag(client: TestClient):
+    created = create_task(client)
+    assert client.get("/tasks/", params={"fields": "title,secret"}).status_code == 400
+    assert client.get("/tasks/search", params={"text": "x", "fields": ""}).status_code == 400
+
+    full = client.get(f"/tasks/{created['id']}")
+    projected = client.get(f"/tasks/{created['id']}", params={"fields": "title"})
+    assert full.headers["etag"] != projected.headers["etag"]
+    res = client.get(f"/tasks/{created['id']}", params={"fields": "title"},
+                     headers={"If-None-Match": projected.headers["etag"]})
+    assert res.status_code == 304
+
+
+def test_task_stats_endpoint(client: TestClient):
+    create_task(client, assigned_to="bob", priority=TaskPriority.high.value)
+    create_task(client, assigned_to=None, status=TaskStatus.completed.value)
+    res = client.get("/tasks/stats")
+    assert res.status_code == 200
+    assert res.json() == {
+        "total": 2,
+        "by_status": {"pending": 1, "in_progress": 0, "completed": 1, "cancelled": 0},
+        "by_priority": {"low": 0, "medium": 1, "high": 1, "urgent": 0},
+        "by_assignee": {"bob": 1},
+        "unassigned": 1,
+        "overdue": 0,
+    }
+
+
+def test_list_envelope_has_more_and_total(client: TestClient):
+    for i in range(3):
+        create_task(client, title=f"page {i}", priority=TaskPriority.high.value)
+
+    res = client.get("/tasks/", params={"limit": 2, "envelope": True})
+    body = res.json()
+    assert [task["title"] for task in body["items"]] == ["page 0", "page 1"]
+    assert (body["has_more"], body["total"]) == (True, None)
+
+    body = client.get("/tasks/", params={"limit": 2, "count": "exact"}).json()
+    assert (body["has_more"], body["total"]) == (True, 3)
+    body = client.get("/tasks/", params={"skip": 2, "limit": 2, "count": "estimated",
+                                         "priority": "high", "fields": "id"}).json()
+    assert (len(body["items"]), body["has_more"], body["total"]) == (1, False, 3)
+    body = client.get("/tasks/search", params={"text": "page", "limit": 1, "count": "estimated"}).json()
+    assert (body["has_more"], body["total"]) == (True, 3)
+
+    assert client.get("/tasks/", params={"count": "roughly"}).status_code == 400
+    assert client.get("/tasks/search", params={"text": "page", "count": "roughly"}).status_code == 400
+
+    etag = client.get("/tasks/", params={"limit": 2, "count": "exact"}).headers["etag"]
+    create_task(client, title="later")
+    # the first page is unchanged but the total is not
+    res = client.get("/tasks/", params={"limit": 2, "count": "exact"}, headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.json()["total"] == 4
+
+
+def test_overdue_task_is_readable(client: TestClient, session):
+    from sqlalchemy import text
+    created = create_task(client, title="overdue")
+    session.execute(text("UPDATE task SET due_date = '2000-01-01 00:00:00.000000' WHERE id = :id"),
+                    {"id": created["id"]})
+    session.commit()
+
+    res = client.get(f"/tasks/{created['id']}")
+    assert res.status_code == 200
+    assert res.json()["due_date"].startswith("2000-01-01T00:00:00")
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from app.db import session as db_session
+from app.db.health import migration_head
+from app.server import default_workers, prepare_database, prepare_multiproc_dir
+
+
+@pytest.fixture(name="app_database")
+def app_database_fixture(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'db.sqlite3'}"
+    engine = db_session.create_sqlite_engine(url, "production")
+    monkeypatch.setattr(db_session, "DATABASE_URL", url)
+    monkeypatch.setattr(db_session, "engine", engine)
+    yield tmp_path
+    engine.dispose()
+
+
+def test_prepare_database_migrates_once_in_wal_mode(app_database):
+    prepare_database()
+    prepare_database()
+
+    assert db_session.engine.pool.checkedin() == 0
+    with db_session.engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT version_num FROM alembic_version").scalar() == migration_head()
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+
+def test_prepare_database_without_migrations(app_database):
+    prepare_database(migrate=False)
+    with db_session.engine.connect() as conn:
+        tables = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "task" in tables
+    assert "alembic_version" not in tables
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_child_does_not_reuse_pooled_connections(app_database):
+    prepare_database(migrate=False)
+    with db_session.engine.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+    assert db_session.engine.pool.checkedin() == 1
+
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if db_session.engine.pool.checkedin() == 0 else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert db_session.engine.pool.checkedin() == 1
+
+
+def test_default_workers(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert default_workers() == 3
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    assert default_workers() == (os.cpu_count() or 1)
+
+
+def test_workers_get_a_shared_directory(tmp_path, monkeypatch):
+    monkeypatch.delenv("MULTIPROC_DIR", raising=False)
+    assert prepare_multiproc_dir(1) is None
+    assert "MULTIPROC_DIR" not in os.environ
+
+    created = prepare_multiproc_dir(4)
+    assert os.environ["MULTIPROC_DIR"] == created and os.path.isdir(created)
+    os.rmdir(created)
+
+    # one that is set is kept, minus the snapshots of a previous server
+    monkeypatch.setenv("MULTIPROC_DIR", str(tmp_path))
+    (tmp_path / "metrics-1.json").write_text("{}")
+    assert prepare_multiproc_dir(4) is None
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import text
+
+from app.db.profiles import sqlite_pragmas, pool_options
+from app.db.session import create_sqlite_engine
+
+
+def pragma(engine, name: str):
+    with engine.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_production_profile_applies_pragmas(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'prod.sqlite3'}", "production")
+    assert pragma(engine, "journal_mode") == "wal"
+    assert pragma(engine, "synchronous") == 1  # NORMAL
+    assert pragma(engine, "busy_timeout") == 5000
+    assert pragma(engine, "temp_store") == 2  # MEMORY
+    assert engine.pool.size() == 20
+    engine.dispose()
+
+
+def test_default_profile_keeps_sqlite_defaults(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'default.sqlite3'}", "default")
+    assert pragma(engine, "journal_mode") == "delete"
+    engine.dispose()
+
+
+def test_profile_selected_and_overridden_by_env(monkeypatch):
+    monkeypatch.setenv("SQLITE_PROFILE", "default")
+    assert sqlite_pragmas() == {}
+
+    monkeypatch.setenv("SQLITE_PROFILE", "production")
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "250")
+    monkeypatch.setenv("DB_POOL_SIZE", "4")
+    assert sqlite_pragmas()["busy_timeout"] == "250"
+    assert pool_options()["pool_size"] == 4
+
+    monkeypatch.setenv("SQLITE_PROFILE", "turbo")
+    with pytest.raises(ValueError):
+        sqlite_pragmas()
+
+
+def test_fingerprint_normalizes_literals_and_in_lists():
+    from app.db.query_log import fingerprint
+    a = fingerprint("SELECT * FROM task WHERE id IN (?, ?, ?) AND title = 'x'  LIMIT 10")
+    b = fingerprint("SELECT * FROM task\n WHERE id IN (?) AND title = 'it''s' LIMIT 5")
+    assert a == b == "SELECT * FROM task WHERE id IN (...) AND title = ? LIMIT ?"
+
+
+def test_query_logging_samples_and_flags_slow_queries(caplog):
+    from app.db.query_log import install_query_logging
+    engine = create_sqlite_engine("sqlite://", "default")
+    assert install_query_logging(engine) is False
+
+    install_query_logging(engine, sample_rate=0.0, slow_query_ms=0)
+    with caplog.at_level("INFO", logger="app.db.queries"):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    records = [r.query for r in caplog.records if hasattr(r, "query")]
+    assert records and records[0]["fingerprint"] == "SELECT ?"
+    assert records[0]["slow"] is True and records[0]["duration_ms"] >= 0
+
+
+def test_query_logging_sample_rate_zero_logs_nothing(caplog):
+    from app.db.query_log import install_query_logging
+    engine = create_sqlite_engine("sqlite://", "default")
+    install_query_logging(engine, sample_rate=0.0, slow_query_ms=10_000)
+    with caplog.at_level("INFO", logger="app.db.queries"):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    assert not [r for r in caplog.records if r.name == "app.db.queries"]